@@ -1,11 +1,57 @@
-import pkg_resources
+import importlib as _importlib
+import sys as _sys
 
+from onnx_chainer.export import clear_export_cache  # NOQA
 from onnx_chainer.export import convert_parameter  # NOQA
 from onnx_chainer.export import export  # NOQA
+from onnx_chainer.export import export_graph  # NOQA
+from onnx_chainer.export import refresh_params  # NOQA
 
 from onnx_chainer.export import MINIMUM_OPSET_VERSION  # NOQA
 
 from onnx_chainer.export_testcase import export_testcase  # NOQA
 
+# Names of the modules defining the attributes which are imported on their
+# first use, so that importing onnx_chainer does not import them
+_lazy_attributes = {
+    'export_many': 'onnx_chainer.export_many',
+    'ExportJob': 'onnx_chainer.export_many',
+    'ExportResult': 'onnx_chainer.export_many',
+    'Profiler': 'onnx_chainer.profiling',
+}
 
-__version__ = pkg_resources.get_distribution('onnx-chainer').version
+
+def _import_attribute(name):
+    module_name = _lazy_attributes[name]
+    module = _importlib.import_module(module_name)
+    # All the attributes of the module are set at once, since importing
+    # onnx_chainer.export_many sets the module itself to the attribute
+    # export_many of this package
+    for attribute, attribute_module in _lazy_attributes.items():
+        if attribute_module == module_name:
+            globals()[attribute] = getattr(module, attribute)
+    return globals()[name]
+
+
+if _sys.version_info >= (3, 7):
+    def __getattr__(name):
+        if name not in _lazy_attributes:
+            raise AttributeError(
+                'module {!r} has no attribute {!r}'.format(__name__, name))
+        return _import_attribute(name)
+
+    def __dir__():
+        return sorted(set(globals()) | set(_lazy_attributes))
+else:
+    # Module attributes cannot be resolved lazily before Python 3.7
+    for _name in _lazy_attributes:
+        _import_attribute(_name)
+
+
+try:
+    # importlib.metadata is much faster to import than pkg_resources
+    from importlib import metadata as _metadata
+    __version__ = _metadata.version('onnx-chainer')
+except ImportError:
+    import pkg_resources
+    __version__ = pkg_resources.get_distribution('onnx-chainer').version
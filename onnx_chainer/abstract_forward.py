@@ -0,0 +1,317 @@
+import chainer
+from chainer.utils import conv
+import numpy
+
+
+def placeholder(shape, dtype, xp=None):
+    """Returns an array which only carries a shape and a dtype.
+
+    The returned array is a read-only view of a single zero broadcasted to
+    ``shape``, so it costs a constant amount of memory regardless of its
+    shape.
+
+    Args:
+      shape (tuple of int): The shape of the placeholder.
+      dtype (numpy.dtype): The dtype of the placeholder.
+      xp (module): The array module, either `numpy` or `cupy`. NumPy is used
+        if not specified.
+
+    Returns:
+      An array of the given shape and dtype.
+    """
+    if xp is None:
+        xp = numpy
+    return xp.broadcast_to(xp.zeros((), dtype=dtype), shape)
+
+
+def _broadcast_shapes(*shapes):
+    ndim = max(len(s) for s in shapes)
+    shapes = [(1,) * (ndim - len(s)) + tuple(s) for s in shapes]
+    return tuple(max(dims) if min(dims) != 0 else 0 for dims in zip(*shapes))
+
+
+def _same_shape(func, inputs):
+    return inputs[0].shape
+
+
+def _elementwise_shape(func, inputs):
+    return _broadcast_shapes(*[x.shape for x in inputs])
+
+
+def _convolution_2d_shape(func, inputs):
+    x, W = inputs[:2]
+    n, _, h, w = x.shape
+    out_c, _, kh, kw = W.shape
+    out_h = conv.get_conv_outsize(
+        h, kh, func.sy, func.ph, cover_all=func.cover_all, d=func.dy)
+    out_w = conv.get_conv_outsize(
+        w, kw, func.sx, func.pw, cover_all=func.cover_all, d=func.dx)
+    return n, out_c, out_h, out_w
+
+
+def _linear_shape(func, inputs):
+    x, W = inputs[:2]
+    return x.shape[:-1] + (W.shape[0],)
+
+
+def _deconvolution_2d_shape(func, inputs):
+    x, W = inputs[:2]
+    n, _, h, w = x.shape
+    _, out_c, kh, kw = W.shape
+    # The output size is inferred and kept by the function as its kernel
+    # does, since the converter refers to it
+    if func.outh is None:
+        func.outh = conv.get_deconv_outsize(h, kh, func.sy, func.ph, d=func.dy)
+    if func.outw is None:
+        func.outw = conv.get_deconv_outsize(w, kw, func.sx, func.pw, d=func.dx)
+    return n, out_c * func.groups, func.outh, func.outw
+
+
+def _convolution_nd_shape(func, inputs):
+    x, W = inputs[:2]
+    out_dims = tuple(
+        conv.get_conv_outsize(d, k, s, p, cover_all=func.cover_all, d=di)
+        for d, k, s, p, di in zip(
+            x.shape[2:], W.shape[2:], func.stride, func.pad, func.dilate))
+    return (x.shape[0], W.shape[0]) + out_dims
+
+
+def _deconvolution_nd_shape(func, inputs):
+    x, W = inputs[:2]
+    if func.outs is None:
+        func.outs = tuple(
+            conv.get_deconv_outsize(d, k, s, p, d=di)
+            for d, k, s, p, di in zip(
+                x.shape[2:], W.shape[2:], func.stride, func.pad,
+                func.dilate))
+    groups = getattr(func, 'groups', 1)
+    return (x.shape[0], W.shape[1] * groups) + tuple(func.outs)
+
+
+def _embed_id_shape(func, inputs):
+    x, W = inputs
+    return x.shape + W.shape[1:]
+
+
+def _matmul_shape(func, inputs):
+    a, b = inputs
+    if a.ndim < 2 or b.ndim < 2:
+        return None
+    a_shape, b_shape = a.shape, b.shape
+    if func.transa:
+        a_shape = a_shape[:-2] + (a_shape[-1], a_shape[-2])
+    if func.transb:
+        b_shape = b_shape[:-2] + (b_shape[-1], b_shape[-2])
+    shape = _broadcast_shapes(a_shape[:-2], b_shape[:-2]) + (
+        a_shape[-2], b_shape[-1])
+    if func.transc:
+        shape = shape[:-2] + (shape[-1], shape[-2])
+    return shape
+
+
+def _reduction_shape(func, inputs):
+    x = inputs[0]
+    axis = func.axis
+    if axis is None:
+        axis = range(x.ndim)
+    axis = {a % x.ndim for a in axis}
+    if getattr(func, 'keepdims', False):
+        return tuple(1 if i in axis else d for i, d in enumerate(x.shape))
+    return tuple(d for i, d in enumerate(x.shape) if i not in axis)
+
+
+def _concat_shape(func, inputs):
+    axis = func.axis % inputs[0].ndim
+    shape = list(inputs[0].shape)
+    shape[axis] = sum(x.shape[axis] for x in inputs)
+    return tuple(shape)
+
+
+def _pad_shape(func, inputs):
+    return tuple(int(d + before + after) for d, (before, after) in zip(
+        inputs[0].shape, func.pad_bw))
+
+
+def _tile_shape(func, inputs):
+    shape = inputs[0].shape
+    reps = func.reps
+    ndim = max(len(shape), len(reps))
+    shape = (1,) * (ndim - len(shape)) + shape
+    reps = (1,) * (ndim - len(reps)) + tuple(reps)
+    return tuple(d * r for d, r in zip(shape, reps))
+
+
+def _depth2space_shape(func, inputs):
+    n, c, h, w = inputs[0].shape
+    r = func.r
+    return n, c // (r * r), h * r, w * r
+
+
+def _space2depth_shape(func, inputs):
+    n, c, h, w = inputs[0].shape
+    r = func.r
+    return n, c * r * r, h // r, w // r
+
+
+def _softmax_cross_entropy_shape(func, inputs):
+    if func.reduce == 'mean':
+        return ()
+    return inputs[1].shape
+
+
+def _pooling_2d_shape(func, inputs):
+    n, c, h, w = inputs[0].shape
+    out_h = conv.get_conv_outsize(
+        h, func.kh, func.sy, func.ph, cover_all=func.cover_all)
+    out_w = conv.get_conv_outsize(
+        w, func.kw, func.sx, func.pw, cover_all=func.cover_all)
+    return n, c, out_h, out_w
+
+
+def _pooling_nd_shape(func, inputs):
+    x = inputs[0]
+    out_dims = tuple(
+        conv.get_conv_outsize(d, k, s, p, cover_all=func.cover_all)
+        for d, k, s, p in zip(x.shape[2:], func.ksize, func.stride, func.pad))
+    return x.shape[:2] + out_dims
+
+
+def _unpooling_2d_shape(func, inputs):
+    n, c, h, w = inputs[0].shape
+    if func.outh is None:
+        func.outh = conv.get_deconv_outsize(
+            h, func.kh, func.sy, func.ph, cover_all=func.cover_all)
+    if func.outw is None:
+        func.outw = conv.get_deconv_outsize(
+            w, func.kw, func.sx, func.pw, cover_all=func.cover_all)
+    return n, c, func.outh, func.outw
+
+
+def _roi_pooling_2d_shape(func, inputs):
+    x, rois = inputs
+    return rois.shape[0], x.shape[1], func.outh, func.outw
+
+
+# Chainer Function -> Output shape inference from input arrays. A rule may
+# return None to run the kernel, e.g. for inputs it does not handle.
+shape_rules = {
+    # Activation
+    'ClippedReLU': _same_shape,
+    'ELU': _same_shape,
+    'HardSigmoid': _same_shape,
+    'LeakyReLU': _same_shape,
+    'LogSoftmax': _same_shape,
+    'PReLUFunction': _same_shape,
+    'ReLU': _same_shape,
+    'Sigmoid': _same_shape,
+    'Softmax': _same_shape,
+    'Softplus': _same_shape,
+    'Tanh': _same_shape,
+
+    # Array
+    'Cast': _same_shape,
+    'Concat': _concat_shape,
+    'Copy': _same_shape,
+    'Depth2Space': _depth2space_shape,
+    'Pad': _pad_shape,
+    'Space2Depth': _space2depth_shape,
+    'Tile': _tile_shape,
+
+    # Connection
+    'Convolution2DFunction': _convolution_2d_shape,
+    'ConvolutionND': _convolution_nd_shape,
+    'Deconvolution2DFunction': _deconvolution_2d_shape,
+    'DeconvolutionND': _deconvolution_nd_shape,
+    'EmbedIDFunction': _embed_id_shape,
+    'LinearFunction': _linear_shape,
+
+    # Loss
+    'SoftmaxCrossEntropy': _softmax_cross_entropy_shape,
+
+    # Math
+    'Absolute': _same_shape,
+    'Add': _elementwise_shape,
+    'AddConstant': _same_shape,
+    'Clip': _same_shape,
+    'Div': _elementwise_shape,
+    'Exp': _same_shape,
+    'LinearInterpolate': _elementwise_shape,
+    'LogSumExp': _reduction_shape,
+    'MatMul': _matmul_shape,
+    'Max': _reduction_shape,
+    'Maximum': _elementwise_shape,
+    'Mean': _reduction_shape,
+    'Min': _reduction_shape,
+    'Minimum': _elementwise_shape,
+    'Mul': _elementwise_shape,
+    'MulConstant': _same_shape,
+    'Neg': _same_shape,
+    'PowVarConst': _same_shape,
+    'Prod': _reduction_shape,
+    'Sqrt': _same_shape,
+    'Square': _same_shape,
+    'Sub': _elementwise_shape,
+    'Sum': _reduction_shape,
+
+    # Noise
+    'Dropout': _same_shape,
+
+    # Normalization
+    'BatchNormalization': _same_shape,
+    'FixedBatchNormalization': _same_shape,
+    'LocalResponseNormalization': _same_shape,
+    'NormalizeL2': _same_shape,
+
+    # Pooling
+    'AveragePooling2D': _pooling_2d_shape,
+    'AveragePoolingND': _pooling_nd_shape,
+    'MaxPooling2D': _pooling_2d_shape,
+    'MaxPoolingND': _pooling_nd_shape,
+    'ROIPooling2D': _roi_pooling_2d_shape,
+    'Unpooling2D': _unpooling_2d_shape,
+}
+
+# Chainer Function -> Output dtype if it is not that of the first input
+dtype_rules = {
+    'Cast': lambda func, inputs: func.type,
+    'EmbedIDFunction': lambda func, inputs: inputs[1].dtype,
+    'MatMul': lambda func, inputs: func.dtype or inputs[0].dtype,
+}
+
+
+class AbstractForward(chainer.FunctionHook):
+    """Function hook to run a forward computation without real kernels.
+
+    While this hook is active, each function which has an entry in
+    ``shape_rules`` skips its kernel and returns placeholder arrays of the
+    inferred output shape instead. The other functions run their kernels as
+    usual; since their inputs are placeholders they are usually cheap views,
+    e.g. `Reshape` or `GetItem`. All the input arrays are retained so that
+    converters can still refer to them.
+    """
+
+    name = 'AbstractForward'
+
+    def forward_preprocess(self, function, in_data):
+        rule = shape_rules.get(function.__class__.__name__)
+        if rule is None:
+            return
+
+        dtype_rule = dtype_rules.get(function.__class__.__name__)
+
+        def forward(inputs):
+            function.retain_inputs(tuple(range(len(inputs))))
+            shape = rule(function, inputs)
+            if shape is None:
+                return type(function).forward(function, inputs)
+            xp = chainer.cuda.get_array_module(*inputs)
+            dtype = inputs[0].dtype
+            if dtype_rule is not None:
+                dtype = dtype_rule(function, inputs)
+            return placeholder(shape, dtype, xp),
+
+        function.forward = forward
+
+    def forward_postprocess(self, function, in_data):
+        # Remove the instance attribute to restore the original method
+        function.__dict__.pop('forward', None)
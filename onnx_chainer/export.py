@@ -1,20 +1,26 @@
 from __future__ import print_function
 
 import collections
+import hashlib
+import heapq
+import os
+import threading
+import time
+import types
 import warnings
 
 import chainer
+import numpy
 import onnx
 from onnx.mapping import NP_TYPE_TO_TENSOR_TYPE
 
-from onnx_chainer import functions
 from onnx_chainer import mapping
 from onnx_chainer import onnx_helper
+from onnx_chainer import registry
 
 try:
     from onnx import checker
     from onnx import helper
-    from onnx import numpy_helper
 
     _available = True
 except ImportError:
@@ -31,7 +37,24 @@ def _check_available():
             '\t$ pip install onnx\n\n')
 
 
-def convert_parameter(parameter):
+def convert_parameter(parameter, name=None):
+    """Converts a parameter to an ONNX tensor.
+
+    Args:
+        parameter (~chainer.Parameter, ~chainer.Variable or array): The
+            parameter to be converted.
+        name (str): The name of the resulting tensor. If ``None``, the string
+            ID of ``parameter`` is used.
+
+    Returns:
+        An ``onnx.TensorProto`` object.
+
+    """
+
+    from onnx_chainer import serialization
+
+    if name is None:
+        name = str(id(parameter))
     if isinstance(parameter, chainer.Parameter):
         array = parameter.array
     elif isinstance(parameter, chainer.Variable):
@@ -44,36 +67,57 @@ def convert_parameter(parameter):
             'or Variable or ndarray, but the type was {}.'.format(
                 type(parameter)))
     array = chainer.cuda.to_cpu(array)
-    return numpy_helper.from_array(array, str(id(parameter)))
+    tensor = serialization.make_tensor_header(name, array)
+    serialization.set_raw_data(tensor, array)
+    return tensor
 
 
 def create_node(
         func_name, opset_version, func, input_names,
         output_names, parameters):
-    for opver in sorted(mapping.operators[func_name], reverse=True):
-        if opver <= opset_version:
-            break
-    opset_version = opver
-
-    converter_name = 'convert_{}'.format(func_name)
-    if hasattr(functions, converter_name):
-        onnx_helper.set_func_name(func_name)
-        converter = getattr(functions, converter_name)
-        nodes = converter(
-            func, opset_version, input_names, len(output_names),
-            parameters)
-        nodes = list(reversed(nodes))
-        assert len(nodes[0].output) == len(output_names)
-        nodes[0].output[:] = output_names
-    else:
-        raise ValueError('{} is not supported.'.format(func_name))
+    converter, opset_version = registry.get_registry(opset_version).get(
+        func_name)
+    return _convert(
+        func_name, converter, opset_version, func, input_names,
+        output_names, parameters)
+
+
+def _convert(func_name, converter, opset_version, func, input_names,
+             output_names, parameters):
+    onnx_helper.set_func_name(func_name)
+    nodes = converter(
+        func, opset_version, input_names, len(output_names), parameters)
+    nodes = list(reversed(nodes))
+    assert len(nodes[0].output) == len(output_names)
+    nodes[0].output[:] = output_names
     return nodes
 
 
-def rename_tensors(model):
-    names = {v.name: v.name for v in model.graph.initializer}
+def rename_tensors(model, param_names=None):
+    """Gives readable and deterministic names to the tensors of the model.
+
+    Args:
+        model (onnx.ModelProto): The model to be renamed in place.
+        param_names (dict): Names of the parameters keyed by their string
+            IDs. Initializers which are not found in this dictionary, e.g.
+            the constants created by converters, are named ``param_<n>`` in
+            the order of appearance, skipping the names already given.
+
+    """
+    names = {} if param_names is None else dict(param_names)
+    taken = set(names.values())
     op_counts = collections.defaultdict(int)
 
+    for v in model.graph.initializer:
+        if v.name not in names:
+            name = 'param_{}'.format(op_counts['param'])
+            while name in taken:
+                op_counts['param'] += 1
+                name = 'param_{}'.format(op_counts['param'])
+            names[v.name] = name
+            op_counts['param'] += 1
+        v.name = names[v.name]
+
     for op in model.graph.node:
         op_name = '{}_{}'.format(op.op_type, op_counts[op.op_type])
         op_counts[op.op_type] += 1
@@ -96,20 +140,133 @@ def rename_tensors(model):
             v.name = names[v.name]
 
 
-class ONNXExport(chainer.FunctionHook):
+def _walk_functions(outputs):
+    # Yields the functions which create `outputs` in descending order of
+    # rank, which is deterministic for the same computational graph
+    candidates = []
+    seen = set()
+
+    def add_candidate(function):
+        if function is not None and function not in seen:
+            # Negate rank since heapq is min-heap
+            heapq.heappush(
+                candidates, (-function.rank, len(seen), function))
+            seen.add(function)
+
+    for output in outputs:
+        add_candidate(output.creator_node)
+    while candidates:
+        _, _, function = heapq.heappop(candidates)
+        yield function
+        for i in function.inputs:
+            add_candidate(i.creator_node)
+
+
+def _unwrap(function):
+    if isinstance(function, chainer.function.FunctionAdapter):
+        return function.function
+    return function
 
-    def __init__(self, opset_version=None):
+
+def _changed_axes(shape, probe_shape):
+    if len(shape) != len(probe_shape):
+        raise ValueError(
+            'The number of dimensions changes with the sizes of the dynamic '
+            'axes: {} and {}'.format(shape, probe_shape))
+    return frozenset(
+        axis for axis, (s, t) in enumerate(zip(shape, probe_shape)) if s != t)
+
+
+def _detect_dynamic_axes(outputs, probe_outputs):
+    """Finds the axes whose sizes vary with the dynamic axes of the inputs.
+
+    The computational graphs created with the inputs of different sizes of
+    the dynamic axes are compared function by function.
+
+    Args:
+        outputs (list of ~chainer.Variable): The outputs of the network.
+        probe_outputs (list of ~chainer.Variable): The outputs of the network
+            computed from the inputs whose dynamic axes have different sizes.
+
+    Returns:
+        A dict of pairs of the lists of the dynamic axes of the inputs and
+        the outputs of each function, keyed by the ID of the function.
+
+    """
+    functions = list(_walk_functions(outputs))
+    probe_functions = list(_walk_functions(probe_outputs))
+    if len(functions) != len(probe_functions):
+        raise ValueError(
+            'The computational graph changes with the sizes of the dynamic '
+            'axes: {} and {} functions are called'.format(
+                len(functions), len(probe_functions)))
+
+    dynamic_axes = {}
+    for function, probe_function in zip(functions, probe_functions):
+        if type(function) is not type(probe_function) or \
+                len(function.inputs) != len(probe_function.inputs) or \
+                len(function.outputs) != len(probe_function.outputs):
+            raise ValueError(
+                'The computational graph changes with the sizes of the '
+                'dynamic axes: {} is called instead of {}'.format(
+                    probe_function.label, function.label))
+        input_axes = [
+            _changed_axes(x.shape, y.shape)
+            for x, y in zip(function.inputs, probe_function.inputs)]
+        output_axes = []
+        for x, y in zip(function.outputs, probe_function.outputs):
+            x, y = x(), y()
+            if x is None or y is None:
+                output_axes.append(frozenset())
+            else:
+                output_axes.append(_changed_axes(x.shape, y.shape))
+        dynamic_axes[id(_unwrap(function))] = input_axes, output_axes
+    return dynamic_axes
+
+
+class ONNXExport(object):
+
+    def __init__(self, opset_version=None, validator=None, profiler=None):
         self.graph = []
-        self.inputs = {}  # Input `Variable` objects keyed by string IDs
+        # Input `Variable` objects keyed by string IDs
+        self.inputs = collections.OrderedDict()
         # Renamed string IDs keyed by their original string IDs
         self.renamed_outputs = {}
         self.additional_parameters = []
         self.specified_opset_version = opset_version
+        self.registry = registry.get_registry(opset_version)
+        # Validates the nodes one by one as they are created, if given
+        self.validator = validator
+        # Records the time spent in each converter, if given
+        self.profiler = profiler
+
+    def trace(self, outputs, dynamic_axes=None):
+        """Converts the computational graph which creates ``outputs``.
+
+        Function nodes are visited by following ``creator_node`` from the
+        outputs, in the same order as backpropagation would visit them (in
+        descending order of rank). Unlike running ``chainer.grad``, no
+        backward computation is performed and no gradient is allocated.
 
-    def backward_postprocess(self, function, in_data, out_grad):
-        if isinstance(function, chainer.function.FunctionAdapter):
-            function = function.function
-        func_name = function.__class__.__name__
+        Args:
+            outputs (list of ~chainer.Variable): The output variables of the
+                network.
+            dynamic_axes (dict): Pairs of the lists of the dynamic axes of the
+                inputs and the outputs of each function, keyed by the ID of
+                the function. They are passed to the converters through
+                :func:`onnx_helper.dynamic_input_axes` and
+                :func:`onnx_helper.dynamic_output_axes`.
+        """
+        # Temporary names are made in a conversion context of this trace, so
+        # that concurrent exports do not share the counters
+        with onnx_helper.conversion_context(dynamic_axes):
+            for function in _walk_functions(outputs):
+                self.convert_function(function)
+
+    def convert_function(self, function):
+        function = _unwrap(function)
+        func_name, converter, opset_version = self.registry.lookup(
+            type(function))
         input_names = []
         for i in function.inputs:
             # 'i' is a VariableNode, so check if it has a Variable/Parameter
@@ -124,8 +281,14 @@ class ONNXExport(chainer.FunctionHook):
         # This is to get corresponding VariableNode id from the output
         # Variable of the network
         output_names = []
-        for o in function.outputs:
-            var = o().get_variable_or_none()
+        for j, o in enumerate(function.outputs):
+            node = o()
+            if node is None:
+                # The output is not used anywhere, so it is only given a
+                # unique name
+                output_names.append('{}_{}'.format(id(function), j))
+                continue
+            var = node.get_variable_or_none()
             if var is not None:  # If the output is kept
                 output_name = str(id(var))
                 if output_name in self.inputs:
@@ -135,38 +298,669 @@ class ONNXExport(chainer.FunctionHook):
                     id_node = onnx_helper.make_node(
                         'Identity', [output_name], 1)
                     self.renamed_outputs[output_name] = id_node.output[0]
-                    self.graph.append(id_node)
+                    self._append(id_node)
                     del self.inputs[output_name]
             else:
-                output_name = str(id(o()))
+                output_name = str(id(node))
             output_names.append(output_name)
 
-        opset_versions = mapping.operators[func_name]
-        if isinstance(opset_versions, int):
-            opset_version = opset_versions
-        elif self.specified_opset_version is None:
-            # If no opset version is specified,
-            # use the latest version for the operator
-            opset_version = opset_versions[-1]
+        if self.profiler is None:
+            nodes = _convert(
+                func_name, converter, opset_version, function, input_names,
+                output_names, self.additional_parameters)
         else:
-            # If a version is specified, use the last version <= specified one
-            for opset_version in sorted(opset_versions, reverse=True):
-                if opset_version <= self.specified_opset_version:
-                    break
+            start = time.perf_counter()
+            nodes = _convert(
+                func_name, converter, opset_version, function, input_names,
+                output_names, self.additional_parameters)
+            self.profiler.add_converter_call(
+                func_name, time.perf_counter() - start)
+        for node in nodes:
+            self._append(node)
+
+    def _append(self, node):
+        if self.validator is not None:
+            self.validator.check_node(node)
+        self.graph.append(node)
 
-        if opset_version > self.specified_opset_version:
-            raise RuntimeError('ONNX-chainer cannot convert `{}` of Chainer '
-                               'with ONNX opset_version {}'.format(
-                                   func_name, self.specified_opset_version))
 
-        nodes = create_node(
-            func_name, opset_version, function, input_names,
-            output_names, self.additional_parameters)
-        self.graph.extend(nodes)
+def _param_name(path):
+    return 'param' + path.replace('/', '_')
+
+
+def _named_arrays(model):
+    """Returns arrays of parameters and persistent values keyed by names.
+
+    The names are derived from the paths of the parameters in the link tree,
+    so they do not change among models of the same architecture.
+    """
+    arrays = collections.OrderedDict()
+    for path, param in model.namedparams():
+        arrays.setdefault(_param_name(path), param.array)
+    for name, array in _named_persistents(model):
+        arrays.setdefault(name, array)
+    return arrays
+
+
+def _named_persistents(model):
+    for path, link in model.namedlinks():
+        for name in sorted(link._persistent):
+            value = link.__dict__[name]
+            if isinstance(value, chainer.get_array_types()):
+                yield _param_name(path.rstrip('/') + '/' + name), value
+
+
+class _ExportCache(object):
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_export_cache = _ExportCache(maxsize=16)
+
+
+def clear_export_cache():
+    """Removes all the models cached by :func:`export`."""
+    _export_cache.clear()
+
+
+# The attributes which every link has, which are not part of the signature
+_LINK_ATTRIBUTES = frozenset(
+    list(chainer.Chain().__dict__) + list(chainer.ChainList().__dict__))
+
+_SCALAR_TYPES = (bool, int, float, str, bytes, type(None), type, numpy.dtype)
+
+
+def _value_signature(value, link_paths):
+    """Returns a hashable signature of an attribute of a link.
+
+    Links are identified by their paths, and functions by themselves.
+    ``None`` is returned if the value could affect the computation in a way
+    the signature cannot tell, e.g. arrays, closures and other objects.
+    """
+    if isinstance(value, _SCALAR_TYPES):
+        return type(value), value
+    if isinstance(value, chainer.Link):
+        path = link_paths.get(id(value))
+        return None if path is None else ('link', path)
+    if isinstance(value, (types.FunctionType, types.BuiltinFunctionType)):
+        if getattr(value, '__closure__', None):
+            return None
+        return 'function', value
+    if isinstance(value, types.MethodType):
+        function = _value_signature(value.__func__, link_paths)
+        owner = _value_signature(value.__self__, link_paths)
+        if function is None or owner is None:
+            return None
+        return 'method', function, owner
+    if isinstance(value, (list, tuple)):
+        items = [_value_signature(item, link_paths) for item in value]
+    elif isinstance(value, dict):
+        items = [(_value_signature(k, link_paths),
+                  _value_signature(v, link_paths))
+                 for k, v in sorted(value.items(), key=lambda kv: repr(kv[0]))]
+        items = [None if None in item else item for item in items]
+    else:
+        return None
+    if None in items:
+        return None
+    return type(value), tuple(items)
+
+
+def _link_signature(link, link_paths):
+    # Returns None if the link has an attribute which cannot be signed
+    attributes = []
+    for name, value in sorted(link.__dict__.items()):
+        if name in _LINK_ATTRIBUTES or name in link._params or \
+                name in link._persistent:
+            continue
+        if isinstance(link, chainer.Chain) and name in link._children:
+            continue
+        signature = _value_signature(value, link_paths)
+        if signature is None:
+            return None
+        attributes.append((name, signature))
+    return type(link), tuple(attributes)
+
+
+def _cache_key(model, args, opset_version, export_params, graph_name,
+               keep_initializers_as_inputs, dynamic_axes):
+    """Returns a key to look up the export cache, or ``None`` if uncachable.
+
+    The key consists of the structure of the link tree including the
+    attributes of the links, e.g. the functions of a
+    :class:`~chainer.Sequential`, the shapes and dtypes of the parameters and
+    the inputs, and the export options. Models with uninitialized parameters
+    or attributes which cannot be compared, e.g. arrays and closures, are not
+    cached.
+    """
+    if isinstance(args, dict):
+        args = list(args.items())
+    elif isinstance(args, (list, tuple)):
+        args = list(enumerate(args))
+    else:
+        args = [(None, args)]
+    input_types = chainer.get_array_types() + (chainer.Variable,)
+    inputs = []
+    for key, arg in args:
+        if not isinstance(arg, input_types):
+            return None
+        inputs.append((key, arg.shape, str(arg.dtype)))
+
+    link_paths = {id(link): path for path, link in model.namedlinks()}
+    links = []
+    for path, link in model.namedlinks():
+        signature = _link_signature(link, link_paths)
+        if signature is None:
+            return None
+        links.append((path,) + signature)
+    if any(param.array is None for param in model.params()):
+        return None
+    params = []
+    for name, array in _named_arrays(model).items():
+        params.append((name, array.shape, str(array.dtype)))
+
+    try:
+        if dynamic_axes:
+            dynamic_axes = tuple(sorted(
+                (key, tuple(sorted(axes.items())))
+                for key, axes in dynamic_axes.items()))
+        key = (tuple(links), tuple(params), tuple(inputs), opset_version,
+               export_params, graph_name, keep_initializers_as_inputs,
+               dynamic_axes)
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+def _load_without_external_data(f):
+    # The external data is kept in its files, which are updated in place
+    from onnx_chainer import serialization
+
+    if serialization.EXTERNAL_DATA_SUPPORTED:
+        return onnx.load(f, load_external_data=False)
+    return onnx.load(f)
+
+
+def _refresh_initializers(onnx_model, arrays, workers=None, base_dir=None):
+    """Replaces initializers of the model with the given arrays in place.
+
+    The values of the initializers stored externally are overwritten in
+    their external data files instead.
+
+    Args:
+        onnx_model (onnx.ModelProto): The model to be updated.
+        arrays (dict): Arrays keyed by the names of initializers. Initializers
+            whose names are not found are left untouched.
+        workers (int): The number of threads to convert the arrays.
+        base_dir (str): The directory where the external data files are.
+
+    Returns:
+        A set of the names of the replaced initializers.
+
+    """
+
+    from onnx_chainer import serialization
+
+    tensors = []
+    for tensor in onnx_model.graph.initializer:
+        array = arrays.get(tensor.name)
+        if array is None:
+            continue
+        if tuple(tensor.dims) != array.shape or \
+                tensor.data_type != NP_TYPE_TO_TENSOR_TYPE[array.dtype]:
+            raise ValueError(
+                'The parameter {} does not match with the initializer of the '
+                'ONNX model: shape {} and dtype {} are expected, but the '
+                'parameter has shape {} and dtype {}.'.format(
+                    tensor.name, tuple(tensor.dims),
+                    mapping.TENSOR_TYPE_TO_NAME[tensor.data_type],
+                    array.shape, array.dtype))
+        tensors.append(tensor)
+    external = [tensor for tensor in tensors
+                if serialization.is_external(tensor)]
+    if external:
+        serialization.overwrite_external_data(
+            external, [arrays[tensor.name] for tensor in external], base_dir)
+        tensors = [tensor for tensor in tensors
+                   if not serialization.is_external(tensor)]
+    serialization.set_raw_data_many(
+        tensors, [arrays[tensor.name] for tensor in tensors], workers)
+    return {tensor.name for tensor in tensors + external}
+
+
+def _check_model(onnx_model):
+    # The checker serializes the whole model, which would copy all the
+    # parameter values once more. It also does not accept initializers
+    # without data, and looks for external data files in the current
+    # directory. The initializers are made consistent with their headers by
+    # construction, so the model is checked with graph inputs in place of
+    # them.
+    checker.check_model(_inputs_for_initializers(onnx_model))
+
+
+def _inputs_for_initializers(onnx_model, keep=None):
+    # Returns a copy of the model in which the initializers are replaced
+    # with graph inputs, except those satisfying `keep`
+    from onnx_chainer import serialization
+
+    copied = serialization.without_initializers(onnx_model)
+    input_names = {i.name for i in copied.graph.input}
+    for tensor in onnx_model.graph.initializer:
+        if keep is not None and keep(tensor):
+            copied.graph.initializer.add().CopyFrom(tensor)
+        elif tensor.name not in input_names:
+            copied.graph.input.extend([helper.make_tensor_value_info(
+                tensor.name, tensor.data_type, tensor.dims)])
+    return copied
+
+
+def _deduplicate_initializers(initializer_arrays, param_names):
+    """Merges the initializers which have the same values.
+
+    Initializers of the same array, e.g. a persistent value used by several
+    functions, are merged into the first one. The other initializers, e.g.
+    the constants made by converters, are merged if their dtypes, shapes and
+    values are the same. The parameters and persistent values are never
+    merged by values, since they must stay distinct to be refreshed.
+
+    Args:
+        initializer_arrays (list): Pairs of string IDs and arrays of the
+            initializers.
+        param_names (dict): Names of the parameters and persistent values
+            keyed by their string IDs.
+
+    Returns:
+        A tuple of the pairs of the remaining initializers, and a dict of the
+        string IDs of the merged initializers keyed by the removed ones.
+
+    """
+
+    from onnx_chainer import serialization
+
+    kept = []
+    aliases = {}
+    by_array = {}
+    by_content = {}
+    for name, array in initializer_arrays:
+        if id(array) in by_array:
+            aliases[name] = by_array[id(array)]
+            continue
+        by_array[id(array)] = name
+        if name not in param_names:
+            raw = serialization.as_raw_array(array)
+            key = (raw.dtype.str, raw.shape,
+                   hashlib.sha1(memoryview(raw.reshape(-1)).cast('B'))
+                   .digest())
+            if key in by_content:
+                aliases[name] = by_content[key]
+                continue
+            by_content[key] = name
+        kept.append((name, array))
+    return kept, aliases
+
+
+def _as_array(parameter):
+    if isinstance(parameter, chainer.Variable):
+        return parameter.array
+    return parameter
+
+
+def _write(onnx_model, fp, stream_arrays):
+    # The model is written tensor by tensor, so that the whole model is not
+    # serialized in memory at once
+    from onnx_chainer import serialization
+
+    return serialization.write_model(onnx_model, fp, stream_arrays)
+
+
+def _save(onnx_model, filename, save_text, stream_arrays=None):
+    # Returns the number of bytes written to the model file
+    from onnx_chainer import serialization
+
+    written = 0
+    if filename is not None and isinstance(filename, str):
+        with open(filename, 'wb') as fp:
+            written = _write(onnx_model, fp, stream_arrays)
+        if save_text:
+            with open(filename + '.txt', 'w') as fp:
+                serialization.write_text(onnx_model, fp, stream_arrays)
+    elif hasattr(filename, 'write'):
+        written = _write(onnx_model, filename, stream_arrays)
+    return written
+
+
+def _as_input_variable(arg, abstract):
+    from onnx_chainer import abstract_forward
+
+    if abstract and isinstance(
+            arg, chainer.get_array_types() + (chainer.Variable,)):
+        xp = chainer.cuda.get_array_module(arg)
+        arg = abstract_forward.placeholder(arg.shape, arg.dtype, xp)
+    if isinstance(arg, chainer.get_array_types()):
+        return chainer.Variable(arg)
+    return arg
+
+
+def _prepare_args(args, abstract):
+    # Returns the arguments converted to variables, the network inputs and
+    # their keys, which are the indices of a list or the keys of a dict
+    network_inputs = []
+    keys = []
+    if isinstance(args, tuple):
+        args = list(args)
+    if isinstance(args, list):
+        for i, arg in enumerate(args):
+            args[i] = _as_input_variable(arg, abstract)
+            network_inputs.append(args[i])
+            keys.append(i)
+    elif isinstance(args, dict):
+        for key, arg in args.items():
+            args[key] = _as_input_variable(arg, abstract)
+            network_inputs.append(args[key])
+            keys.append(key)
+    elif isinstance(args, chainer.get_array_types() + (chainer.Variable,)):
+        args = _as_input_variable(args, abstract)
+        network_inputs.append(args)
+        keys.append(0)
+    else:
+        raise ValueError(
+            'The \'args\' argument should be a list, tuple, dict, '
+            'numpy array, or Chainer Variable. But a {} object was '
+            'given.'.format(type(args)))
+    return args, network_inputs, keys
+
+
+def _normalize_dynamic_axes(dynamic_axes, args):
+    # Returns dicts of the names of the dynamic axes keyed by the axes, keyed
+    # by the keys of the inputs
+    if isinstance(args, (list, tuple)):
+        inputs = dict(enumerate(args))
+    elif isinstance(args, dict):
+        inputs = args
+    else:
+        inputs = {0: args}
+    normalized = {}
+    for key, axes in dynamic_axes.items():
+        if key not in inputs:
+            raise ValueError(
+                'dynamic_axes has the key {!r} which is not found in '
+                'args'.format(key))
+        if not isinstance(axes, dict):
+            axes = {axis: '{}_dim{}'.format(key, axis) for axis in axes}
+        ndim = len(inputs[key].shape)
+        normalized[key] = {axis % ndim: name for axis, name in axes.items()}
+    return normalized
+
+
+def _probe_args(args, dynamic_axes):
+    # Returns a copy of the arguments whose dynamic axes are one longer. The
+    # leading entries are repeated so that the values stay valid, e.g. as
+    # indices of an embedding.
+    def expand(key, arg):
+        if key not in dynamic_axes:
+            return arg
+        if isinstance(arg, chainer.Variable):
+            arg = arg.array
+        xp = chainer.cuda.get_array_module(arg)
+        for axis in dynamic_axes[key]:
+            size = arg.shape[axis]
+            arg = arg.take(xp.arange(size + 1) % size, axis=axis)
+        return arg
+
+    if isinstance(args, (list, tuple)):
+        return [expand(i, arg) for i, arg in enumerate(args)]
+    elif isinstance(args, dict):
+        return {key: expand(key, arg) for key, arg in args.items()}
+    return expand(0, args)
+
+
+def _describe_dynamic_axes(dynamic_axes):
+    return ', '.join(
+        '{!r} (axis {} of the input {!r})'.format(name, axis, key)
+        for key, axes in dynamic_axes.items()
+        for axis, name in sorted(axes.items()))
+
+
+def _keyed_inputs(args, values):
+    # Returns `values` given in the same structure as `args` as a dict keyed
+    # by the keys of the inputs
+    if isinstance(args, (list, tuple)):
+        return collections.OrderedDict(enumerate(values))
+    elif isinstance(args, dict):
+        return collections.OrderedDict(
+            (key, values[key]) for key in args)
+    return collections.OrderedDict([(0, values)])
+
+
+def _signature_sizes(args, signatures, dynamic_axes):
+    """Finds the dynamic axes and their sizes of input signatures.
+
+    Args:
+        args (list, dict or array): The arguments of the model.
+        signatures (list): The shapes of the inputs given in the same
+            structure as ``args``.
+        dynamic_axes (dict): Normalized dynamic axes given by the user.
+
+    Returns:
+        A tuple of the normalized dynamic axes which cover all the axes
+        whose sizes differ among the signatures, a list of dicts of the sizes
+        keyed by the names of the dynamic axes for each signature, and a list
+        of the labels of the signatures.
+
+    """
+    shapes = _keyed_inputs(args, args)
+    dynamic_axes = {
+        key: dict(axes) for key, axes in (dynamic_axes or {}).items()}
+    signatures = [_keyed_inputs(args, signature) for signature in signatures]
+    for signature in signatures:
+        for key, x in shapes.items():
+            if len(signature[key]) != len(x.shape):
+                raise ValueError(
+                    'The signature {} of the input {!r} does not have the '
+                    'same number of dimensions as {}'.format(
+                        tuple(signature[key]), key, x.shape))
+            for axis, size in enumerate(signature[key]):
+                if size != x.shape[axis]:
+                    dynamic_axes.setdefault(key, {}).setdefault(
+                        axis, '{}_dim{}'.format(key, axis))
+
+    names = []
+    for key in shapes:
+        for axis, name in sorted(dynamic_axes.get(key, {}).items()):
+            if name not in names:
+                names.append(name)
+    all_sizes = []
+    labels = []
+    for signature in signatures:
+        sizes = {}
+        for key, axes in dynamic_axes.items():
+            for axis, name in axes.items():
+                size = sizes.setdefault(name, signature[key][axis])
+                if size != signature[key][axis]:
+                    raise ValueError(
+                        'The dynamic axes named {} have different sizes in '
+                        'a signature'.format(name))
+        all_sizes.append(sizes)
+        labels.append('x'.join(str(sizes[name]) for name in names))
+    return dynamic_axes, all_sizes, labels
+
+
+def _specialize(onnx_model, sizes):
+    """Replaces the symbolic dimensions of a model with the given sizes.
+
+    The sizes of the symbolic dimensions of the outputs are inferred by the
+    shape inference of ONNX where possible.
+
+    Args:
+        onnx_model (onnx.ModelProto): The model to be updated in place.
+        sizes (dict): The sizes keyed by the names of the dimensions.
+
+    """
+
+    from onnx_chainer import serialization
+
+    graph = onnx_model.graph
+    for value_info in graph.input:
+        for dim in value_info.type.tensor_type.shape.dim:
+            if dim.HasField('dim_param') and dim.dim_param in sizes:
+                dim.dim_value = sizes[dim.dim_param]
+
+    # The external initializers are not needed, and only the small ones
+    # such as the shapes of Reshape are kept for the shape inference
+    inferred = onnx.shape_inference.infer_shapes(_inputs_for_initializers(
+        onnx_model, keep=lambda t: not serialization.is_external(t)))
+    for output, inferred_output in zip(graph.output, inferred.graph.output):
+        dims = output.type.tensor_type.shape.dim
+        inferred_dims = inferred_output.type.tensor_type.shape.dim
+        if len(dims) != len(inferred_dims):
+            continue
+        for dim, inferred_dim in zip(dims, inferred_dims):
+            if dim.HasField('dim_param') and \
+                    inferred_dim.HasField('dim_value'):
+                dim.dim_value = inferred_dim.dim_value
+
+
+def _save_signatures(onnx_model, filename, save_text, all_sizes, labels):
+    # Saves the variants of the model specialized for the signatures, which
+    # share the external data files of the model
+    root, ext = os.path.splitext(filename)
+    variants = []
+    written = 0
+    for sizes, label in zip(all_sizes, labels):
+        variant = onnx.ModelProto()
+        variant.CopyFrom(onnx_model)
+        _specialize(variant, sizes)
+        written += _save(
+            variant, '{}_{}{}'.format(root, label, ext), save_text)
+        variants.append(variant)
+    return variants, written
+
+
+def _flatten_outputs(outputs):
+    if isinstance(outputs, (list, tuple)):
+        return outputs
+    elif isinstance(outputs, dict):
+        return list(outputs.values())
+    elif isinstance(outputs, chainer.Variable):
+        return [outputs]
+    raise RuntimeError(
+        'Unexpected output type from the model: {}'.format(type(outputs)))
+
+
+def _opset_version_or_default(opset_version):
+    if opset_version is None:
+        return int(onnx.defs.onnx_opset_version())
+    elif opset_version < MINIMUM_OPSET_VERSION:
+        warnings.warn(
+            'ONNX-Chainer has been tested only with opset_version >= {m}. '
+            'This is because ONNXRuntime supports only opset_version >= {m}. '
+            'The ONNX file exported with your requested opset_version ({o}) '
+            'may cause some problems because the converters used for the '
+            'opset_version have not been tested.'.format(
+                m=MINIMUM_OPSET_VERSION,
+                o=opset_version)
+        )
+    return opset_version
+
+
+def _graph_leaves(outputs, inputs):
+    """Classifies the leaf variables of the computational graph.
+
+    Args:
+        outputs (list of ~chainer.Variable): The outputs of the graph.
+        inputs (list of ~chainer.Variable): The inputs of the graph, or
+            ``None`` to use all the leaves except parameters as inputs.
+
+    Returns:
+        A tuple of the inputs, the parameters and the pairs of the string IDs
+        and the arrays of the constants. If ``inputs`` is ``None``, the
+        inputs are the leaf variables in the order of the functions using
+        them, or their variable nodes if the variables are not alive.
+
+    """
+    functions = list(_walk_functions(outputs))
+    found_inputs = []
+    params = []
+    constants = []
+    seen = set()
+    # The functions are visited from the ones closest to the inputs
+    for function in reversed(functions):
+        for node in function.inputs:
+            if node.creator_node is not None or id(node) in seen:
+                continue
+            seen.add(id(node))
+            var = node.get_variable_or_none()
+            if isinstance(var, chainer.Parameter):
+                params.append(var)
+            elif inputs is None:
+                found_inputs.append(node if var is None else var)
+            elif var is None:
+                # Variables which are alive and not inputs are found by the
+                # conversion, and exported as constants
+                if node.data is None:
+                    raise ValueError(
+                        'The value of an input of {} is not retained, so it '
+                        'must be given in inputs'.format(
+                            _unwrap(function).label))
+                constants.append((str(id(node)), node.data))
+    if inputs is None:
+        return found_inputs, params, constants
+    return list(inputs), params, constants
+
+
+def _remove_unused_inputs(onnx_model):
+    # Leaves which the converters do not use, e.g. the statistics given to
+    # the batch normalization as arrays, are not inputs of the graph
+    graph = onnx_model.graph
+    used = {name for node in graph.node for name in node.input}
+    used.update(tensor.name for tensor in graph.initializer)
+    inputs = [v for v in graph.input if v.name in used]
+    del graph.input[:]
+    graph.input.extend(inputs)
+
+
+def _forward(model, args):
+    # The configuration is scoped to the current thread and this call, so
+    # that concurrent exports and the caller are not affected
+    with chainer.using_config('train', False), \
+            chainer.using_config('enable_backprop', True):
+        if isinstance(args, list):
+            return model(*args)
+        elif isinstance(args, dict):
+            return model(**args)
+        else:
+            return model(args)
 
 
 def export(model, args, filename=None, export_params=True,
-           graph_name='Graph', save_text=False, opset_version=None):
+           graph_name='Graph', save_text=False, opset_version=None,
+           abstract=False, use_cache=False, stream=False,
+           external_data=False, external_data_threshold=1024,
+           external_data_shard_size=None, workers=None,
+           keep_initializers_as_inputs=None, dynamic_axes=None,
+           signatures=None, check='full', profiler=None, optimize=0):
     """Export function for chainer.Chain in ONNX format.
 
     This function performs a forward computation of the given
@@ -196,151 +990,685 @@ def export(model, args, filename=None, export_params=True,
             or ``None`` is given, the latest opset version of the onnx module
             is used. If an integer is given, it will be ensured that all the
             operator version in the exported ONNX file is less than this value.
+        abstract (bool): If True, the forward computation runs on placeholder
+            arrays which only carry the shapes and dtypes of ``args``, and the
+            kernels of the common functions such as convolution, linear,
+            pooling and elementwise operations are skipped. The exported graph
+            is the same as the one exported with real inputs, but exporting
+            for a large input takes almost as long as for a small one. The
+            values of ``args`` are not used at all in this mode.
+        use_cache (bool): If True, the exported model is kept in a bounded
+            in-process cache keyed by the structure of the link tree, the
+            shapes and dtypes of ``args``, and the export options. When the
+            same architecture is exported again, the forward computation,
+            the conversion and the check are skipped and only the parameter
+            values are taken from ``model``. The attributes of the links,
+            e.g. the functions of a :class:`~chainer.Sequential`, are part of
+            the key, and models with attributes which cannot be compared,
+            e.g. arrays and closures, are not cached. It should only be used
+            with models whose computation is determined by their links.
+        stream (bool): If True, the values of the initializers are written
+            to ``filename`` directly from the parameter arrays one by one,
+            instead of serializing the whole model in memory. The extra
+            memory needed for saving is at most about the size of the
+            largest parameter. ``filename`` must be given in this mode, and
+            the initializers of the returned model only have their names,
+            shapes and dtypes.
+        external_data (bool): If True, the values of the initializers are
+            stored in external data files in the same directory as
+            ``filename``, which must be a filename, and the model file only
+            refers to them. This is required for models larger than 2 GB,
+            which cannot be stored in a single protobuf message. The files
+            are named ``<filename>.data``, or ``<filename>.<index>.data`` if
+            ``external_data_shard_size`` is given. The values are written
+            directly from the parameter arrays. They can be loaded with
+            :func:`onnx_chainer.testing.external_data.load_model`.
+        external_data_threshold (int): The minimum size in bytes of the
+            initializers to be stored externally. Smaller ones are kept in
+            the model file.
+        external_data_shard_size (int): The maximum size in bytes of each
+            external data file. If ``None``, all the values are stored in
+            one file.
+        workers (int): The number of threads to convert the parameter
+            values into the initializers concurrently. If ``None``, they are
+            converted one by one. The result does not depend on this value.
+        keep_initializers_as_inputs (bool): If True, the initializers are
+            also listed in the graph inputs, so that they can be overridden
+            by the callers of the model. Runtimes do not treat such
+            initializers as constants, e.g. they do not fold or pre-pack
+            them. If ``None``, they are listed only if the IR version of the
+            onnx module is less than 4, which requires it. They are always
+            listed if ``export_params`` is False.
+        dynamic_axes (dict): The axes of the inputs whose sizes are not
+            fixed in the exported model, e.g. the batch axis. The keys are
+            the indices of ``args`` if it is a list or a tuple, its keys if
+            it is a dict, or ``0`` if it is a single array. Each value is
+            either a list of the axes, or a dict of the names of the axes
+            keyed by the axes. The names are written as symbolic dimensions
+            of the inputs and the outputs of the graph, and axes of the same
+            name should have the same size. The forward computation is run
+            once more with the sizes of the dynamic axes increased by one to
+            find which sizes depend on them, and the converters emit nodes
+            which do not embed those sizes. The computational graph must not
+            change with the sizes, and a ``ValueError`` is raised if the
+            model does not accept the increased sizes.
+        signatures (list): The shapes of the inputs for which specialized
+            models are exported, e.g. the shapes of several batch sizes.
+            Each signature is given in the same structure as ``args``, i.e.
+            a list or a dict of the shapes, or a single shape. The axes whose
+            sizes differ among ``args`` and the signatures are made dynamic,
+            and the model is traced only once. ``filename`` must be a str.
+            The model with the dynamic axes is saved to ``filename`` with
+            its initializers stored as external data, and the specialized
+            models are saved to ``<root>_<label><ext>``, where ``<label>``
+            is the sizes of the dynamic axes joined by ``x``. All of them
+            share the same external data files, which hold all the
+            initializers regardless of ``external_data_threshold``, so that
+            :func:`refresh_params` on ``filename`` updates all of them.
+        check (str): How the exported model is validated. ``'full'`` runs
+            :func:`onnx.checker.check_model`, which serializes the whole
+            graph. ``'structural'`` validates each node against the operator
+            schema as it is created, and then checks the static single
+            assignment, the topological order and the dangling inputs of the
+            graph in a single pass, without serializing the model.
+            ``'off'`` skips the validation.
+        profiler (~onnx_chainer.profiling.Profiler): If given, the wall
+            time and the peak memory of each phase of the export, the calls
+            and the time of each converter, the numbers of the nodes and the
+            initializers, and the bytes written are collected into
+            ``profiler.report``.
+        optimize (int or ~onnx_chainer.optimize.PassManager): The
+            optimization level from 0 to 3 of the exported graph, or a pass
+            manager which runs custom passes. See
+            :class:`~onnx_chainer.optimize.PassManager` for the levels. The
+            optimized model may not be updated by :func:`refresh_params`,
+            since the passes may fold parameters into other initializers.
+            The initializers kept as graph inputs are not folded, so the
+            optimization has little effect with
+            ``keep_initializers_as_inputs=True``, which is the default with
+            onnx older than 1.4.0.
 
     Returns:
-        An ONNX model object.
+        An ONNX model object, or a list of the specialized ONNX model
+        objects if ``signatures`` is given.
 
     """
 
+    from onnx_chainer import profiling
+    from onnx_chainer import serialization
+    from onnx_chainer import validation
+
     _check_available()
 
-    chainer.config.train = False
-    chainer.config.enable_backprop = True
+    if check not in validation.CHECK_LEVELS:
+        raise ValueError('check must be one of {}, but {!r} was given'.format(
+            ', '.join(validation.CHECK_LEVELS), check))
 
-    if opset_version is None:
-        opset_version = int(onnx.defs.onnx_opset_version())
-    elif opset_version < MINIMUM_OPSET_VERSION:
-        warnings.warn(
-            'ONNX-Chainer has been tested only with opset_version >= {m}. '
-            'This is because ONNXRuntime supports only opset_version >= {m}. '
-            'The ONNX file exported with your requested opset_version ({o}) '
-            'may cause some problems because the converters used for the '
-            'opset_version have not been tested.'.format(
-                m=MINIMUM_OPSET_VERSION,
-                o=opset_version)
-        )
+    if not export_params:
+        keep_initializers_as_inputs = True
+    elif keep_initializers_as_inputs is None:
+        keep_initializers_as_inputs = onnx.IR_VERSION < 4
 
-    # Forward computation
-    network_inputs = []
-    if isinstance(args, tuple):
-        args = list(args)
-    if isinstance(args, list):
-        for i, arg in enumerate(args):
-            if isinstance(arg, chainer.get_array_types()):
-                args[i] = chainer.Variable(arg)
-            network_inputs.append(args[i])
-        flat_args = args
-        outputs = model(*args)
-    elif isinstance(args, dict):
-        for key, arg in args.items():
-            if isinstance(arg, chainer.get_array_types()):
-                args[key] = chainer.Variable(arg)
-            network_inputs.append(args[key])
-        flat_args = list(args.values())
-        outputs = model(**args)
-    elif isinstance(args, chainer.get_array_types()):
-        args = chainer.Variable(args)
-        network_inputs.append(args)
-        flat_args = [args]
-        outputs = model(args)
-    elif isinstance(args, chainer.Variable):
-        network_inputs.append(args)
-        flat_args = [args]
-        outputs = model(args)
-    else:
+    if stream and filename is None:
+        raise ValueError('filename must be given to export with stream=True')
+    if external_data and not isinstance(filename, str) and \
+            signatures is None:
         raise ValueError(
-            'The \'args\' argument should be a list, tuple, dict, '
-            'numpy array, or Chainer Variable. But a {} object was '
-            'given.'.format(type(args)))
+            'filename must be a str to export with external_data=True')
+
+    opset_version = _opset_version_or_default(opset_version)
 
-    initializers = []
+    if dynamic_axes:
+        dynamic_axes = _normalize_dynamic_axes(dynamic_axes, args)
+    signature_sizes = signature_labels = None
+    if signatures is not None:
+        if not isinstance(filename, str):
+            raise ValueError(
+                'filename must be a str to export with signatures')
+        dynamic_axes, signature_sizes, signature_labels = _signature_sizes(
+            args, signatures, dynamic_axes)
+        external_data = True
+        # Initializers kept in the models would be copied to every variant,
+        # and would not be updated by refresh_params
+        external_data_threshold = 0
+    if external_data:
+        serialization.check_external_data_supported()
+
+    pass_manager = _pass_manager(optimize)
+
+    if profiler is None:
+        profiler = profiling.null_profiler
+    with profiler.export():
+        return _export(
+            model, args, filename, export_params, graph_name, save_text,
+            opset_version, abstract, use_cache, stream, external_data,
+            external_data_threshold, external_data_shard_size, workers,
+            keep_initializers_as_inputs, dynamic_axes, check,
+            signature_sizes, signature_labels, profiler, pass_manager)
+
+
+def _build_model(outputs, network_inputs, input_keys, params,
+                 persistent_names, constants, graph_name, opset_version,
+                 export_params, keep_initializers_as_inputs, dynamic_axes,
+                 function_axes, probe_outputs, check, profiler):
+    """Converts the computational graph of the outputs to an ONNX model.
+
+    Args:
+        outputs (list of ~chainer.Variable): The outputs of the network.
+        network_inputs (list): The input variables of the network, or the
+            variable nodes if the variables are not alive.
+        input_keys (list): The keys of the inputs used in ``dynamic_axes``.
+        params (list): Pairs of the stable names and the parameters, which
+            are exported as initializers.
+        persistent_names (dict): Stable names of persistent arrays keyed by
+            their IDs, used for the constants made from them.
+        constants (list): Pairs of the string IDs and the arrays of the
+            variable nodes which are exported as constant initializers.
+        probe_outputs (list of ~chainer.Variable): The outputs of the probe
+            with larger sizes of the dynamic axes, or ``None``.
+
+    Returns:
+        A tuple of the model whose initializers hold no data yet and the
+        arrays of the initializers keyed by their names.
+
+    """
+
+    from onnx_chainer import profiling
+    from onnx_chainer import serialization
+    from onnx_chainer import validation
+
+    # Pairs of string IDs and arrays of the initializers. The arrays are
+    # converted to tensors only after the model is built.
+    initializer_arrays = []
     input_tensors = []
-    param_names = set()
-    for param in model.params():
-        param_names.add(str(id(param)))
-        tensor = convert_parameter(param)
-        initializers.append(tensor)
+    # Stable names of parameters and persistent values keyed by string IDs
+    param_names = {}
+    for name, param in params:
+        param_id = str(id(param))
+        if param_id in param_names:
+            continue
+        param_names[param_id] = name
+        initializer_arrays.append((param_id, param.array))
         input_tensors.append(helper.make_tensor_value_info(
-            str(id(param)), tensor.data_type, tensor.dims))
+            param_id, NP_TYPE_TO_TENSOR_TYPE[param.dtype], param.shape))
 
     network_input_names = set()
-    for i in network_inputs:
+    # Names of the dynamic axes keyed by their sizes in the forward
+    # computation and in the probe
+    dim_names = {}
+    for key, i in zip(input_keys, network_inputs):
         network_input_names.add(str(id(i)))
+        shape = list(i.shape)
+        if dynamic_axes and key in dynamic_axes:
+            for axis, name in sorted(dynamic_axes[key].items()):
+                dim_names.setdefault((shape[axis], shape[axis] + 1), name)
+                shape[axis] = name
         input_tensors.append(helper.make_tensor_value_info(
-            str(id(i)), NP_TYPE_TO_TENSOR_TYPE[i.dtype], i.shape))
-
-    with ONNXExport(opset_version) as o:
-        if isinstance(outputs, (list, tuple)):
-            flat_outputs = outputs
-        elif isinstance(outputs, dict):
-            flat_outputs = list(outputs.values())
-        elif isinstance(outputs, chainer.Variable):
-            flat_outputs = [outputs]
-        else:
-            raise RuntimeError(
-                'Unexpected output type from the model: {}'.format(
-                    type(outputs)))
-        chainer.grad(flat_outputs, list(model.params()) + flat_args)
-
-    implicit_input_names = set(o.inputs.keys()) - param_names -\
-        network_input_names
-    for name in implicit_input_names:
-        tensor = convert_parameter(o.inputs[name])
-        initializers.append(tensor)
+            str(id(i)), NP_TYPE_TO_TENSOR_TYPE[i.dtype], shape))
+
+    validator = None
+    if check == 'structural':
+        validator = validation.NodeValidator(opset_version)
+    profiler.phase('convert')
+    o = ONNXExport(
+        opset_version, validator,
+        None if profiler is profiling.null_profiler else profiler)
+    # The converters of some functions, e.g. the batch normalization, read
+    # the mode from the configuration
+    with chainer.using_config('train', False):
+        o.trace(outputs, function_axes)
+
+    profiler.phase('build')
+
+    implicit_input_names = [
+        name for name in o.inputs
+        if name not in param_names and name not in network_input_names]
+    implicit_inputs = [
+        (name, _as_array(o.inputs[name])) for name in implicit_input_names]
+    for name, array in implicit_inputs + list(constants):
+        initializer_arrays.append((name, array))
         input_tensors.append(helper.make_tensor_value_info(
-            name, tensor.data_type, tensor.dims))
+            name, NP_TYPE_TO_TENSOR_TYPE[array.dtype], array.shape))
 
     # If additional parameters are created during conversion
     if o.additional_parameters:
         for param in o.additional_parameters:
-            tensor = convert_parameter(param)
-            initializers.append(tensor)
+            array = _as_array(param)
+            initializer_arrays.append((str(id(param)), array))
             input_tensors.append(helper.make_tensor_value_info(
-                str(id(param)), tensor.data_type, tensor.dims))
+                str(id(param)), NP_TYPE_TO_TENSOR_TYPE[array.dtype],
+                array.shape))
+            # Name the constants made from persistent values, e.g. running
+            # averages of batch normalization, after the links
+            name = persistent_names.pop(id(array), None)
+            if name is not None:
+                param_names[str(id(param))] = name
+
+    initializer_arrays, aliases = _deduplicate_initializers(
+        initializer_arrays, param_names)
+    if aliases:
+        input_tensors = [
+            v for v in input_tensors if v.name not in aliases]
+        for node in o.graph:
+            for i, name in enumerate(node.input):
+                if name in aliases:
+                    node.input[i] = aliases[name]
+
+    if not keep_initializers_as_inputs:
+        initializer_ids = {name for name, _ in initializer_arrays}
+        input_tensors = [
+            v for v in input_tensors if v.name not in initializer_ids]
 
     # The graph must be topologically sorted
     graph = reversed(o.graph)
 
     # Convert output tensors
     output_tensors = []
-    if isinstance(outputs, dict):
-        outputs = list(outputs.values())
-    if not isinstance(outputs, (list, tuple)):
-        outputs = (outputs,)
-
-    for output in outputs:
+    for j, output in enumerate(outputs):
         output_id = str(id(output))
         if output_id in o.renamed_outputs:
             output_id = o.renamed_outputs[output_id]
+        shape = list(output.shape)
+        if probe_outputs is not None:
+            probe_shape = probe_outputs[j].shape
+            for axis in _changed_axes(shape, probe_shape):
+                shape[axis] = dim_names.get(
+                    (shape[axis], probe_shape[axis]),
+                    'output{}_dim{}'.format(j, axis))
         output_tensors.append(helper.make_tensor_value_info(
-            output_id, NP_TYPE_TO_TENSOR_TYPE[output.dtype], output.shape))
-
-    if not export_params:
-        initializers = []
+            output_id, NP_TYPE_TO_TENSOR_TYPE[output.dtype], shape))
 
     onnx_graph = helper.make_graph(
-        graph, graph_name, input_tensors, output_tensors,
-        initializer=initializers)
+        graph, graph_name, input_tensors, output_tensors)
 
-    model = helper.make_model(
+    onnx_model = helper.make_model(
         onnx_graph,
         producer_name='Chainer',
         producer_version=chainer.__version__,
         opset_imports=[helper.make_opsetid('', opset_version)]
     )
 
-    model.ir_version = onnx.IR_VERSION
+    onnx_model.ir_version = onnx.IR_VERSION
 
-    rename_tensors(model)
-    checker.check_model(model)
+    # The initializers are made in place with their headers only, since
+    # copying them into the graph and then into the model would multiply the
+    # memory for the parameter values
+    if not export_params:
+        initializer_arrays = []
+    for name, array in initializer_arrays:
+        onnx_model.graph.initializer.add().CopyFrom(
+            serialization.make_tensor_header(name, array))
 
-    if filename is not None and isinstance(filename, str):
-        with open(filename, 'wb') as fp:
-            fp.write(model.SerializeToString())
-        if save_text:
-            with open(filename + '.txt', 'w') as fp:
-                print(model, file=fp)
-    elif hasattr(filename, 'write'):
-        filename.write(model.SerializeToString())
+    profiler.phase('rename')
+    rename_tensors(onnx_model, param_names)
+    # Arrays of the initializers keyed by their final names
+    arrays = {tensor.name: array for tensor, (_, array) in zip(
+        onnx_model.graph.initializer, initializer_arrays)}
+    return onnx_model, arrays
+
+
+def _export(model, args, filename, export_params, graph_name, save_text,
+            opset_version, abstract, use_cache, stream, external_data,
+            external_data_threshold, external_data_shard_size, workers,
+            keep_initializers_as_inputs, dynamic_axes, check,
+            signature_sizes, signature_labels, profiler, pass_manager):
+    from onnx_chainer import abstract_forward
+    from onnx_chainer import serialization
+
+    cache_key = None
+    if use_cache:
+        cache_key = _cache_key(
+            model, args, opset_version, export_params, graph_name,
+            keep_initializers_as_inputs, dynamic_axes)
+    if cache_key is not None:
+        cached = _export_cache.get(cache_key)
+        if cached is not None:
+            profiler.phase('cache')
+            onnx_model = onnx.ModelProto()
+            onnx_model.CopyFrom(cached)
+            # The cached initializers of the parameters have no data, so
+            # they are written from the arrays of the model as they are if
+            # stored externally or streamed
+            arrays = _named_arrays(model)
+            # The cached model is not optimized, since the optimization may
+            # depend on the parameter values
+            _optimize(onnx_model, arrays, pass_manager, profiler)
+            profiler.phase('initializers')
+            if not (stream or external_data):
+                _refresh_initializers(onnx_model, arrays, workers)
+            return _finish(
+                onnx_model, filename, save_text, arrays, stream,
+                external_data, external_data_threshold,
+                external_data_shard_size, signature_sizes, signature_labels,
+                profiler, cache_hit=True)
+
+    # Forward computation
+    profiler.phase('forward')
+    probe_args = probe_outputs = None
+    if dynamic_axes:
+        probe_args = _probe_args(args, dynamic_axes)
+    args, network_inputs, input_keys = _prepare_args(args, abstract)
+
+    if abstract:
+        with abstract_forward.AbstractForward():
+            outputs = _forward(model, args)
+    else:
+        outputs = _forward(model, args)
+    flat_outputs = _flatten_outputs(outputs)
+
+    function_axes = None
+    if probe_args is not None:
+        profiler.phase('probe')
+        # The outputs of the probe are kept until the conversion finishes,
+        # since the functions are identified by their IDs
+        probe_args, _, _ = _prepare_args(probe_args, abstract)
+        try:
+            if abstract:
+                with abstract_forward.AbstractForward():
+                    probe_outputs = _forward(model, probe_args)
+            else:
+                probe_outputs = _forward(model, probe_args)
+        except Exception as e:
+            raise ValueError(
+                'The forward computation failed with the sizes of the dynamic '
+                'axes {} increased by one, which are run to find the sizes '
+                'depending on them. The model must accept any sizes of the '
+                'dynamic axes. The error was {}: {}'.format(
+                    _describe_dynamic_axes(dynamic_axes), type(e).__name__,
+                    e))
+        probe_outputs = _flatten_outputs(probe_outputs)
+        function_axes = _detect_dynamic_axes(flat_outputs, probe_outputs)
+
+    profiler.phase('build')
+    named_arrays = _named_arrays(model)
+    params = [
+        (_param_name(path), param) for path, param in model.namedparams()]
+    persistent_names = {
+        id(array): name for name, array in _named_persistents(model)}
+    onnx_model, arrays = _build_model(
+        flat_outputs, network_inputs, input_keys, params, persistent_names,
+        [], graph_name, opset_version, export_params,
+        keep_initializers_as_inputs, dynamic_axes, function_axes,
+        probe_outputs, check, profiler)
+
+    profiler.phase('initializers')
+    cached = None
+    if cache_key is not None:
+        # Parameter values are refreshed on every cache hit, so they are not
+        # kept in the cache
+        cached = onnx.ModelProto()
+        cached.CopyFrom(onnx_model)
+        for tensor in cached.graph.initializer:
+            if tensor.name not in named_arrays:
+                serialization.set_raw_data(tensor, arrays[tensor.name])
+
+    optimized = _optimize(onnx_model, arrays, pass_manager, profiler)
+    profiler.phase('initializers')
+    if not (stream or external_data):
+        _fill_initializers(onnx_model, arrays, workers)
+    profiler.phase('check')
+    _validate(onnx_model, check, optimized)
+
+    if cached is not None:
+        _export_cache.put(cache_key, cached)
+
+    return _finish(
+        onnx_model, filename, save_text, arrays, stream, external_data,
+        external_data_threshold, external_data_shard_size, signature_sizes,
+        signature_labels, profiler)
+
+
+def _fill_initializers(onnx_model, arrays, workers):
+    # The values are copied into the tensors through temporary bytes, since
+    # protobuf does not accept other buffers
+    from onnx_chainer import serialization
+
+    tensors = onnx_model.graph.initializer
+    serialization.set_raw_data_many(
+        tensors, [arrays[tensor.name] for tensor in tensors], workers)
+
+
+def _pass_manager(optimize):
+    from onnx_chainer.optimize import PassManager
+
+    if isinstance(optimize, PassManager):
+        return optimize
+    if optimize == 0:
+        return None
+    return PassManager(optimize)
+
+
+def _optimize(onnx_model, arrays, pass_manager, profiler):
+    # Returns whether the model is optimized
+    if pass_manager is None:
+        return False
+    profiler.phase('optimize')
+    profiler.set_passes(pass_manager.run(onnx_model, arrays))
+    return True
+
+
+def _validate(onnx_model, check, optimized=False):
+    from onnx_chainer import validation
+
+    if check == 'full':
+        _check_model(onnx_model)
+    elif check == 'structural':
+        # The nodes have been validated during the conversion, unless the
+        # optimization has changed them
+        validation.check_model(
+            onnx_model, validator=None if optimized else False)
+
+
+def _finish(onnx_model, filename, save_text, arrays, stream, external_data,
+            external_data_threshold, external_data_shard_size,
+            signature_sizes, signature_labels, profiler, cache_hit=False):
+    # Saves the model and its variants for the signatures. The initializers
+    # which hold no data are written from `arrays`.
+    from onnx_chainer import serialization
+
+    profiler.phase('save')
+    written = 0
+    if external_data:
+        paths = serialization.write_external_data(
+            onnx_model, filename, arrays, external_data_threshold,
+            external_data_shard_size)
+        written += sum(os.path.getsize(path) for path in paths)
+    written += _save(onnx_model, filename, save_text,
+                     arrays if stream else None)
+
+    result = onnx_model
+    if signature_sizes is not None:
+        profiler.phase('signatures')
+        result, signatures_written = _save_signatures(
+            onnx_model, filename, save_text, signature_sizes,
+            signature_labels)
+        written += signatures_written
+    profiler.set_counts(onnx_model, written, cache_hit)
+    return result
+
+
+def export_graph(outputs, inputs=None, filename=None, export_params=True,
+                 graph_name='Graph', save_text=False, opset_version=None,
+                 stream=False, external_data=False,
+                 external_data_threshold=1024,
+                 external_data_shard_size=None, workers=None,
+                 keep_initializers_as_inputs=None, check='full',
+                 profiler=None, optimize=0):
+    """Exports the computational graph of already computed variables.
+
+    Unlike :func:`export`, the forward computation is not run again. The
+    graph which creates ``outputs`` is converted as it is, and the parameters
+    are taken from the graph itself, so the graph may be built from bare
+    functions without any :class:`~chainer.Link`. The graph must have been
+    built with ``enable_backprop`` and should be computed with
+    ``chainer.using_config('train', False)``, since the functions are
+    converted as they were called, e.g. the batch normalization in the
+    training mode. Parameters are named after their names and order of
+    appearance, e.g. ``param_0_W``, since the links owning them are unknown.
+
+    The arguments not listed below are the same as those of :func:`export`.
+
+    Args:
+        outputs (~chainer.Variable, list or dict): The output variables of
+            the graph.
+        inputs (list of ~chainer.Variable): The input variables of the graph,
+            which must not be created by functions. The other leaf variables
+            except parameters are exported as constants. If ``None``, all
+            the leaf variables except parameters are exported as inputs in
+            the order of the functions using them.
+        filename (str or file-like object): The filename used for saving the
+            resulting ONNX model. If None, nothing is saved to the disk.
+        export_params (bool): If True, the parameters are exported as
+            initializers.
+
+    Returns:
+        An ONNX model object.
+
+    """
+
+    from onnx_chainer import profiling
+    from onnx_chainer import serialization
+    from onnx_chainer import validation
+
+    _check_available()
+
+    if check not in validation.CHECK_LEVELS:
+        raise ValueError('check must be one of {}, but {!r} was given'.format(
+            ', '.join(validation.CHECK_LEVELS), check))
+
+    if not export_params:
+        keep_initializers_as_inputs = True
+    elif keep_initializers_as_inputs is None:
+        keep_initializers_as_inputs = onnx.IR_VERSION < 4
+
+    if stream and filename is None:
+        raise ValueError('filename must be given to export with stream=True')
+    if external_data and not isinstance(filename, str):
+        raise ValueError(
+            'filename must be a str to export with external_data=True')
+    if external_data:
+        serialization.check_external_data_supported()
+
+    opset_version = _opset_version_or_default(opset_version)
+
+    outputs = _flatten_outputs(outputs)
+    for output in outputs:
+        if output.creator_node is None:
+            raise ValueError(
+                'The output {} is not created by any function. The graph '
+                'must be built with enable_backprop.'.format(output.name))
+    if inputs is not None:
+        inputs = _flatten_outputs(inputs)
+        for x in inputs:
+            if x.creator_node is not None:
+                raise ValueError(
+                    'The input {} must not be created by a function'.format(
+                        x.name))
+
+    pass_manager = _pass_manager(optimize)
+
+    if profiler is None:
+        profiler = profiling.null_profiler
+    with profiler.export():
+        profiler.phase('build')
+        network_inputs, params, constants = _graph_leaves(outputs, inputs)
+        params = [
+            ('param_{}'.format(i) if param.name is None
+             else 'param_{}_{}'.format(i, param.name), param)
+            for i, param in enumerate(params)]
+        onnx_model, arrays = _build_model(
+            outputs, network_inputs, list(range(len(network_inputs))),
+            params, {}, constants, graph_name, opset_version, export_params,
+            keep_initializers_as_inputs, None, None, None, check, profiler)
+        if inputs is None:
+            _remove_unused_inputs(onnx_model)
+
+        optimized = _optimize(onnx_model, arrays, pass_manager, profiler)
+        profiler.phase('initializers')
+        if not (stream or external_data):
+            _fill_initializers(onnx_model, arrays, workers)
+        profiler.phase('check')
+        _validate(onnx_model, check, optimized)
+        return _finish(
+            onnx_model, filename, save_text, arrays, stream, external_data,
+            external_data_threshold, external_data_shard_size, None, None,
+            profiler)
+
+
+def refresh_params(model, onnx_model, filename=None, workers=None):
+    """Updates the parameter values of an already exported ONNX model.
+
+    This function rewrites only the initializers of ``onnx_model`` with the
+    current parameters and persistent values of ``model``, without tracing
+    the computational graph again. The initializers are matched with the
+    parameters by the names derived from the paths in the link tree, so
+    ``model`` must have the same architecture as the model which was
+    originally exported by :func:`export`.
+
+    The values of the initializers stored externally, e.g. by
+    ``export(..., external_data=True)``, are overwritten in place in their
+    external data files, which keep their layout. If the model is saved to
+    another file, the external data files are copied next to it first.
+
+    Args:
+        model (~chainer.Chain): The model which has the updated parameters.
+        onnx_model (onnx.ModelProto, str or file-like object): The exported
+            ONNX model, or the filename or the file object to load it from.
+            A given ``onnx.ModelProto`` object is updated in place.
+        filename (str or file-like object): The filename used for saving the
+            updated ONNX model. If None and ``onnx_model`` is a filename, the
+            file is overwritten. If None otherwise, nothing is saved to the
+            disk. The external data files of a given ``onnx.ModelProto``
+            or file object are looked up in the directory of this filename.
+        workers (int): The number of threads to convert the parameter
+            values concurrently. If ``None``, they are converted one by one.
+
+    Returns:
+        The updated ONNX model object.
+
+    """
+
+    from onnx_chainer import serialization
+
+    _check_available()
+
+    source = None
+    if isinstance(onnx_model, str):
+        source = onnx_model
+        if filename is None:
+            filename = onnx_model
+        onnx_model = _load_without_external_data(onnx_model)
+    elif hasattr(onnx_model, 'read'):
+        onnx_model = _load_without_external_data(onnx_model)
+
+    names = {tensor.name for tensor in onnx_model.graph.initializer}
+    missing = [name for name, _ in model.namedparams()
+               if _param_name(name) not in names]
+    if missing:
+        raise ValueError(
+            'The ONNX model does not have initializers for the parameters '
+            '{}. The model should be exported from the same architecture '
+            'with export_params=True.'.format(', '.join(missing)))
+
+    base_dir = None
+    if any(serialization.is_external(tensor)
+           for tensor in onnx_model.graph.initializer):
+        if not isinstance(filename, str):
+            raise ValueError(
+                'filename must be a str to refresh the parameters stored as '
+                'external data')
+        if source is None:
+            base_dir = os.path.dirname(filename)
+        else:
+            base_dir = os.path.dirname(source)
+            if os.path.abspath(source) != os.path.abspath(filename):
+                serialization.copy_external_data(
+                    onnx_model, base_dir, filename)
+                base_dir = os.path.dirname(filename)
+
+    arrays = _named_arrays(model)
+    _refresh_initializers(onnx_model, arrays, workers, base_dir)
+
+    _save(onnx_model, filename, False)
 
-    return model
+    return onnx_model
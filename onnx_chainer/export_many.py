@@ -0,0 +1,117 @@
+import collections
+from concurrent import futures
+import os
+import time
+import traceback
+
+import chainer
+
+from onnx_chainer.export import export
+
+
+class ExportJob(object):
+    """A specification of a model to be exported by :func:`export_many`.
+
+    The job is sent to a worker process, so all the arguments must be
+    picklable. The model is built in the worker, which avoids pickling the
+    whole model with its parameters.
+
+    Args:
+        model (callable): A callable which returns the model to be exported,
+            e.g. the class of the model or a ``functools.partial`` object
+            of it.
+        args (list or dict): The arguments which are given to the model.
+        filename (str): The filename used for saving the exported model.
+        snapshot (str): The filename of an NPZ snapshot of the model, which
+            is loaded by :func:`chainer.serializers.load_npz` after the model
+            is built. If ``None``, the model is exported as it is built.
+        name (str): The name of the job used in the result. ``filename`` is
+            used if not specified.
+        **kwargs: The other arguments of :func:`~onnx_chainer.export`, e.g.
+            ``opset_version``.
+
+    """
+
+    def __init__(self, model, args, filename, snapshot=None, name=None,
+                 **kwargs):
+        self.model = model
+        self.args = args
+        self.filename = filename
+        self.snapshot = snapshot
+        self.name = filename if name is None else name
+        self.kwargs = kwargs
+
+
+ExportResult = collections.namedtuple(
+    'ExportResult', ('name', 'filename', 'error', 'elapsed', 'file_size'))
+ExportResult.__doc__ = '''The result of a job run by :func:`export_many`.
+
+Attributes:
+    name (str): The name of the job.
+    filename (str): The filename of the exported model.
+    error (str): The traceback of the error raised by the job, or ``None``
+        if the job succeeded.
+    elapsed (float): The time in seconds taken to build and export the
+        model, or ``None`` if the job could not be run, e.g. if it could not
+        be sent to a worker process.
+    file_size (int): The size in bytes of the exported file, or ``None`` if
+        the job failed.
+'''
+
+
+def _run_job(job):
+    start = time.perf_counter()
+    try:
+        model = job.model()
+        if job.snapshot is not None:
+            chainer.serializers.load_npz(job.snapshot, model)
+        # The exported model is not returned to the parent process, so only
+        # the file is kept
+        export(model, job.args, job.filename, **job.kwargs)
+        del model
+        error = None
+        file_size = os.path.getsize(job.filename)
+    except Exception:
+        error = traceback.format_exc()
+        file_size = None
+    return ExportResult(
+        job.name, job.filename, error, time.perf_counter() - start,
+        file_size)
+
+
+def export_many(jobs, workers=None):
+    """Exports many models in parallel with a process pool.
+
+    Each job is run independently in a worker process, which builds the
+    model, exports it to its own file and releases it before the next job.
+    Errors raised by jobs, including those raised while sending a job to a
+    worker process, e.g. if it cannot be pickled, are reported in the
+    results instead of stopping the other jobs.
+
+    Args:
+        jobs (list of ExportJob): The jobs to run.
+        workers (int): The number of worker processes. If ``None``, the
+            number of CPUs is used. If ``1``, the jobs are run one by one in
+            the current process.
+
+    Returns:
+        A list of :class:`ExportResult` objects in the same order as
+        ``jobs``.
+
+    """
+    jobs = list(jobs)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers == 1:
+        return [_run_job(job) for job in jobs]
+    with futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        fs = [executor.submit(_run_job, job) for job in jobs]
+        results = []
+        for job, f in zip(jobs, fs):
+            try:
+                results.append(f.result())
+            except Exception:
+                results.append(ExportResult(
+                    job.name, job.filename, traceback.format_exc(), None,
+                    None))
+        return results
@@ -35,8 +35,8 @@ def export_testcase(model, args, out_dir, graph_name='Graph'):
             t = numpy_helper.from_array(var.data, 'Input_%d' % i)
             f.write(t.SerializeToString())
 
-    chainer.config.train = True
-    result = model(*args)
+    with chainer.using_config('train', True):
+        result = model(*args)
 
     with open(os.path.join(test_data_dir, 'output_0.pb'), 'wb') as f:
         t = numpy_helper.from_array(result.array, '')
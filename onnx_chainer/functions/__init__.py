@@ -1,74 +1,116 @@
-from onnx_chainer.functions.activation import convert_ClippedReLU  # NOQA
-from onnx_chainer.functions.activation import convert_ELU  # NOQA
-from onnx_chainer.functions.activation import convert_HardSigmoid  # NOQA
-from onnx_chainer.functions.activation import convert_LeakyReLU  # NOQA
-from onnx_chainer.functions.activation import convert_LogSoftmax  # NOQA
-from onnx_chainer.functions.activation import convert_PReLUFunction  # NOQA
-from onnx_chainer.functions.activation import convert_ReLU  # NOQA
-from onnx_chainer.functions.activation import convert_Sigmoid  # NOQA
-from onnx_chainer.functions.activation import convert_Softmax  # NOQA
-from onnx_chainer.functions.activation import convert_Softplus  # NOQA
-from onnx_chainer.functions.activation import convert_Tanh  # NOQA
+import importlib
+import sys
 
-from onnx_chainer.functions.array import convert_Cast  # NOQA
-from onnx_chainer.functions.array import convert_Concat  # NOQA
-from onnx_chainer.functions.array import convert_Copy  # NOQA
-from onnx_chainer.functions.array import convert_Depth2Space  # NOQA
-from onnx_chainer.functions.array import convert_ExpandDims  # NOQA
-from onnx_chainer.functions.array import convert_GetItem  # NOQA
-from onnx_chainer.functions.array import convert_Pad  # NOQA
-from onnx_chainer.functions.array import convert_Reshape  # NOQA
-from onnx_chainer.functions.array import convert_Space2Depth  # NOQA
-from onnx_chainer.functions.array import convert_SplitAxis  # NOQA
-from onnx_chainer.functions.array import convert_Squeeze  # NOQA
-from onnx_chainer.functions.array import convert_Tile  # NOQA
-from onnx_chainer.functions.array import convert_Transpose  # NOQA
 
-from onnx_chainer.functions.connection import convert_Convolution2DFunction  # NOQA
-from onnx_chainer.functions.connection import convert_ConvolutionND  # NOQA
-from onnx_chainer.functions.connection import convert_Deconvolution2DFunction  # NOQA
-from onnx_chainer.functions.connection import convert_DeconvolutionND  # NOQA
-from onnx_chainer.functions.connection import convert_EmbedIDFunction  # NOQA
-from onnx_chainer.functions.connection import convert_LinearFunction  # NOQA
+# Names of the modules defining the converters keyed by the names of the
+# converters. The modules are imported on the first use of their converters,
+# so that importing onnx_chainer does not import all of them.
+_converter_modules = {
+    'convert_ClippedReLU': 'activation',
+    'convert_ELU': 'activation',
+    'convert_HardSigmoid': 'activation',
+    'convert_LeakyReLU': 'activation',
+    'convert_LogSoftmax': 'activation',
+    'convert_PReLUFunction': 'activation',
+    'convert_ReLU': 'activation',
+    'convert_Sigmoid': 'activation',
+    'convert_Softmax': 'activation',
+    'convert_Softplus': 'activation',
+    'convert_Tanh': 'activation',
+    'convert_Cast': 'array',
+    'convert_Concat': 'array',
+    'convert_Copy': 'array',
+    'convert_Depth2Space': 'array',
+    'convert_ExpandDims': 'array',
+    'convert_GetItem': 'array',
+    'convert_Pad': 'array',
+    'convert_Reshape': 'array',
+    'convert_Space2Depth': 'array',
+    'convert_SplitAxis': 'array',
+    'convert_Squeeze': 'array',
+    'convert_Tile': 'array',
+    'convert_Transpose': 'array',
+    'convert_Convolution2DFunction': 'connection',
+    'convert_ConvolutionND': 'connection',
+    'convert_Deconvolution2DFunction': 'connection',
+    'convert_DeconvolutionND': 'connection',
+    'convert_EmbedIDFunction': 'connection',
+    'convert_LinearFunction': 'connection',
+    'convert_SoftmaxCrossEntropy': 'loss',
+    'convert_Absolute': 'math',
+    'convert_Add': 'math',
+    'convert_AddConstant': 'math',
+    'convert_BroadcastTo': 'math',
+    'convert_Clip': 'math',
+    'convert_Div': 'math',
+    'convert_Exp': 'math',
+    'convert_Identity': 'math',
+    'convert_LinearInterpolate': 'math',
+    'convert_LogSumExp': 'math',
+    'convert_MatMul': 'math',
+    'convert_Max': 'math',
+    'convert_Maximum': 'math',
+    'convert_Mean': 'math',
+    'convert_Min': 'math',
+    'convert_Minimum': 'math',
+    'convert_Mul': 'math',
+    'convert_MulConstant': 'math',
+    'convert_Neg': 'math',
+    'convert_PowVarConst': 'math',
+    'convert_Prod': 'math',
+    'convert_Sqrt': 'math',
+    'convert_Square': 'math',
+    'convert_Sub': 'math',
+    'convert_Sum': 'math',
+    'convert_Dropout': 'noise',
+    'convert_BatchNormalization': 'normalization',
+    'convert_FixedBatchNormalization': 'normalization',
+    'convert_LocalResponseNormalization': 'normalization',
+    'convert_NormalizeL2': 'normalization',
+    'convert_AveragePooling2D': 'pooling',
+    'convert_AveragePoolingND': 'pooling',
+    'convert_MaxPooling2D': 'pooling',
+    'convert_MaxPoolingND': 'pooling',
+    'convert_ROIPooling2D': 'pooling',
+    'convert_Unpooling2D': 'pooling',
+}
 
-from onnx_chainer.functions.loss import convert_SoftmaxCrossEntropy  # NOQA
 
-from onnx_chainer.functions.math import convert_Absolute  # NOQA
-from onnx_chainer.functions.math import convert_Add  # NOQA
-from onnx_chainer.functions.math import convert_AddConstant  # NOQA
-from onnx_chainer.functions.math import convert_BroadcastTo  # NOQA
-from onnx_chainer.functions.math import convert_Clip  # NOQA
-from onnx_chainer.functions.math import convert_Div  # NOQA
-from onnx_chainer.functions.math import convert_Exp  # NOQA
-from onnx_chainer.functions.math import convert_Identity  # NOQA
-from onnx_chainer.functions.math import convert_LinearInterpolate  # NOQA
-from onnx_chainer.functions.math import convert_LogSumExp  # NOQA
-from onnx_chainer.functions.math import convert_MatMul  # NOQA
-from onnx_chainer.functions.math import convert_Max  # NOQA
-from onnx_chainer.functions.math import convert_Maximum  # NOQA
-from onnx_chainer.functions.math import convert_Mean  # NOQA
-from onnx_chainer.functions.math import convert_Min  # NOQA
-from onnx_chainer.functions.math import convert_Minimum  # NOQA
-from onnx_chainer.functions.math import convert_Mul  # NOQA
-from onnx_chainer.functions.math import convert_MulConstant  # NOQA
-from onnx_chainer.functions.math import convert_Neg  # NOQA
-from onnx_chainer.functions.math import convert_PowVarConst  # NOQA
-from onnx_chainer.functions.math import convert_Prod  # NOQA
-from onnx_chainer.functions.math import convert_Sqrt  # NOQA
-from onnx_chainer.functions.math import convert_Square  # NOQA
-from onnx_chainer.functions.math import convert_Sub  # NOQA
-from onnx_chainer.functions.math import convert_Sum  # NOQA
+def _import_converter(name):
+    module = importlib.import_module(
+        'onnx_chainer.functions.{}'.format(_converter_modules[name]))
+    converter = getattr(module, name)
+    globals()[name] = converter
+    return converter
 
-from onnx_chainer.functions.noise import convert_Dropout  # NOQA
 
-from onnx_chainer.functions.normalization import convert_BatchNormalization  # NOQA
-from onnx_chainer.functions.normalization import convert_FixedBatchNormalization  # NOQA
-from onnx_chainer.functions.normalization import convert_LocalResponseNormalization  # NOQA
-from onnx_chainer.functions.normalization import convert_NormalizeL2  # NOQA
+def get_converter(func_name):
+    """Returns the converter of a Chainer function.
 
-from onnx_chainer.functions.pooling import convert_AveragePooling2D  # NOQA
-from onnx_chainer.functions.pooling import convert_AveragePoolingND  # NOQA
-from onnx_chainer.functions.pooling import convert_MaxPooling2D  # NOQA
-from onnx_chainer.functions.pooling import convert_MaxPoolingND  # NOQA
-from onnx_chainer.functions.pooling import convert_ROIPooling2D  # NOQA
-from onnx_chainer.functions.pooling import convert_Unpooling2D  # NOQA
+    Only the module defining the converter is imported.
+
+    Args:
+      func_name (str): The class name of a Chainer function.
+
+    Returns:
+      The converter function, or ``None`` if there is no converter.
+    """
+    name = 'convert_{}'.format(func_name)
+    if name not in _converter_modules:
+        return None
+    return globals().get(name) or _import_converter(name)
+
+
+if sys.version_info >= (3, 7):
+    def __getattr__(name):
+        if name not in _converter_modules:
+            raise AttributeError(
+                'module {!r} has no attribute {!r}'.format(__name__, name))
+        return _import_converter(name)
+
+    def __dir__():
+        return sorted(set(globals()) | set(_converter_modules))
+else:
+    # Module attributes cannot be resolved lazily before Python 3.7
+    for _name in _converter_modules:
+        _import_converter(_name)
@@ -6,6 +6,9 @@ from onnx_chainer import mapping
 from onnx_chainer import onnx_helper
 
 
+_INT64_MAX = np.iinfo(np.int64).max
+
+
 def convert_Cast(func, opset_version, input_names, num_outputs,
                  parameters):
     typ = func.type if isinstance(func.type, np.dtype) else np.dtype(func.type)
@@ -53,6 +56,7 @@ def convert_Depth2Space(func, opset_version, input_names,
 def convert_GetItem(func, opset_version, input_names,
                     num_outputs, parameters):
     x = func.inputs[0]
+    dynamic_axes = onnx_helper.dynamic_input_axes(func)
     axes, starts, ends = [], [], []
     squeeze_idxs, unsqueeze_idxs = [], []
     skipped = 0  # when set ellipsis, need to skip index rolling
@@ -67,7 +71,13 @@ def convert_GetItem(func, opset_version, input_names,
                     'Slice operator'.format(idx.step))
             axes.append(axis)
             starts.append(0 if idx.start is None else idx.start)
-            ends.append(x.shape[axis] if idx.stop is None else idx.stop)
+            if idx.stop is not None:
+                ends.append(idx.stop)
+            elif axis in dynamic_axes:
+                # Slice clamps the end to the size of the axis
+                ends.append(_INT64_MAX)
+            else:
+                ends.append(x.shape[axis])
         elif isinstance(idx, int):
             axes.append(axis)
             starts.append(idx)
@@ -165,15 +175,47 @@ def convert_Pad(func, opset_version, input_names, num_outputs,
     return node,
 
 
+def _dynamic_reshape_shape(func):
+    # Returns the shape for Reshape in which the sizes of the dynamic axes
+    # are given as 0 (copied from the input) or -1 (inferred)
+    in_shape = func.inputs[0].shape
+    in_axes = onnx_helper.dynamic_input_axes(func)
+    out_axes = onnx_helper.dynamic_output_axes(func)
+    shape = list(func.shape)
+    if not out_axes:
+        return shape
+    if -1 in shape:
+        known = int(np.prod([s for s in shape if s != -1]))
+        shape[shape.index(-1)] = int(np.prod(in_shape)) // known
+    if len(out_axes) == 1:
+        inferred = list(out_axes)
+    else:
+        # The sizes of the other dynamic axes are copied from the input
+        inferred = []
+        for axis in sorted(out_axes):
+            if axis in in_axes and in_shape[axis] == shape[axis]:
+                shape[axis] = 0
+            else:
+                inferred.append(axis)
+    if len(inferred) > 1:
+        raise ValueError(
+            'Reshape to {} cannot be exported with the dynamic axes {}, '
+            'since the sizes of more than one axis must be '
+            'inferred'.format(func.shape, inferred))
+    for axis in inferred:
+        shape[axis] = -1
+    return shape
+
+
 def convert_Reshape(func, opset_version, input_names,
                     num_outputs, parameters):
     if opset_version == 1:
         return onnx_helper.make_node(
             'Reshape', input_names, num_outputs,
-            shape=func.shape
+            shape=_dynamic_reshape_shape(func)
         ),
     elif opset_version == 5:
-        shape = np.asarray(list(func.shape), dtype=np.int64)
+        shape = np.asarray(_dynamic_reshape_shape(func), dtype=np.int64)
         shape_param = chainer.Parameter(shape)
         parameters.append(shape_param)
         input_names.append(str(id(shape_param)))
@@ -198,6 +240,18 @@ def convert_SplitAxis(func, opset_version, input_names,
     else:
         indices_or_sections = func.sections
 
+    if func.axis % len(func.inputs[0].shape) in \
+            onnx_helper.dynamic_input_axes(func):
+        if hasattr(indices_or_sections, '__iter__'):
+            raise ValueError(
+                'SplitAxis with indices cannot be exported along a dynamic '
+                'axis')
+        # Split divides the axis equally without `split`
+        return onnx_helper.make_node(
+            'Split', input_names, num_outputs,
+            axis=func.axis
+        ),
+
     if hasattr(indices_or_sections, '__iter__'):
         split = []
         prev_i = 0
@@ -3,6 +3,14 @@ import numpy as np
 from onnx_chainer import onnx_helper
 
 
+def _static_shape(func, index=0):
+    # Returns the shape of the input in which the sizes of the dynamic axes
+    # are replaced with 1, to which constants can be broadcasted
+    dynamic_axes = onnx_helper.dynamic_input_axes(func, index)
+    return tuple(1 if axis in dynamic_axes else size
+                 for axis, size in enumerate(func.inputs[index].shape))
+
+
 def convert_Add(func, opset_version, input_names, num_outputs,
                 parameters):
     if opset_version == 1:
@@ -15,7 +23,7 @@ def convert_Add(func, opset_version, input_names, num_outputs,
 def convert_AddConstant(func, opset_version, input_names,
                         num_outputs, parameters):
     value = np.asarray([func.value], dtype=func.inputs[0].dtype)
-    value = np.broadcast_to(value, func.inputs[0].shape)
+    value = np.broadcast_to(value, _static_shape(func))
     value_param = chainer.Parameter(value)
     parameters.append(value_param)
     input_names.append(str(id(value_param)))
@@ -89,7 +97,7 @@ def convert_Absolute(func, opset_version, input_names,
 def convert_PowVarConst(func, opset_version, input_names,
                         num_outputs, parameters):
     value = np.asarray([func.value], dtype=func.inputs[0].dtype)
-    value = np.broadcast_to(value, func.inputs[0].shape)
+    value = np.broadcast_to(value, _static_shape(func))
     value_param = chainer.Parameter(value)
     parameters.append(value_param)
     input_names.append(str(id(value_param)))
@@ -131,9 +139,11 @@ def convert_Identity(func, opset_version, input_names,
 
 def convert_MatMul(func, opset_version, input_names,
                    num_outputs, parameters):
+    a_shape = _static_shape(func, 0)
+    b_shape = _static_shape(func, 1)
     bias_shape = (
-        func.inputs[0].shape[-1] if func.transa else func.inputs[0].shape[-2],
-        func.inputs[1].shape[-2] if func.transb else func.inputs[1].shape[-1]
+        a_shape[-1] if func.transa else a_shape[-2],
+        b_shape[-2] if func.transb else b_shape[-1]
     )
     bias_tensor = np.zeros(bias_shape, dtype=np.float32)
     bias_param = chainer.Parameter(bias_tensor)
@@ -266,7 +276,21 @@ def convert_Square(func, opset_version, input_names,
 
 def convert_BroadcastTo(func, opset_version, input_names,
                         num_outputs, parameters):
-    shape = np.array(func._shape)
+    out_shape = func._shape
+    out_axes = onnx_helper.dynamic_output_axes(func)
+    if out_axes:
+        # Expand keeps the sizes of the input where the shape is 1
+        in_shape = func.inputs[0].shape
+        in_axes = onnx_helper.dynamic_input_axes(func)
+        offset = len(out_shape) - len(in_shape)
+        out_shape = list(out_shape)
+        for axis in out_axes:
+            if axis - offset not in in_axes:
+                raise ValueError(
+                    'BroadcastTo cannot be exported when the broadcasted '
+                    'size depends on the dynamic axes')
+            out_shape[axis] = 1
+    shape = np.array(out_shape)
     parameters.append(shape)
     input_names.append(str(id(shape)))
     return onnx_helper.make_node('Expand', input_names, num_outputs),
@@ -7,6 +7,13 @@ from onnx_chainer import onnx_helper
 
 def convert_BatchNormalization(func, opset_version, input_names,
                                num_outputs, parameters):
+    # The model is exported for inference, so the node normalizes the input
+    # with the running statistics and has no outputs of the statistics
+    if func.running_mean is None or func.running_var is None:
+        raise ValueError(
+            'BatchNormalization without the running statistics cannot be '
+            'exported for inference')
+
     # Add running_mean and running_var to graph
     running_mean = chainer.Parameter(func.running_mean)
     parameters.append(running_mean)
@@ -16,34 +23,23 @@ def convert_BatchNormalization(func, opset_version, input_names,
     parameters.append(running_var)
     input_names.append(str(id(running_var)))
 
-    unique_layer_name = '{}_{}'.format(func.__class__.__name__, str(id(func)))
-    num_outputs += [
-        unique_layer_name + '_mean',
-        unique_layer_name + '_var',
-        unique_layer_name + '_saved_mean',
-        unique_layer_name + '_saved_var'
-    ]
-
     if opset_version == 1:
         return onnx_helper.make_node(
             'BatchNormalization', input_names, num_outputs,
             epsilon=func.eps,
-            momentum=func.decay,
-            is_test=not chainer.config.train,
+            is_test=1,
             consumed_inputs=[False, False, False, True, True],
         ),
     elif opset_version == 6:
         return onnx_helper.make_node(
             'BatchNormalization', input_names, num_outputs,
             epsilon=func.eps,
-            momentum=func.decay,
-            is_test=not chainer.config.train,
+            is_test=1,
         ),
     elif opset_version == 7:
         return onnx_helper.make_node(
             'BatchNormalization', input_names, num_outputs,
             epsilon=func.eps,
-            momentum=func.decay,
         ),
 
 
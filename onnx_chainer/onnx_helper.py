@@ -1,9 +1,93 @@
 import collections
+import contextlib
+import threading
+
 import onnx
 
 
-__func_name = None
-__func_to_id = collections.defaultdict(int)
+class _ConversionState(object):
+
+    def __init__(self, dynamic_axes=None):
+        self.func_name = None
+        self.func_to_id = collections.defaultdict(int)
+        # Pairs of the dynamic axes of the inputs and the outputs keyed by
+        # the IDs of functions
+        self.dynamic_axes = {} if dynamic_axes is None else dynamic_axes
+
+
+# The conversion state is kept for each thread, so that exports running in
+# different threads do not share it
+_local = threading.local()
+
+
+def _conversion_state():
+    state = getattr(_local, 'conversion_state', None)
+    if state is None:
+        state = _ConversionState()
+        _local.conversion_state = state
+    return state
+
+
+@contextlib.contextmanager
+def conversion_context(dynamic_axes=None):
+    """Uses a fresh conversion state in the current thread.
+
+    The state holds the counters of :func:`gensym` and the dynamic axes
+    returned by :func:`dynamic_input_axes` and :func:`dynamic_output_axes`.
+    The previous state is restored on exit, so the contexts can be nested,
+    e.g. when a model is exported while converting another one.
+
+    Args:
+      dynamic_axes (dict): Pairs of the lists of the dynamic axes of the
+        inputs and the outputs of each function, keyed by the ID of the
+        function.
+    """
+    saved = getattr(_local, 'conversion_state', None)
+    _local.conversion_state = _ConversionState(dynamic_axes)
+    try:
+        yield
+    finally:
+        _local.conversion_state = saved
+
+
+def _dynamic_axes(func, which, index):
+    axes = _conversion_state().dynamic_axes.get(id(func))
+    if axes is None or index >= len(axes[which]):
+        return frozenset()
+    return axes[which][index]
+
+
+def dynamic_input_axes(func, index=0):
+    """Returns the dynamic axes of an input of the function being converted.
+
+    An axis is dynamic if its size varies with the sizes of the dynamic axes
+    of the network inputs, which are given by the ``dynamic_axes`` argument
+    of :func:`~onnx_chainer.export`. Converters should not embed the sizes
+    of dynamic axes in the ONNX graph.
+
+    Args:
+      func (~chainer.FunctionNode): The function being converted.
+      index (int): The index of the input.
+
+    Returns:
+      A frozenset of the dynamic axes.
+    """
+    return _dynamic_axes(func, 0, index)
+
+
+def dynamic_output_axes(func, index=0):
+    """Returns the dynamic axes of an output of the function being converted.
+
+    See :func:`dynamic_input_axes` for details.
+
+    Args:
+      func (~chainer.FunctionNode): The function being converted.
+      index (int): The index of the output.
+
+    Returns:
+      A frozenset of the dynamic axes.
+    """
+    return _dynamic_axes(func, 1, index)
 
 
 def set_func_name(func_name):
@@ -12,8 +96,7 @@ def set_func_name(func_name):
     Args:
       func_name (str): The name of Chainer function.
     """
-    global __func_name
-    __func_name = func_name
+    _conversion_state().func_name = func_name
 
 
 def gensym():
@@ -22,9 +105,11 @@ def gensym():
     Returns:
       A unique string symbol.
     """
-    assert __func_name is not None
-    __func_to_id[__func_name] += 1
-    return 'tmp{}_{}'.format(__func_name, __func_to_id[__func_name])
+    state = _conversion_state()
+    assert state.func_name is not None
+    func_name = state.func_name
+    state.func_to_id[func_name] += 1
+    return 'tmp{}_{}'.format(func_name, state.func_to_id[func_name])
 
 
 def make_node(op_name, input_names, num_outputs, **kwargs):
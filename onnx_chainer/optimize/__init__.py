@@ -0,0 +1,14 @@
+from onnx_chainer.optimize.pass_manager import default_passes  # NOQA
+from onnx_chainer.optimize.pass_manager import MAX_LEVEL  # NOQA
+from onnx_chainer.optimize.pass_manager import Pass  # NOQA
+from onnx_chainer.optimize.pass_manager import PassContext  # NOQA
+from onnx_chainer.optimize.pass_manager import PassManager  # NOQA
+from onnx_chainer.optimize.pass_manager import PassStats  # NOQA
+from onnx_chainer.optimize.pass_manager import register_pass  # NOQA
+
+# The modules register their passes in the order the passes run, and the
+# clean-up passes run last
+from onnx_chainer.optimize import no_ops  # NOQA
+from onnx_chainer.optimize import constant_folding  # NOQA
+from onnx_chainer.optimize import batch_normalization  # NOQA
+from onnx_chainer.optimize import cleanup  # NOQA
@@ -0,0 +1,179 @@
+import numpy
+from onnx import helper
+
+from onnx_chainer.optimize.pass_manager import Pass
+from onnx_chainer.optimize.pass_manager import register_pass
+
+
+def _attributes(node):
+    return {a.name: helper.get_attribute_value(a) for a in node.attribute}
+
+
+def _set_attribute(node, name, value):
+    for attribute in node.attribute:
+        if attribute.name == name:
+            node.attribute.remove(attribute)
+            break
+    node.attribute.extend([helper.make_attribute(name, value)])
+
+
+def _scale_and_shift(context, bn, initializers):
+    # Returns the scale and the shift of an inference-mode batch
+    # normalization, or None if it cannot be folded
+    if len(bn.input) != 5:
+        return None
+    attributes = _attributes(bn)
+    # The node is in the training mode by default before the opset version
+    # 7, and the mode is given by the number of outputs since then
+    is_test = attributes.get('is_test', 0 if context.opset_version < 7 else 1)
+    if attributes.get('spatial', 1) != 1 or is_test != 1:
+        return None
+    arrays = [context.get_array(name, initializers) for name in bn.input[1:]]
+    if any(array is None for array in arrays):
+        return None
+    gamma, beta, mean, var = [a.astype(numpy.float64) for a in arrays]
+    scale = gamma / numpy.sqrt(var + attributes.get('epsilon', 1e-5))
+    return scale, beta - mean * scale
+
+
+def _fold_conv(context, node, initializers, scale, shift):
+    # Returns the weight and the bias of a Conv or a ConvTranspose node with
+    # the scale and the shift folded, or None if they cannot be folded
+    w = context.get_array(node.input[1], initializers)
+    if w is None or w.ndim < 3:
+        return None
+    b = None
+    if len(node.input) > 2 and node.input[2]:
+        b = context.get_array(node.input[2], initializers)
+        if b is None:
+            return None
+    else:
+        b = numpy.zeros(scale.shape, dtype=w.dtype)
+
+    kernel_ndim = w.ndim - 2
+    if node.op_type == 'Conv':
+        out_channels = w.shape[0]
+        if scale.shape != (out_channels,):
+            return None
+        new_w = w * scale.reshape((-1,) + (1,) * (w.ndim - 1))
+    else:
+        group = _attributes(node).get('group', 1)
+        in_channels, channels_per_group = w.shape[:2]
+        if scale.shape != (group * channels_per_group,) or \
+                in_channels % group:
+            return None
+        # The output channels of each group are along the second axis
+        grouped = w.reshape(
+            (group, in_channels // group) + w.shape[1:])
+        new_w = grouped * scale.reshape(
+            (group, 1, channels_per_group) + (1,) * kernel_ndim)
+        new_w = new_w.reshape(w.shape)
+    if b.shape != scale.shape:
+        return None
+    return new_w.astype(w.dtype), (b * scale + shift).astype(w.dtype)
+
+
+def _fold_gemm(context, node, initializers, scale, shift):
+    # Returns the second input and the bias of a Gemm node with the scale and
+    # the shift folded, or None if they cannot be folded
+    attributes = _attributes(node)
+    if attributes.get('broadcast', 1) != 1:
+        return None
+    w = context.get_array(node.input[1], initializers)
+    if w is None or w.ndim != 2:
+        return None
+    out_features = w.shape[0] if attributes.get('transB', 0) else w.shape[1]
+    if scale.shape != (out_features,):
+        return None
+    if len(node.input) > 2 and node.input[2]:
+        c = context.get_array(node.input[2], initializers)
+        if c is None or c.shape not in (
+                (), (1,), (out_features,), (1, out_features)):
+            return None
+        c = numpy.broadcast_to(
+            c.reshape(-1) * attributes.get('beta', 1.0), scale.shape)
+    elif context.opset_version is not None and context.opset_version < 7:
+        # The bias cannot be omitted
+        return None
+    else:
+        c = numpy.zeros(scale.shape)
+
+    if attributes.get('transB', 0):
+        new_w = w * scale[:, None]
+    else:
+        new_w = w * scale[None, :]
+    return new_w.astype(w.dtype), (c * scale + shift).astype(w.dtype)
+
+
+@register_pass
+class FuseBatchNormalization(Pass):
+    """Folds batch normalization into a preceding Conv, ConvTranspose or Gemm.
+
+    The scale and the shift of an inference-mode BatchNormalization node are
+    folded into the weight and the bias of the node which produces its
+    input, and the BatchNormalization node is removed. A bias is added if
+    the node has none. The node must be the only user of its output, and all
+    the parameters must be initializers which are not graph inputs, since
+    the callers could override them. A weight shared by other nodes is
+    copied to a new initializer.
+    """
+
+    name = 'fuse_batch_normalization'
+    level = 2
+
+    def run(self, context):
+        producers = context.producers()
+        consumers = context.consumers()
+        output_names = context.output_names()
+        initializers = context.initializers()
+        input_names = {v.name for v in context.graph.input}
+        removed = set()
+        for bn in context.graph.node:
+            if bn.op_type != 'BatchNormalization':
+                continue
+            # Other outputs only exist in the training mode
+            if any(name and (consumers.get(name) or name in output_names)
+                   for name in bn.output[1:]):
+                continue
+            node = producers.get(bn.input[0])
+            if node is None or node.op_type not in (
+                    'Conv', 'ConvTranspose', 'Gemm') or \
+                    len(consumers[bn.input[0]]) != 1 or \
+                    bn.input[0] in output_names:
+                continue
+            if any(name in input_names
+                   for name in list(bn.input[1:]) + list(node.input[1:])):
+                continue
+            scale_and_shift = _scale_and_shift(context, bn, initializers)
+            if scale_and_shift is None:
+                continue
+            if node.op_type == 'Gemm':
+                folded = _fold_gemm(
+                    context, node, initializers, *scale_and_shift)
+            else:
+                folded = _fold_conv(
+                    context, node, initializers, *scale_and_shift)
+            if folded is None:
+                continue
+
+            w, b = folded
+            self._set_input(context, node, 1, w, consumers, 'W')
+            if len(node.input) < 3:
+                node.input.append('')
+            self._set_input(context, node, 2, b, consumers, 'B')
+            if node.op_type == 'Gemm':
+                _set_attribute(node, 'beta', 1.0)
+            node.output[0] = bn.output[0]
+            removed.add(id(bn))
+
+        if removed:
+            context.set_nodes(
+                n for n in context.graph.node if id(n) not in removed)
+
+    def _set_input(self, context, node, index, array, consumers, suffix):
+        name = node.input[index]
+        if not name or len(consumers.get(name, ())) > 1 or \
+                name in context.output_names():
+            name = context.fresh_name('{}_{}'.format(node.output[0], suffix))
+            node.input[index] = name
+        context.set_initializer(name, array)
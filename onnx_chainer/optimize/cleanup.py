@@ -0,0 +1,41 @@
+from onnx_chainer.optimize.pass_manager import Pass
+from onnx_chainer.optimize.pass_manager import register_pass
+
+
+@register_pass
+class EliminateDeadNodes(Pass):
+    """Removes the nodes whose outputs are not used.
+
+    A node is dead if none of its outputs is used by a live node or is an
+    output of the graph, e.g. the unused outputs of the functions which
+    return several values.
+    """
+
+    name = 'eliminate_dead_nodes'
+    level = 1
+
+    def run(self, context):
+        live = context.output_names()
+        kept = []
+        for node in reversed(context.graph.node):
+            if not any(name in live for name in node.output):
+                continue
+            kept.append(node)
+            live.update(node.input)
+        if len(kept) != len(context.graph.node):
+            context.set_nodes(reversed(kept))
+
+
+@register_pass
+class EliminateUnusedInitializers(Pass):
+    """Removes the initializers which no node uses."""
+
+    name = 'eliminate_unused_initializers'
+    level = 1
+
+    def run(self, context):
+        used = set(context.consumers())
+        used.update(context.output_names())
+        context.remove_initializers(
+            tensor.name for tensor in context.graph.initializer
+            if tensor.name not in used)
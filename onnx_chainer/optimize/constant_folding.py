@@ -0,0 +1,310 @@
+import functools
+
+import numpy
+from onnx import helper
+from onnx import mapping
+from onnx import numpy_helper
+from onnx import TensorProto
+
+from onnx_chainer.optimize.pass_manager import Pass
+from onnx_chainer.optimize.pass_manager import register_pass
+
+
+# Evaluators of the operators keyed by their types. An evaluator is called
+# with the node, the values of its inputs (``None`` for omitted inputs),
+# its attributes and the opset version, and returns the list of the values
+# of the outputs.
+_evaluators = {}
+
+
+def _evaluator(*op_types):
+    def register(f):
+        for op_type in op_types:
+            _evaluators[op_type] = f
+        return f
+    return register
+
+
+def _attributes(node):
+    return {a.name: helper.get_attribute_value(a) for a in node.attribute}
+
+
+def _legacy_broadcast(a, b, attributes, opset_version):
+    # Before the opset version 7, the second operand is aligned to the axis
+    # given by the attribute instead of the trailing axes
+    if opset_version < 7 and attributes.get('broadcast', 0) and \
+            'axis' in attributes:
+        axis = attributes['axis'] % a.ndim
+        b = b.reshape(b.shape + (1,) * (a.ndim - axis - b.ndim))
+    return b
+
+
+def _elementwise(f, integer=True):
+    def evaluate(node, inputs, attributes, opset_version):
+        a = inputs[0]
+        if not integer and not numpy.issubdtype(a.dtype, numpy.floating):
+            return None
+        if len(inputs) == 1:
+            return [numpy.asarray(f(a)).astype(a.dtype, copy=False)]
+        b = _legacy_broadcast(a, inputs[1], attributes, opset_version)
+        return [numpy.asarray(f(a, b)).astype(a.dtype, copy=False)]
+    return evaluate
+
+
+for _op_type, _f, _integer in (
+        ('Add', numpy.add, True),
+        ('Sub', numpy.subtract, True),
+        ('Mul', numpy.multiply, True),
+        # The division of integers is truncated in ONNX
+        ('Div', numpy.true_divide, False),
+        ('Pow', numpy.power, False),
+        ('Neg', numpy.negative, True),
+        ('Abs', numpy.abs, True),
+        ('Sqrt', numpy.sqrt, False),
+        ('Exp', numpy.exp, False),
+        ('Log', numpy.log, False),
+        ('Reciprocal', numpy.reciprocal, False),
+        ('Tanh', numpy.tanh, False),
+        ('Sigmoid', lambda x: 1 / (1 + numpy.exp(-x)), False),
+        ('Relu', lambda x: numpy.maximum(x, 0), True)):
+    _evaluators[_op_type] = _elementwise(_f, _integer)
+
+
+@_evaluator('Max', 'Min', 'Sum')
+def _variadic(node, inputs, attributes, opset_version):
+    f = {'Max': numpy.maximum, 'Min': numpy.minimum,
+         'Sum': numpy.add}[node.op_type]
+    return [numpy.asarray(functools.reduce(f, inputs)).astype(
+        inputs[0].dtype, copy=False)]
+
+
+@_evaluator('Constant')
+def _constant(node, inputs, attributes, opset_version):
+    if 'value' in attributes:
+        return [numpy_helper.to_array(attributes['value'])]
+    for name, dtype in (('value_float', numpy.float32),
+                        ('value_floats', numpy.float32),
+                        ('value_int', numpy.int64),
+                        ('value_ints', numpy.int64)):
+        if name in attributes:
+            return [numpy.array(attributes[name], dtype=dtype)]
+    return None
+
+
+@_evaluator('Identity')
+def _identity(node, inputs, attributes, opset_version):
+    return [inputs[0]]
+
+
+@_evaluator('Cast')
+def _cast(node, inputs, attributes, opset_version):
+    to = attributes['to']
+    if isinstance(to, bytes):
+        # The type is given by its name before the opset version 6
+        to = TensorProto.DataType.Value(to.decode())
+    if to not in mapping.TENSOR_TYPE_TO_NP_TYPE or to == TensorProto.STRING:
+        return None
+    return [inputs[0].astype(mapping.TENSOR_TYPE_TO_NP_TYPE[to])]
+
+
+@_evaluator('Reshape')
+def _reshape(node, inputs, attributes, opset_version):
+    x = inputs[0]
+    if opset_version < 5:
+        shape = list(attributes['shape'])
+    else:
+        shape = [int(s) for s in inputs[1]]
+    if not attributes.get('allowzero', 0):
+        shape = [x.shape[i] if s == 0 else s for i, s in enumerate(shape)]
+    return [x.reshape(shape)]
+
+
+@_evaluator('Transpose')
+def _transpose(node, inputs, attributes, opset_version):
+    return [inputs[0].transpose(attributes.get('perm'))]
+
+
+@_evaluator('Squeeze')
+def _squeeze(node, inputs, attributes, opset_version):
+    x = inputs[0]
+    axes = attributes.get('axes')
+    if len(inputs) > 1 and inputs[1] is not None:
+        axes = [int(a) for a in inputs[1]]
+    if axes is None:
+        return [x.squeeze()]
+    return [x.squeeze(tuple(a % x.ndim for a in axes))]
+
+
+@_evaluator('Unsqueeze')
+def _unsqueeze(node, inputs, attributes, opset_version):
+    x = inputs[0]
+    axes = attributes.get('axes')
+    if len(inputs) > 1 and inputs[1] is not None:
+        axes = [int(a) for a in inputs[1]]
+    ndim = x.ndim + len(axes)
+    for axis in sorted(a % ndim for a in axes):
+        x = numpy.expand_dims(x, axis)
+    return [x]
+
+
+@_evaluator('Concat')
+def _concat(node, inputs, attributes, opset_version):
+    return [numpy.concatenate(inputs, axis=attributes.get('axis', 1))]
+
+
+@_evaluator('Split')
+def _split(node, inputs, attributes, opset_version):
+    x = inputs[0]
+    axis = attributes.get('axis', 0)
+    split = attributes.get('split')
+    if len(inputs) > 1 and inputs[1] is not None:
+        split = [int(s) for s in inputs[1]]
+    if split is None:
+        return numpy.split(x, len(node.output), axis=axis)
+    return numpy.split(x, numpy.cumsum(split)[:-1], axis=axis)
+
+
+@_evaluator('Slice')
+def _slice(node, inputs, attributes, opset_version):
+    x = inputs[0]
+    if opset_version < 10:
+        starts, ends = attributes['starts'], attributes['ends']
+        axes = attributes.get('axes')
+        steps = None
+    else:
+        starts, ends = inputs[1], inputs[2]
+        axes = inputs[3] if len(inputs) > 3 else None
+        steps = inputs[4] if len(inputs) > 4 else None
+    if axes is None:
+        axes = range(len(starts))
+    if steps is None:
+        steps = [1] * len(starts)
+    slices = [slice(None)] * x.ndim
+    for axis, start, end, step in zip(axes, starts, ends, steps):
+        slices[int(axis)] = slice(int(start), int(end), int(step))
+    return [x[tuple(slices)]]
+
+
+@_evaluator('Gather')
+def _gather(node, inputs, attributes, opset_version):
+    return [numpy.take(inputs[0], inputs[1], axis=attributes.get('axis', 0))]
+
+
+@_evaluator('Expand')
+def _expand(node, inputs, attributes, opset_version):
+    x, shape = inputs
+    return [x * numpy.ones([int(s) for s in shape], dtype=x.dtype)]
+
+
+@_evaluator('Tile')
+def _tile(node, inputs, attributes, opset_version):
+    if len(inputs) != 2:
+        # The tiles and the axis are given separately before the opset
+        # version 6
+        return None
+    return [numpy.tile(inputs[0], [int(r) for r in inputs[1]])]
+
+
+@_evaluator('OneHot')
+def _one_hot(node, inputs, attributes, opset_version):
+    indices, depth, values = inputs
+    depth = int(depth.reshape(-1)[0])
+    indices = indices.astype(numpy.int64)
+    indices = numpy.where(indices < 0, indices + depth, indices)
+    hot = indices[..., None] == numpy.arange(depth)
+    y = numpy.where(hot, values[1], values[0]).astype(values.dtype)
+    axis = attributes.get('axis', -1)
+    return [numpy.moveaxis(y, -1, axis)]
+
+
+@_evaluator('Shape')
+def _shape(node, inputs, attributes, opset_version):
+    return [numpy.array(inputs[0].shape, dtype=numpy.int64)]
+
+
+@register_pass
+class FoldConstants(Pass):
+    """Evaluates the nodes whose inputs are all constant.
+
+    The values of the initializers and the Constant nodes are propagated
+    through the graph with numpy, and the values used by the remaining
+    nodes become initializers. Initializers which are also graph inputs are
+    not constant, since the callers could override them. The nodes whose
+    outputs are graph outputs are kept. The initializers which are only used
+    by the folded nodes are removed.
+
+    A value larger than ``max_size`` bytes is folded only if it is not
+    larger than the constant inputs of its node, so that the size of the
+    model does not grow, e.g. by expanding a scalar to a large tensor.
+
+    Args:
+        max_size (int): The size in bytes of the largest value which can be
+            made from smaller values.
+
+    """
+
+    name = 'fold_constants'
+    level = 2
+
+    def __init__(self, max_size=1 << 20):
+        self.max_size = max_size
+
+    def run(self, context):
+        initializers = context.initializers()
+        input_names = {v.name for v in context.graph.input}
+        output_names = context.output_names()
+        values = {}
+
+        def get_value(name):
+            if name not in values and name in initializers and \
+                    name not in input_names:
+                values[name] = context.get_array(name, initializers)
+            return values.get(name)
+
+        folded = set()
+        for node in context.graph.node:
+            evaluator = _evaluators.get(node.op_type)
+            if evaluator is None or node.domain not in ('', 'ai.onnx') or \
+                    any(name in output_names for name in node.output):
+                continue
+            inputs = [get_value(name) if name else None
+                      for name in node.input]
+            if any(value is None
+                   for name, value in zip(node.input, inputs) if name):
+                continue
+            while inputs and inputs[-1] is None:
+                inputs.pop()
+            try:
+                outputs = evaluator(
+                    node, inputs, _attributes(node), context.opset_version)
+            except Exception:
+                # The node is left as it is, e.g. if it is not valid
+                outputs = None
+            if outputs is None or len(outputs) != len(node.output):
+                continue
+            outputs = [numpy.asarray(output) for output in outputs]
+            size = sum(output.nbytes for output in outputs)
+            if size > self.max_size and size > sum(
+                    value.nbytes for value in inputs if value is not None):
+                continue
+            for name, output in zip(node.output, outputs):
+                if name:
+                    values[name] = output
+            folded.add(id(node))
+
+        if not folded:
+            return
+        kept = [node for node in context.graph.node if id(node) not in folded]
+        used = {name for node in kept for name in node.input}
+        consumed = set()
+        for node in context.graph.node:
+            if id(node) in folded:
+                consumed.update(node.input)
+                for name in node.output:
+                    if name in used:
+                        context.set_initializer(name, values[name])
+        context.set_nodes(kept)
+        context.remove_initializers(
+            name for name in consumed
+            if name in initializers and name not in used and
+            name not in output_names)
@@ -0,0 +1,192 @@
+import numpy
+from onnx import helper
+from onnx import shape_inference
+
+from onnx_chainer.optimize.pass_manager import Pass
+from onnx_chainer.optimize.pass_manager import register_pass
+
+
+def _attributes(node):
+    return {a.name: helper.get_attribute_value(a) for a in node.attribute}
+
+
+def _inferred_shapes(onnx_model):
+    # Returns the shapes of the values keyed by their names, where unknown
+    # sizes are None. The values of the initializers are not needed.
+    try:
+        inferred = shape_inference.infer_shapes(onnx_model)
+    except Exception:
+        inferred = onnx_model
+    shapes = {}
+    graph = inferred.graph
+    for value_info in list(graph.input) + list(graph.value_info):
+        tensor_type = value_info.type.tensor_type
+        if not tensor_type.HasField('shape'):
+            continue
+        shapes[value_info.name] = [
+            dim.dim_value if dim.HasField('dim_value') else None
+            for dim in tensor_type.shape.dim]
+    return shapes
+
+
+class _GraphInfo(object):
+
+    # Looks up the constants and the shapes of the values of a graph
+
+    def __init__(self, context):
+        self.context = context
+        self.initializers = context.initializers()
+        self.input_names = {v.name for v in context.graph.input}
+        self._shapes = None
+
+    def constant(self, name):
+        # Initializers which are also graph inputs could be overridden
+        if name in self.input_names:
+            return None
+        return self.context.get_array(name, self.initializers)
+
+    def shape(self, name):
+        if self._shapes is None:
+            self._shapes = _inferred_shapes(self.context.model)
+        return self._shapes.get(name)
+
+
+def _identity_source(node, info, opset_version):
+    return node.input[0]
+
+
+def _dropout_source(node, info, opset_version):
+    if opset_version < 7:
+        if not _attributes(node).get('is_test', 0):
+            return None
+    elif len(node.input) > 2 and node.input[2]:
+        training_mode = info.constant(node.input[2])
+        if training_mode is None or training_mode.any():
+            return None
+    return node.input[0]
+
+
+def _pad_source(node, info, opset_version):
+    attributes = _attributes(node)
+    if 'pads' in attributes or 'paddings' in attributes:
+        pads = attributes.get('pads', attributes.get('paddings'))
+    elif len(node.input) > 1:
+        pads = info.constant(node.input[1])
+        if pads is None:
+            return None
+    else:
+        return None
+    if any(pads):
+        return None
+    return node.input[0]
+
+
+def _arithmetic_source(node, info, opset_version):
+    # ``x + 0``, ``x - 0``, ``x * 1`` and ``x / 1`` are no-ops unless the
+    # constant broadcasts ``x`` to a larger shape
+    neutral = 0 if node.op_type in ('Add', 'Sub') else 1
+    if len(node.input) != 2:
+        return None
+    candidates = [(node.input[0], node.input[1])]
+    if node.op_type in ('Add', 'Mul') and opset_version >= 7:
+        candidates.append((node.input[1], node.input[0]))
+    for x, c in candidates:
+        value = info.constant(c)
+        if value is None or value.dtype.kind not in 'biuf' or \
+                not numpy.all(value == neutral):
+            continue
+        if opset_version < 7 or value.ndim == 0:
+            # Before the opset version 7, the second operand is broadcast to
+            # the shape of the first one
+            return x
+        shape = info.shape(x)
+        if shape is None or len(shape) < value.ndim:
+            continue
+        if all(c_size == 1 or c_size == x_size for c_size, x_size in zip(
+                reversed(value.shape), reversed(shape))):
+            return x
+    return None
+
+
+_sources = {
+    'Identity': _identity_source,
+    'Dropout': _dropout_source,
+    'Pad': _pad_source,
+    'Add': _arithmetic_source,
+    'Sub': _arithmetic_source,
+    'Mul': _arithmetic_source,
+    'Div': _arithmetic_source,
+}
+
+
+@register_pass
+class EliminateNoOps(Pass):
+    """Removes the nodes which return one of their inputs as it is.
+
+    The nodes are Identity, inference-mode Dropout, Pad without padding, and
+    Add, Sub, Mul and Div by their neutral elements. The users of the output
+    of a removed node use its input instead. If the output is a graph
+    output, the value of the input is renamed to keep the name of the graph
+    output, and the node is kept if it cannot be renamed, e.g. when the
+    input is a graph input.
+    """
+
+    name = 'eliminate_no_ops'
+    level = 1
+
+    def run(self, context):
+        graph = context.graph
+        info = _GraphInfo(context)
+        output_names = context.output_names()
+        consumers = context.consumers()
+        produced = {name for node in graph.node for name in node.output}
+        renamed = {}
+
+        def resolve(name):
+            while name in renamed:
+                name = renamed[name]
+            return name
+
+        removed = set()
+        for node in graph.node:
+            get_source = _sources.get(node.op_type)
+            if get_source is None or node.domain not in ('', 'ai.onnx'):
+                continue
+            # Other outputs, e.g. the mask of Dropout, must be unused
+            if any(name and (consumers.get(name) or name in output_names)
+                   for name in node.output[1:]):
+                continue
+            source = get_source(node, info, context.opset_version)
+            if source is None:
+                continue
+            source = resolve(source)
+            output = node.output[0]
+            if output in output_names:
+                if source not in produced or source in output_names or \
+                        source in info.input_names or \
+                        source in info.initializers:
+                    continue
+                renamed[source] = output
+            else:
+                renamed[output] = source
+            removed.add(id(node))
+
+        if not removed:
+            return
+        kept = [node for node in graph.node if id(node) not in removed]
+        for node in kept:
+            for names in (node.input, node.output):
+                for i, name in enumerate(names):
+                    if name in renamed:
+                        names[i] = resolve(name)
+        value_infos = []
+        names = set()
+        for value_info in graph.value_info:
+            name = resolve(value_info.name)
+            if name not in names:
+                names.add(name)
+                value_info.name = name
+                value_infos.append(value_info)
+        del graph.value_info[:]
+        graph.value_info.extend(value_infos)
+        context.set_nodes(kept)
@@ -0,0 +1,309 @@
+import collections
+import time
+
+from onnx import helper
+from onnx import numpy_helper
+
+from onnx_chainer import serialization
+
+
+MAX_LEVEL = 3
+
+# The maximum number of rounds of the passes at the level 3
+_MAX_ROUNDS = 10
+
+
+PassStats = collections.namedtuple(
+    'PassStats', ('name', 'nodes_removed', 'initializers_folded', 'time'))
+PassStats.__doc__ = '''The statistics of a run of an optimization pass.
+
+Attributes:
+    name (str): The name of the pass.
+    nodes_removed (int): The number of nodes removed by the pass, which is
+        negative if the pass adds nodes.
+    initializers_folded (int): The number of initializers which are removed
+        or folded into other initializers by the pass.
+    time (float): The time in seconds spent in the pass.
+'''
+
+
+class PassContext(object):
+    """An ONNX model being optimized, with the values of its initializers.
+
+    The initializers of an exported model may hold no data until the model
+    is saved, in which case their values are kept in ``arrays``. Passes
+    should read and write the values through this class, so that they work
+    in both cases.
+
+    Args:
+        onnx_model (onnx.ModelProto): The model to be optimized in place.
+        arrays (dict): The values of the initializers which hold no data,
+            keyed by their names. The dict is updated by the passes. The
+            arrays themselves are never modified in place.
+
+    Attributes:
+        model (onnx.ModelProto): The model.
+        graph (onnx.GraphProto): The graph of the model.
+        opset_version (int): The version of the default opset of the model.
+
+    """
+
+    def __init__(self, onnx_model, arrays=None):
+        self.model = onnx_model
+        self.graph = onnx_model.graph
+        self.arrays = {} if arrays is None else arrays
+        self.opset_version = None
+        for opset_id in onnx_model.opset_import:
+            if opset_id.domain in ('', 'ai.onnx'):
+                self.opset_version = opset_id.version
+        self._names = None
+        # Before the IR version 4, or if the model is exported with
+        # ``keep_initializers_as_inputs=True``, every initializer must also
+        # be a graph input
+        input_names = {v.name for v in self.graph.input}
+        self._initializers_as_inputs = onnx_model.ir_version < 4 or (
+            len(self.graph.initializer) > 0 and all(
+                tensor.name in input_names
+                for tensor in self.graph.initializer))
+
+    def initializers(self):
+        """Returns the initializers keyed by their names."""
+        return {tensor.name: tensor for tensor in self.graph.initializer}
+
+    def get_array(self, name, initializers=None):
+        """Returns the value of an initializer.
+
+        Args:
+            name (str): The name of the initializer.
+            initializers (dict): The result of :meth:`initializers`, which
+                can be given to avoid building it again.
+
+        Returns:
+            The array of the value, or ``None`` if there is no initializer
+            of the name or its value is stored externally.
+        """
+        if initializers is None:
+            initializers = self.initializers()
+        tensor = initializers.get(name)
+        if tensor is None:
+            return None
+        if not serialization.has_data(tensor):
+            return self.arrays.get(name)
+        if serialization.is_external(tensor):
+            return None
+        return numpy_helper.to_array(tensor)
+
+    def set_initializer(self, name, array):
+        """Adds an initializer, or replaces the value of an initializer.
+
+        The initializer is made with its header only, and the value is kept
+        in ``arrays``. If the model keeps the initializers as graph inputs,
+        the graph input of the name is added or updated as well.
+        """
+        header = serialization.make_tensor_header(name, array)
+        for tensor in self.graph.initializer:
+            if tensor.name == name:
+                tensor.CopyFrom(header)
+                break
+        else:
+            self.graph.initializer.add().CopyFrom(header)
+        self.arrays[name] = array
+
+        if self._initializers_as_inputs:
+            value_info = helper.make_tensor_value_info(
+                name, header.data_type, header.dims)
+            for graph_input in self.graph.input:
+                if graph_input.name == name:
+                    graph_input.CopyFrom(value_info)
+                    break
+            else:
+                self.graph.input.add().CopyFrom(value_info)
+
+    def remove_initializers(self, names):
+        """Removes initializers and the graph inputs of the same names."""
+        names = set(names)
+        if not names:
+            return
+        for field in (self.graph.initializer, self.graph.input):
+            kept = [v for v in field if v.name not in names]
+            if len(kept) != len(field):
+                del field[:]
+                field.extend(kept)
+        for name in names:
+            self.arrays.pop(name, None)
+
+    def consumers(self):
+        """Returns the lists of the nodes using each value, keyed by names."""
+        consumers = collections.defaultdict(list)
+        for node in self.graph.node:
+            for name in node.input:
+                if name:
+                    consumers[name].append(node)
+        return consumers
+
+    def producers(self):
+        """Returns the nodes which produce each value, keyed by names."""
+        return {name: node for node in self.graph.node for name in node.output}
+
+    def output_names(self):
+        """Returns the set of the names of the graph outputs."""
+        return {v.name for v in self.graph.output}
+
+    def set_nodes(self, nodes):
+        """Replaces the nodes of the graph."""
+        nodes = list(nodes)
+        del self.graph.node[:]
+        self.graph.node.extend(nodes)
+
+    def fresh_name(self, prefix):
+        """Returns a name which is not used by any value of the graph."""
+        if self._names is None:
+            self._names = {v.name for v in self.graph.initializer}
+            self._names.update(v.name for v in self.graph.input)
+            for node in self.graph.node:
+                self._names.update(node.output)
+        i = 0
+        while '{}_{}'.format(prefix, i) in self._names:
+            i += 1
+        name = '{}_{}'.format(prefix, i)
+        self._names.add(name)
+        return name
+
+
+class Pass(object):
+    """The base class of optimization passes.
+
+    A pass rewrites the model of a :class:`PassContext` in place. Subclasses
+    override :meth:`run`, and may set :attr:`name` and :attr:`level`.
+
+    Attributes:
+        name (str): The name of the pass used in the statistics. The class
+            name is used if ``None``.
+        level (int): The lowest optimization level at which the pass runs
+            by default.
+
+    """
+
+    name = None
+    level = 1
+
+    def run(self, context):
+        """Rewrites the model of a context in place.
+
+        Args:
+            context (PassContext): The model being optimized.
+        """
+        raise NotImplementedError
+
+    def __repr__(self):
+        return self.name or type(self).__name__
+
+
+# Passes run by default in the order of registration
+_default_passes = []
+
+
+def register_pass(pass_):
+    """Adds a pass to the default passes of :class:`PassManager`.
+
+    The passes run in the order of registration. This can be used as a class
+    decorator of a subclass of :class:`Pass` which takes no arguments.
+
+    Args:
+        pass_ (Pass or type): The pass, or its class.
+
+    Returns:
+        ``pass_`` as it is.
+    """
+    _default_passes.append(pass_() if isinstance(pass_, type) else pass_)
+    return pass_
+
+
+def default_passes(level):
+    """Returns the default passes which run at an optimization level."""
+    return [pass_ for pass_ in _default_passes if pass_.level <= level]
+
+
+class PassManager(object):
+    """Runs optimization passes on ONNX models.
+
+    The optimization levels are:
+
+    * 0: No passes are run.
+    * 1: Cheap clean-up passes, such as the elimination of dead nodes.
+    * 2: The passes which also rewrite the values of initializers, such as
+      the folding of constants.
+    * 3: The passes of the level 2 are repeated until no pass changes the
+      model.
+
+    The passes do not fold the initializers which are also graph inputs,
+    since the callers could override them. With onnx older than 1.4.0,
+    whose IR version is below 4, :func:`~onnx_chainer.export` keeps all the
+    initializers as graph inputs by default (``keep_initializers_as_inputs``),
+    so the levels 1 to 3 do little more than removing the inference-mode
+    Dropout and the dead nodes: the batch normalizations are not fused, and
+    the no-ops and the constants of the initializers are not folded.
+
+    Args:
+        level (int): The optimization level.
+        passes (list of Pass): The passes to run in order. If ``None``, the
+            default passes for ``level`` are used.
+
+    Attributes:
+        stats (list of PassStats): The statistics of the passes in the last
+            run, in the order they are run.
+
+    """
+
+    def __init__(self, level=1, passes=None):
+        if not 0 <= level <= MAX_LEVEL:
+            raise ValueError(
+                'The optimization level must be between 0 and {}, but {} '
+                'was given'.format(MAX_LEVEL, level))
+        self.level = level
+        if passes is None:
+            passes = default_passes(level)
+        self.passes = list(passes)
+        self.stats = []
+
+    def run(self, onnx_model, arrays=None):
+        """Optimizes an ONNX model in place.
+
+        Args:
+            onnx_model (onnx.ModelProto): The model to be optimized.
+            arrays (dict): The values of the initializers which hold no data
+                keyed by their names, which is updated as the initializers
+                are changed.
+
+        Returns:
+            A list of :class:`PassStats`.
+        """
+        self.stats = []
+        if self.level == 0:
+            return self.stats
+        context = PassContext(onnx_model, arrays)
+        rounds = _MAX_ROUNDS if self.level >= 3 else 1
+        for _ in range(rounds):
+            changed = False
+            for pass_ in self.passes:
+                stats = self._run_pass(pass_, context)
+                self.stats.append(stats)
+                changed = changed or stats.nodes_removed != 0 or \
+                    stats.initializers_folded != 0
+            if not changed:
+                break
+        return self.stats
+
+    def _run_pass(self, pass_, context):
+        graph = context.graph
+        num_nodes = len(graph.node)
+        initializer_names = {tensor.name for tensor in graph.initializer}
+        start = time.perf_counter()
+        pass_.run(context)
+        elapsed = time.perf_counter() - start
+        # Names may be reused by the pass, e.g. when a value is replaced
+        context._names = None
+        folded = initializer_names.difference(
+            tensor.name for tensor in graph.initializer)
+        return PassStats(
+            repr(pass_), num_nodes - len(graph.node), len(folded), elapsed)
@@ -0,0 +1,241 @@
+import collections
+import contextlib
+import time
+import tracemalloc
+
+
+PhaseStats = collections.namedtuple(
+    'PhaseStats', ('wall_time', 'peak_memory'))
+PhaseStats.__doc__ = '''The statistics of a phase of an export.
+
+Attributes:
+    wall_time (float): The wall time in seconds spent in the phase.
+    peak_memory (int): The peak size in bytes of the memory allocated by
+        Python during the phase, relative to the size at its start, or
+        ``None`` if the memory is not traced. It is also ``None`` before
+        Python 3.9, where the peak cannot be reset at the start of a phase.
+'''
+
+ConverterStats = collections.namedtuple(
+    'ConverterStats', ('calls', 'time'))
+ConverterStats.__doc__ = '''The statistics of a converter of a function.
+
+Attributes:
+    calls (int): The number of times the converter is called.
+    time (float): The cumulative time in seconds spent in the converter.
+'''
+
+
+class ExportProfile(object):
+    """A report of an export made by :class:`Profiler`.
+
+    Attributes:
+        phases (collections.OrderedDict): :class:`PhaseStats` keyed by the
+            names of the phases in the order they are run, e.g.
+            ``'forward'``, ``'convert'``, ``'rename'``, ``'check'`` and
+            ``'save'``, or ``'cache'`` instead of the phases building the
+            graph on a cache hit.
+        converters (dict): :class:`ConverterStats` keyed by the names of the
+            converted Chainer functions.
+        num_nodes (int): The number of nodes of the exported graph.
+        num_initializers (int): The number of initializers of the exported
+            graph.
+        bytes_written (int): The number of bytes written to the model file
+            and the external data files.
+        cache_hit (bool): Whether the model is taken from the export cache.
+        passes (list): :class:`~onnx_chainer.optimize.PassStats` of the
+            optimization passes in the order they are run.
+
+    """
+
+    def __init__(self):
+        self.phases = collections.OrderedDict()
+        self.converters = {}
+        self.num_nodes = 0
+        self.num_initializers = 0
+        self.bytes_written = 0
+        self.cache_hit = False
+        self.passes = []
+
+    @property
+    def total_time(self):
+        """The total wall time in seconds of all the phases."""
+        return sum(stats.wall_time for stats in self.phases.values())
+
+    def to_dict(self):
+        """Returns the report as a dict of plain values."""
+        return {
+            'phases': collections.OrderedDict(
+                (name, stats._asdict())
+                for name, stats in self.phases.items()),
+            'converters': {
+                name: stats._asdict()
+                for name, stats in self.converters.items()},
+            'num_nodes': self.num_nodes,
+            'num_initializers': self.num_initializers,
+            'bytes_written': self.bytes_written,
+            'cache_hit': self.cache_hit,
+            'passes': [stats._asdict() for stats in self.passes],
+        }
+
+    def summary(self, top=10):
+        """Returns a human-readable summary of the report.
+
+        Args:
+            top (int): The number of the slowest converters to show.
+
+        Returns:
+            A multi-line str.
+        """
+        lines = ['export: {:.3f} s, {} nodes, {} initializers, {} bytes '
+                 'written{}'.format(
+                     self.total_time, self.num_nodes, self.num_initializers,
+                     self.bytes_written,
+                     ' (cache hit)' if self.cache_hit else '')]
+        for name, stats in self.phases.items():
+            line = '  {:<14s}{:10.3f} s'.format(name, stats.wall_time)
+            if stats.peak_memory is not None:
+                line += '{:14d} B peak'.format(stats.peak_memory)
+            lines.append(line)
+        for stats in self.passes:
+            lines.append(
+                '  pass {:<26s}{:6d} nodes{:6d} initializers{:10.3f} s'
+                .format(stats.name, stats.nodes_removed,
+                        stats.initializers_folded, stats.time))
+        converters = sorted(
+            self.converters.items(), key=lambda item: -item[1].time)
+        for name, stats in converters[:top]:
+            lines.append('  convert_{:<24s}{:6d} calls{:10.3f} s'.format(
+                name, stats.calls, stats.time))
+        return '\n'.join(lines)
+
+
+class Profiler(object):
+    """Collects the statistics of an export.
+
+    Give the profiler to :func:`~onnx_chainer.export` with the ``profiler``
+    argument. The report of the last export is stored in :attr:`report`,
+    and is also passed to ``callback`` if given, which can be used to log it,
+    e.g. ``Profiler(callback=lambda r: logger.info(r.summary()))``.
+
+    Args:
+        trace_memory (bool): If True, the peak memory of each phase is traced
+            with :mod:`tracemalloc`, which slows down the export and inflates
+            the wall times. Tracing is started and stopped by the profiler
+            unless it is already running. The peak memory is only traced on
+            Python 3.9 or later, and this option is ignored otherwise.
+        callback (callable): A function called with the
+            :class:`ExportProfile` at the end of each export.
+
+    Attributes:
+        report (ExportProfile): The report of the last export, or ``None``
+            if nothing has been exported.
+
+    """
+
+    def __init__(self, trace_memory=False, callback=None):
+        self.trace_memory = trace_memory
+        self.callback = callback
+        self.report = None
+        self._report = None
+        self._phase = None
+        self._started_tracing = False
+
+    @contextlib.contextmanager
+    def export(self):
+        """Collects a new report during the context."""
+        report = ExportProfile()
+        self._started_tracing = False
+        if self._traces_memory() and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        self._report = report
+        self._phase = None
+        try:
+            yield report
+        finally:
+            self._end_phase()
+            if self._started_tracing:
+                tracemalloc.stop()
+            self._report = None
+        self.report = report
+        if self.callback is not None:
+            self.callback(report)
+
+    def phase(self, name):
+        """Starts a phase of the export, ending the current one.
+
+        A phase lasts until the next phase starts or the export ends. The
+        statistics of a phase run more than once are accumulated, with the
+        largest peak memory.
+        """
+        self._end_phase()
+        start_memory = None
+        if self._traces_memory() and tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+            start_memory = tracemalloc.get_traced_memory()[0]
+        self._phase = name, time.perf_counter(), start_memory
+
+    def _traces_memory(self):
+        # Without `reset_peak`, the peak would be that of the whole trace
+        return self.trace_memory and hasattr(tracemalloc, 'reset_peak')
+
+    def _end_phase(self):
+        if self._phase is None:
+            return
+        name, start, start_memory = self._phase
+        self._phase = None
+        wall_time = time.perf_counter() - start
+        peak_memory = None
+        if start_memory is not None:
+            peak_memory = max(
+                tracemalloc.get_traced_memory()[1] - start_memory, 0)
+        previous = self._report.phases.get(name)
+        if previous is not None:
+            wall_time += previous.wall_time
+            if previous.peak_memory is not None:
+                peak_memory = max(peak_memory, previous.peak_memory)
+        self._report.phases[name] = PhaseStats(wall_time, peak_memory)
+
+    def add_converter_call(self, func_name, elapsed):
+        """Records a call of the converter of a function."""
+        stats = self._report.converters.get(func_name)
+        if stats is None:
+            stats = ConverterStats(0, 0.0)
+        self._report.converters[func_name] = ConverterStats(
+            stats.calls + 1, stats.time + elapsed)
+
+    def set_passes(self, stats):
+        """Records the statistics of the optimization passes."""
+        self._report.passes.extend(stats)
+
+    def set_counts(self, onnx_model, bytes_written, cache_hit=False):
+        """Records the sizes of an exported model."""
+        self._report.num_nodes = len(onnx_model.graph.node)
+        self._report.num_initializers = len(onnx_model.graph.initializer)
+        self._report.bytes_written += bytes_written
+        self._report.cache_hit = cache_hit
+
+
+class _NullProfiler(object):
+    # Used when no profiler is given, so that the export does not need to
+    # check whether it is profiled
+
+    @contextlib.contextmanager
+    def export(self):
+        yield None
+
+    def phase(self, name):
+        pass
+
+    def add_converter_call(self, func_name, elapsed):
+        pass
+
+    def set_passes(self, stats):
+        pass
+
+    def set_counts(self, onnx_model, bytes_written, cache_hit=False):
+        pass
+
+
+null_profiler = _NullProfiler()
@@ -0,0 +1,110 @@
+import threading
+
+from onnx_chainer import functions
+from onnx_chainer import mapping
+
+
+def _resolve_opset_version(versions, opset_version):
+    if isinstance(versions, int):
+        return versions
+    if opset_version is None:
+        # If no opset version is specified, use the latest version for the
+        # operator
+        return versions[-1]
+    # If a version is specified, use the last version <= specified one
+    for version in sorted(versions, reverse=True):
+        if version <= opset_version:
+            break
+    return version
+
+
+class ConverterRegistry(object):
+    """Converters of Chainer functions resolved for an opset version.
+
+    The converter and the operator version of each function are resolved
+    on its first lookup, which imports only the module defining the
+    converter, and are cached afterwards, so looking up a function is a
+    single dict access.
+
+    Args:
+      opset_version (int): The opset version of the ONNX model to export. If
+        ``None``, the latest versions of the operators are used.
+    """
+
+    def __init__(self, opset_version):
+        self.opset_version = opset_version
+        # Pairs of converters and operator versions keyed by function names
+        self._converters = {}
+        # Tuples of function names, converters and operator versions keyed
+        # by function classes
+        self._classes = {}
+
+    def get(self, func_name):
+        """Returns the converter of a function.
+
+        Args:
+          func_name (str): The class name of a Chainer function.
+
+        Returns:
+          A tuple of the converter and the operator version to pass to it.
+        """
+        entry = self._converters.get(func_name)
+        if entry is None:
+            entry = self._resolve(func_name)
+            self._converters[func_name] = entry
+        return entry
+
+    def _resolve(self, func_name):
+        versions = mapping.operators.get(func_name)
+        converter = functions.get_converter(func_name)
+        if versions is None or converter is None:
+            raise ValueError('{} is not supported.'.format(func_name))
+        version = _resolve_opset_version(versions, self.opset_version)
+        if self.opset_version is not None and version > self.opset_version:
+            raise RuntimeError('ONNX-chainer cannot convert `{}` of Chainer '
+                               'with ONNX opset_version {}'.format(
+                                   func_name, self.opset_version))
+        return converter, version
+
+    def lookup(self, function_class):
+        """Returns the converter of a function class.
+
+        Args:
+          function_class (type): The class of a Chainer function.
+
+        Returns:
+          A tuple of the function name, the converter and the operator
+          version to pass to the converter.
+        """
+        entry = self._classes.get(function_class)
+        if entry is None:
+            func_name = function_class.__name__
+            entry = (func_name,) + self.get(func_name)
+            self._classes[function_class] = entry
+        return entry
+
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def get_registry(opset_version):
+    """Returns the converter registry for an opset version.
+
+    The registry is made on the first call for each opset version and
+    reused afterwards.
+
+    Args:
+      opset_version (int): The opset version of the ONNX model to export.
+
+    Returns:
+      A :class:`ConverterRegistry` object.
+    """
+    registry = _registries.get(opset_version)
+    if registry is None:
+        with _registries_lock:
+            registry = _registries.get(opset_version)
+            if registry is None:
+                registry = ConverterRegistry(opset_version)
+                _registries[opset_version] = registry
+    return registry
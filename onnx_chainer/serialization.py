@@ -0,0 +1,539 @@
+import collections
+from concurrent import futures
+import hashlib
+import os
+import shutil
+import sys
+
+import chainer
+import numpy
+import onnx
+from onnx.mapping import NP_TYPE_TO_TENSOR_TYPE
+from onnx import numpy_helper
+from onnx import TensorProto
+
+
+# Field numbers of ONNX protobuf messages
+_MODEL_GRAPH = 7
+_GRAPH_NODE = 1
+_GRAPH_INITIALIZER = 5
+_NODE_ATTRIBUTE = 5
+_TENSOR_RAW_DATA = 9
+
+_WIRE_TYPE_LENGTH_DELIMITED = 2
+
+# External data is supported since onnx 1.4.0
+EXTERNAL_DATA_SUPPORTED = \
+    'data_location' in TensorProto.DESCRIPTOR.fields_by_name
+
+_TENSOR_DATA_FIELDS = tuple(
+    field for field in (
+        'float_data', 'int32_data', 'string_data', 'int64_data', 'raw_data',
+        'external_data', 'data_location', 'double_data', 'uint64_data')
+    if field in TensorProto.DESCRIPTOR.fields_by_name)
+
+# Offsets of tensors in external data files are aligned so that the arrays
+# memory-mapped from the files are aligned as well
+_EXTERNAL_DATA_ALIGNMENT = 64
+
+
+def _encode_varint(value):
+    encoded = bytearray()
+    while True:
+        bits = value & 0x7f
+        value >>= 7
+        if value:
+            encoded.append(bits | 0x80)
+        else:
+            encoded.append(bits)
+            return bytes(encoded)
+
+
+def _encode_key(field_number, length):
+    return _encode_varint(
+        (field_number << 3) | _WIRE_TYPE_LENGTH_DELIMITED) + \
+        _encode_varint(length)
+
+
+def _copy_fields(message, predicate):
+    # Copies only the fields whose numbers satisfy `predicate`
+    partial = type(message)()
+    for field, value in message.ListFields():
+        if not predicate(field.number):
+            continue
+        if field.label == field.LABEL_REPEATED:
+            getattr(partial, field.name).extend(value)
+        elif field.type == field.TYPE_MESSAGE:
+            getattr(partial, field.name).CopyFrom(value)
+        else:
+            setattr(partial, field.name, value)
+    return partial
+
+
+def _serialize_fields(message, predicate):
+    return _copy_fields(message, predicate).SerializeToString()
+
+
+def without_initializers(onnx_model):
+    """Returns a copy of an ONNX model without the initializers.
+
+    The initializers are not copied at all, so this is cheap even for a
+    large model.
+    """
+    model = _copy_fields(onnx_model, lambda n: n != _MODEL_GRAPH)
+    model.graph.CopyFrom(_copy_fields(
+        onnx_model.graph, lambda n: n != _GRAPH_INITIALIZER))
+    return model
+
+
+def has_data(tensor):
+    """Returns whether an ONNX tensor holds its values.
+
+    Args:
+      tensor (onnx.TensorProto): A tensor.
+
+    Returns:
+      True if the values are stored in any of the data fields, or are stored
+      as external data.
+    """
+    return (tensor.HasField('raw_data') or is_external(tensor) or
+            len(tensor.float_data) > 0 or len(tensor.int32_data) > 0 or
+            len(tensor.string_data) > 0 or len(tensor.int64_data) > 0 or
+            len(tensor.double_data) > 0 or len(tensor.uint64_data) > 0)
+
+
+def make_tensor_header(name, array):
+    """Makes an ONNX tensor which only has the name, shape and dtype.
+
+    Args:
+      name (str): The name of the tensor.
+      array (numpy.ndarray or cupy.ndarray): The array whose values will be
+        given later, e.g. by :func:`write_model`.
+
+    Returns:
+      An `onnx.TensorProto` object without data.
+    """
+    tensor = TensorProto()
+    tensor.name = name
+    tensor.dims.extend(array.shape)
+    tensor.data_type = NP_TYPE_TO_TENSOR_TYPE[array.dtype]
+    return tensor
+
+
+def as_raw_array(array):
+    """Returns a C-contiguous little-endian CPU array of the same values.
+
+    No copy is made if ``array`` already satisfies the conditions, so the
+    buffer of the result can be written to a file as ``raw_data`` of an ONNX
+    tensor.
+    """
+    array = numpy.ascontiguousarray(chainer.cuda.to_cpu(array))
+    if sys.byteorder == 'big' and array.dtype.byteorder != '|':
+        array = array.byteswap()
+    return array
+
+
+def set_raw_data(tensor, array):
+    """Sets the values of an array to an ONNX tensor in place.
+
+    The values replace any data the tensor already has. The shape and the
+    dtype of the tensor are not changed.
+
+    Protobuf only accepts ``bytes`` for ``raw_data``, so the values are first
+    copied from the array into a ``bytes`` object, which the C++ and upb
+    implementations of protobuf copy again into the tensor. The intermediate
+    ``bytes`` object is released on return, so at most one extra copy of the
+    array is alive at a time. Use :func:`write_model` to write the values to
+    a file without copying them into the model at all.
+
+    Args:
+      tensor (onnx.TensorProto): The tensor to be updated.
+      array (numpy.ndarray or cupy.ndarray): The array of the values.
+    """
+    _set_raw_bytes(tensor, _to_raw_bytes(array))
+
+
+def set_raw_data_many(tensors, arrays, workers=None):
+    """Sets the values of arrays to ONNX tensors in place concurrently.
+
+    The arrays are converted to bytes in a thread pool, since the copies of
+    numpy release the GIL. The bytes are set to the tensors in order in the
+    calling thread, so the result is the same as calling
+    :func:`set_raw_data` for each pair, except that the temporary bytes of
+    several arrays may be alive at once.
+
+    Args:
+      tensors (list of onnx.TensorProto): The tensors to be updated.
+      arrays (list of numpy.ndarray or cupy.ndarray): The arrays of the
+        values, in the same order as ``tensors``.
+      workers (int): The number of threads. If ``None`` or ``1``, the arrays
+        are converted in the calling thread.
+    """
+    if workers is None or workers <= 1 or len(arrays) <= 1:
+        for tensor, array in zip(tensors, arrays):
+            set_raw_data(tensor, array)
+        return
+    with futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        # `map` yields the results in the order of the arrays
+        for tensor, data in zip(
+                tensors, executor.map(_to_raw_bytes, arrays)):
+            _set_raw_bytes(tensor, data)
+
+
+def _to_raw_bytes(array):
+    return as_raw_array(array).tobytes()
+
+
+def _set_raw_bytes(tensor, data):
+    for field in _TENSOR_DATA_FIELDS:
+        tensor.ClearField(field)
+    tensor.raw_data = data
+
+
+class _StreamedTensor(object):
+
+    def __init__(self, tensor, array):
+        # `array` is either an array or the raw data of `tensor` itself
+        self.array = array
+        self.head = _serialize_fields(
+            tensor, lambda n: n < _TENSOR_RAW_DATA)
+        self.tail = _serialize_fields(
+            tensor, lambda n: n > _TENSOR_RAW_DATA)
+        nbytes = len(array) if isinstance(array, bytes) else array.nbytes
+        self.raw_key = _encode_key(_TENSOR_RAW_DATA, nbytes)
+        self.size = len(self.head) + len(self.raw_key) + nbytes + \
+            len(self.tail)
+
+    def write(self, f):
+        key = _encode_key(_GRAPH_INITIALIZER, self.size)
+        f.write(key)
+        f.write(self.head)
+        f.write(self.raw_key)
+        if isinstance(self.array, bytes):
+            f.write(self.array)
+        else:
+            # The array is converted only here, to keep at most one
+            # converted array alive
+            f.write(memoryview(
+                as_raw_array(self.array).reshape(-1)).cast('B'))
+        f.write(self.tail)
+        return len(key) + self.size
+
+
+def write_model(onnx_model, f, arrays=None):
+    """Writes an ONNX model to a file, streaming the initializer values.
+
+    Initializers of ``onnx_model`` that hold no data are written with the
+    values of the arrays of the same names in ``arrays``. The values are
+    written directly from the buffers of the arrays, or from the raw data of
+    the initializers, one by one, so the serialized model is never built in
+    memory. The written bytes are the
+    same as ``SerializeToString()`` of the model whose initializers are
+    filled with the arrays.
+
+    Args:
+      onnx_model (onnx.ModelProto): The model to be written.
+      f (file-like object): A binary file object to write to.
+      arrays (dict): Arrays keyed by the names of initializers.
+
+    Returns:
+      The number of bytes written.
+    """
+    if arrays is None:
+        arrays = {}
+    graph = onnx_model.graph
+
+    # The length of the graph must precede its contents, so the sizes of all
+    # the initializers are computed first
+    initializers = []
+    graph_size = 0
+    for tensor in graph.initializer:
+        if tensor.name in arrays and not has_data(tensor):
+            initializer = _StreamedTensor(tensor, arrays[tensor.name])
+            size = initializer.size
+        elif tensor.HasField('raw_data'):
+            initializer = _StreamedTensor(tensor, tensor.raw_data)
+            size = initializer.size
+        else:
+            initializer = tensor.SerializeToString()
+            size = len(initializer)
+        initializers.append(initializer)
+        graph_size += len(_encode_key(_GRAPH_INITIALIZER, size)) + size
+
+    graph_head = _serialize_fields(graph, lambda n: n < _GRAPH_INITIALIZER)
+    graph_tail = _serialize_fields(graph, lambda n: n > _GRAPH_INITIALIZER)
+    graph_size += len(graph_head) + len(graph_tail)
+
+    written = 0
+    for chunk in (_serialize_fields(onnx_model, lambda n: n < _MODEL_GRAPH),
+                  _encode_key(_MODEL_GRAPH, graph_size),
+                  graph_head):
+        f.write(chunk)
+        written += len(chunk)
+    for initializer in initializers:
+        if isinstance(initializer, _StreamedTensor):
+            written += initializer.write(f)
+        else:
+            key = _encode_key(_GRAPH_INITIALIZER, len(initializer))
+            f.write(key)
+            f.write(initializer)
+            written += len(key) + len(initializer)
+    for chunk in (graph_tail,
+                  _serialize_fields(onnx_model, lambda n: n > _MODEL_GRAPH)):
+        f.write(chunk)
+        written += len(chunk)
+    return written
+
+
+def is_external(tensor):
+    """Returns whether the values of an ONNX tensor are stored externally."""
+    return EXTERNAL_DATA_SUPPORTED and \
+        tensor.data_location == TensorProto.EXTERNAL
+
+
+def check_external_data_supported():
+    """Raises an error if onnx does not support external data."""
+    if not EXTERNAL_DATA_SUPPORTED:
+        raise RuntimeError(
+            'External data requires onnx>=1.4.0, but onnx {} is '
+            'installed'.format(onnx.__version__))
+
+
+def write_external_data(onnx_model, filename, arrays=None, threshold=1024,
+                        shard_size=None):
+    """Moves the values of initializers to files next to the model file.
+
+    Each initializer whose values have at least ``threshold`` bytes is
+    written to an external data file directly from its array, and the
+    initializer is replaced with a reference to the file. The files are
+    named after ``filename``; ``<filename>.data`` if ``shard_size`` is
+    ``None``, ``<filename>.<index>.data`` otherwise. Smaller initializers are
+    kept in the model.
+
+    Args:
+      onnx_model (onnx.ModelProto): The model to be updated in place.
+      filename (str): The filename of the model. The external data files are
+        created in the same directory.
+      arrays (dict): Arrays keyed by the names of initializers which hold no
+        data.
+      threshold (int): The minimum size in bytes of the initializers to be
+        stored externally.
+      shard_size (int): The maximum size in bytes of each external data
+        file. A tensor larger than this is written to a file of its own. If
+        ``None``, all the values are written to one file.
+
+    Returns:
+      A list of the paths of the written external data files.
+    """
+    check_external_data_supported()
+    if arrays is None:
+        arrays = {}
+    base_dir, base_name = os.path.split(filename)
+    paths = []
+    f = None
+    size = 0
+    try:
+        for tensor in onnx_model.graph.initializer:
+            if is_external(tensor):
+                continue
+            if has_data(tensor):
+                array = numpy_helper.to_array(tensor)
+            else:
+                array = arrays[tensor.name]
+            if array.nbytes < threshold:
+                if not has_data(tensor):
+                    set_raw_data(tensor, array)
+                continue
+
+            offset = -size % _EXTERNAL_DATA_ALIGNMENT + size
+            if f is None or (shard_size is not None and size > 0 and
+                             offset + array.nbytes > shard_size):
+                if f is not None:
+                    f.close()
+                if shard_size is None:
+                    location = '{}.data'.format(base_name)
+                else:
+                    location = '{}.{}.data'.format(base_name, len(paths))
+                paths.append(os.path.join(base_dir, location))
+                f = open(paths[-1], 'wb')
+                size = offset = 0
+            f.write(b'\0' * (offset - size))
+            f.write(memoryview(as_raw_array(array).reshape(-1)).cast('B'))
+            size = offset + array.nbytes
+
+            tensor.CopyFrom(make_tensor_header(tensor.name, array))
+            tensor.data_location = TensorProto.EXTERNAL
+            for key, value in (('location', location),
+                               ('offset', str(offset)),
+                               ('length', str(array.nbytes))):
+                entry = tensor.external_data.add()
+                entry.key = key
+                entry.value = value
+    finally:
+        if f is not None:
+            f.close()
+    return paths
+
+
+def overwrite_external_data(tensors, arrays, base_dir):
+    """Overwrites the values of externally stored tensors in their files.
+
+    The values are written in place over the byte ranges which the tensors
+    refer to, so the files keep their layout and the tensors are not
+    changed.
+
+    Args:
+      tensors (list of onnx.TensorProto): The tensors stored externally.
+      arrays (list of numpy.ndarray or cupy.ndarray): The arrays of the new
+        values, in the same order as ``tensors``.
+      base_dir (str): The directory where the external data files are.
+    """
+    check_external_data_supported()
+    ranges = {}
+    for tensor, array in zip(tensors, arrays):
+        info = _external_data_info(tensor)
+        if 'length' in info and int(info['length']) != array.nbytes:
+            raise ValueError(
+                'The external data of {} has {} bytes, but the array has {} '
+                'bytes'.format(tensor.name, info['length'], array.nbytes))
+        ranges.setdefault(info['location'], []).append(
+            (int(info.get('offset', 0)), array))
+    for location, entries in ranges.items():
+        with open(os.path.join(base_dir, location), 'r+b') as f:
+            for offset, array in sorted(entries, key=lambda e: e[0]):
+                f.seek(offset)
+                f.write(memoryview(as_raw_array(array).reshape(-1)).cast('B'))
+
+
+def copy_external_data(onnx_model, base_dir, filename):
+    """Copies the external data files of a model for another model file.
+
+    The files are copied as they are to the directory of ``filename`` and
+    renamed after it as :func:`write_external_data` names them, so the
+    offsets of the tensors are kept. The locations of the tensors of
+    ``onnx_model`` are updated in place to refer to the copies.
+
+    Args:
+      onnx_model (onnx.ModelProto): The model whose tensors are stored
+        externally.
+      base_dir (str): The directory where the external data files are.
+      filename (str): The filename of the new model.
+
+    Returns:
+      A list of the paths of the copied external data files.
+    """
+    check_external_data_supported()
+    new_dir, new_name = os.path.split(filename)
+    locations = collections.OrderedDict()
+    for tensor in onnx_model.graph.initializer:
+        if not is_external(tensor):
+            continue
+        for entry in tensor.external_data:
+            if entry.key != 'location':
+                continue
+            if entry.value not in locations:
+                # `<name>.data` or `<name>.<index>.data` keeps its suffix
+                suffix = entry.value.split('.')
+                suffix = suffix[-2:] if len(suffix) > 2 and \
+                    suffix[-2].isdigit() else suffix[-1:]
+                locations[entry.value] = '.'.join([new_name] + suffix)
+            entry.value = locations[entry.value]
+    paths = []
+    for location, new_location in locations.items():
+        paths.append(os.path.join(new_dir, new_location))
+        shutil.copyfile(os.path.join(base_dir, location), paths[-1])
+    return paths
+
+
+def _external_data_info(tensor):
+    return {entry.key: entry.value for entry in tensor.external_data}
+
+
+def _tensor_summary(tensor, array=None):
+    # Returns the fields of a tensor in the text format, with its values
+    # replaced by their size and SHA-1 hash
+    fields = ['name: "{}"'.format(tensor.name)] if tensor.name else []
+    fields.append('dims: [{}]'.format(', '.join(map(str, tensor.dims))))
+    fields.append('data_type: {}'.format(
+        TensorProto.DataType.Name(tensor.data_type)))
+    if is_external(tensor):
+        info = _external_data_info(tensor)
+        fields.append('location: "{}"'.format(info.get('location')))
+        for key in ('offset', 'length'):
+            if key in info:
+                fields.append('{}: {}'.format(key, info[key]))
+        return ' '.join(fields)
+
+    if tensor.HasField('raw_data'):
+        data = tensor.raw_data
+    elif has_data(tensor):
+        array = as_raw_array(numpy_helper.to_array(tensor))
+        data = memoryview(array.reshape(-1)).cast('B')
+    elif array is not None:
+        data = memoryview(as_raw_array(array).reshape(-1)).cast('B')
+    else:
+        return ' '.join(fields)
+    fields.append('nbytes: {}'.format(len(data)))
+    fields.append('sha1: "{}"'.format(hashlib.sha1(data).hexdigest()))
+    return ' '.join(fields)
+
+
+def _write_message(f, message, indent):
+    # Writes a message in the text format without the enclosing braces
+    for line in str(message).splitlines():
+        f.write('{}{}\n'.format(indent, line))
+
+
+def _write_node(f, node, indent):
+    f.write('{}node {{\n'.format(indent))
+    _write_message(
+        f, _copy_fields(node, lambda n: n != _NODE_ATTRIBUTE), indent + '  ')
+    for attribute in node.attribute:
+        if attribute.type == attribute.TENSOR:
+            f.write('{}  attribute {{ name: "{}" type: TENSOR t {{ {} }} }}'
+                    '\n'.format(indent, attribute.name,
+                                _tensor_summary(attribute.t)))
+        elif attribute.type == attribute.TENSORS:
+            f.write('{}  attribute {{ name: "{}" type: TENSORS {} }}\n'.format(
+                indent, attribute.name, ' '.join(
+                    'tensors {{ {} }}'.format(_tensor_summary(t))
+                    for t in attribute.tensors)))
+        else:
+            f.write('{}  attribute {{\n'.format(indent))
+            _write_message(f, attribute, indent + '    ')
+            f.write('{}  }}\n'.format(indent))
+    f.write('{}}}\n'.format(indent))
+
+
+def write_text(onnx_model, f, arrays=None):
+    """Writes a readable summary of an ONNX model in the text format.
+
+    The model is written like ``print(onnx_model)``, except that the values
+    of each tensor are replaced with their size in bytes and their SHA-1
+    hash, or with the location of its external data. The text is written
+    message by message, so the whole text is never built in memory.
+
+    Args:
+      onnx_model (onnx.ModelProto): The model to be written.
+      f (file-like object): A text file object to write to.
+      arrays (dict): Arrays keyed by the names of initializers which hold no
+        data, e.g. those to be streamed by :func:`write_model`.
+    """
+    if arrays is None:
+        arrays = {}
+    graph = onnx_model.graph
+    _write_message(
+        f, _copy_fields(onnx_model, lambda n: n < _MODEL_GRAPH), '')
+    f.write('graph {\n')
+    for node in graph.node:
+        _write_node(f, node, '  ')
+    _write_message(f, _copy_fields(
+        graph, lambda n: _GRAPH_NODE < n < _GRAPH_INITIALIZER), '  ')
+    for tensor in graph.initializer:
+        f.write('  initializer {{ {} }}\n'.format(
+            _tensor_summary(tensor, arrays.get(tensor.name))))
+    _write_message(
+        f, _copy_fields(graph, lambda n: n > _GRAPH_INITIALIZER), '  ')
+    f.write('}\n')
+    _write_message(
+        f, _copy_fields(onnx_model, lambda n: n > _MODEL_GRAPH), '')
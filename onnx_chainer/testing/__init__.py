@@ -1,2 +1,3 @@
+from onnx_chainer.testing import external_data  # NOQA
 from onnx_chainer.testing import test_mxnet  # NOQA
 from onnx_chainer.testing import test_onnxruntime  # NOQA
@@ -0,0 +1,76 @@
+import collections
+import os
+
+import numpy as np
+import onnx
+from onnx import mapping
+from onnx import numpy_helper
+
+from onnx_chainer import serialization
+
+
+def _external_data_info(tensor):
+    info = {entry.key: entry.value for entry in tensor.external_data}
+    return (info['location'], int(info.get('offset', 0)),
+            int(info['length']) if 'length' in info else None)
+
+
+def load_initializers(onnx_model, base_dir=''):
+    """Returns the values of the initializers of an ONNX model.
+
+    The values stored in external data files are memory-mapped from the
+    files instead of being read into memory, so the arrays of a large model
+    can be compared without holding a copy of the whole model.
+
+    Args:
+        onnx_model (onnx.ModelProto): The model whose initializers are
+            loaded.
+        base_dir (str): The directory where the external data files are.
+
+    Returns:
+        An ``OrderedDict`` of read-only arrays keyed by the names of the
+        initializers.
+
+    """
+    files = {}
+    arrays = collections.OrderedDict()
+    for tensor in onnx_model.graph.initializer:
+        if not serialization.is_external(tensor):
+            arrays[tensor.name] = numpy_helper.to_array(tensor)
+            continue
+        location, offset, length = _external_data_info(tensor)
+        dtype = np.dtype(mapping.TENSOR_TYPE_TO_NP_TYPE[tensor.data_type])
+        shape = tuple(tensor.dims)
+        if length is None:
+            length = int(np.prod(shape)) * dtype.itemsize
+        if length == 0:
+            arrays[tensor.name] = np.empty(shape, dtype=dtype)
+            continue
+        if location not in files:
+            files[location] = np.memmap(
+                os.path.join(base_dir, location), dtype=np.uint8, mode='r')
+        buf = files[location][offset:offset + length]
+        arrays[tensor.name] = buf.view(dtype).reshape(shape)
+    return arrays
+
+
+def load_model(filename):
+    """Loads an ONNX model without reading its external data into memory.
+
+    Args:
+        filename (str): The filename of the model exported with
+            ``external_data=True``.
+
+    Returns:
+        A tuple of the ``onnx.ModelProto`` object, whose initializers still
+        refer to the external data files, and the ``OrderedDict`` returned
+        by :func:`load_initializers`.
+
+    """
+    if serialization.EXTERNAL_DATA_SUPPORTED:
+        onnx_model = onnx.load(filename, load_external_data=False)
+    else:
+        # The model cannot refer to external data
+        onnx_model = onnx.load(filename)
+    arrays = load_initializers(onnx_model, os.path.dirname(filename))
+    return onnx_model, arrays
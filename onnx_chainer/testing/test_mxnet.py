@@ -1,4 +1,5 @@
 import collections
+import importlib.util
 import os
 import warnings
 
@@ -8,15 +9,13 @@ import onnx
 
 import onnx_chainer
 
-try:
-    import mxnet
-    MXNET_AVAILABLE = True
-except ImportError:
+# MXNet is imported only when it is used, since importing it is slow
+MXNET_AVAILABLE = importlib.util.find_spec('mxnet') is not None
+if not MXNET_AVAILABLE:
     warnings.warn(
         'MXNet is not installed. Please install mxnet to use '
         'testing utility for compatibility checking.',
         ImportWarning)
-    MXNET_AVAILABLE = False
 
 
 def check_compatibility(model, x, fn, out_keys=None, opset_version=None):
@@ -24,6 +23,7 @@ def check_compatibility(model, x, fn, out_keys=None, opset_version=None):
         opset_version = onnx.defs.onnx_opset_version()
     if not MXNET_AVAILABLE:
         raise ImportError('check_compatibility requires MXNet.')
+    import mxnet
 
     chainer.config.train = False
 
@@ -1,3 +1,4 @@
+import importlib.util
 import os
 import warnings
 
@@ -7,15 +8,13 @@ import onnx
 
 import onnx_chainer
 
-try:
-    import onnxruntime as rt
-    ONNXRUNTIME_AVAILABLE = True
-except ImportError:
+# ONNXRuntime is imported only when it is used, since importing it is slow
+ONNXRUNTIME_AVAILABLE = importlib.util.find_spec('onnxruntime') is not None
+if not ONNXRUNTIME_AVAILABLE:
     warnings.warn(
         'ONNXRuntime is not installed. Please install it to use '
         ' the testing utility for ONNX-Chainer\'s converters.',
         ImportWarning)
-    ONNXRUNTIME_AVAILABLE = False
 
 
 MINIMUM_OPSET_VERSION = 7
@@ -33,6 +32,7 @@ def check_output(model, x, filename, out_keys=None, opset_version=None):
         opset_version = onnx.defs.onnx_opset_version()
     if not ONNXRUNTIME_AVAILABLE:
         raise ImportError('check_output requires onnxruntime.')
+    import onnxruntime as rt
 
     chainer.config.train = False
 
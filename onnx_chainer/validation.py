@@ -0,0 +1,167 @@
+from onnx import defs
+
+
+CHECK_LEVELS = ('full', 'structural', 'off')
+
+
+class NodeValidator(object):
+    """Validates ONNX nodes against the operator schemas of an opset version.
+
+    Each node is checked on its own, so nodes can be validated one by one as
+    the converters create them. The schema of each operator type is looked
+    up once and reused.
+
+    Args:
+      opset_version (int): The opset version of the ONNX model.
+    """
+
+    def __init__(self, opset_version):
+        self.opset_version = opset_version
+        self._schemas = {}
+
+    def _get_schema(self, node):
+        key = node.domain, node.op_type
+        if key not in self._schemas:
+            try:
+                schema = defs.get_schema(
+                    node.op_type, self.opset_version, node.domain)
+            except defs.SchemaError:
+                schema = None
+            self._schemas[key] = schema
+        return self._schemas[key]
+
+    def check_node(self, node):
+        """Checks the numbers of inputs and outputs and the attributes.
+
+        Nodes of custom domains whose schemas are not registered are not
+        checked.
+
+        Args:
+          node (onnx.NodeProto): The node to check.
+        """
+        schema = self._get_schema(node)
+        if schema is None:
+            if node.domain in ('', 'ai.onnx'):
+                raise ValueError(
+                    'Node {} has an unknown operator {} in opset version '
+                    '{}'.format(node.name, node.op_type, self.opset_version))
+            return
+        if schema.deprecated:
+            raise ValueError(
+                'Node {} has the operator {} which is deprecated in opset '
+                'version {}'.format(
+                    node.name, node.op_type, self.opset_version))
+
+        for kind, n, min_n, max_n in (
+                ('inputs', len(node.input), schema.min_input,
+                 schema.max_input),
+                ('outputs', len(node.output), schema.min_output,
+                 schema.max_output)):
+            if not min_n <= n <= max_n:
+                raise ValueError(
+                    'Node {} of {} has {} {}, but {} to {} are expected'
+                    .format(node.name, node.op_type, n, kind, min_n, max_n))
+
+        names = set()
+        for attribute in node.attribute:
+            if attribute.name in names:
+                raise ValueError(
+                    'Node {} of {} has the attribute {} twice'.format(
+                        node.name, node.op_type, attribute.name))
+            names.add(attribute.name)
+            attribute_schema = schema.attributes.get(attribute.name)
+            if attribute_schema is None:
+                raise ValueError(
+                    'Node {} of {} has an unknown attribute {}'.format(
+                        node.name, node.op_type, attribute.name))
+            if attribute.type != int(attribute_schema.type):
+                raise ValueError(
+                    'The attribute {} of node {} of {} has a wrong type'
+                    .format(attribute.name, node.name, node.op_type))
+        for name, attribute_schema in schema.attributes.items():
+            if attribute_schema.required and name not in names:
+                raise ValueError(
+                    'Node {} of {} does not have the required attribute {}'
+                    .format(node.name, node.op_type, name))
+
+
+def check_graph(graph):
+    """Checks the structure of an ONNX graph in linear time.
+
+    This checks that every value is defined only once (static single
+    assignment), that the nodes are topologically sorted, and that every
+    input of the nodes and every output of the graph is defined by a graph
+    input, an initializer or a node. Unlike :func:`onnx.checker.check_model`,
+    the graph is not serialized, so the values of the initializers are never
+    copied.
+
+    Args:
+      graph (onnx.GraphProto): The graph to check.
+    """
+    defined = set()
+
+    def define(name, kind):
+        if name in defined:
+            raise ValueError(
+                'The value {} is defined more than once, by {}'.format(
+                    name, kind))
+        defined.add(name)
+
+    initializer_names = set()
+    for tensor in graph.initializer:
+        if tensor.name in initializer_names:
+            raise ValueError(
+                'The initializer {} is defined more than once'.format(
+                    tensor.name))
+        initializer_names.add(tensor.name)
+    for value_info in graph.input:
+        define(value_info.name, 'the graph input')
+    for name in initializer_names - defined:
+        defined.add(name)
+
+    produced = {output for node in graph.node for output in node.output}
+    for node in graph.node:
+        for name in node.input:
+            # An empty name is an omitted optional input
+            if not name or name in defined:
+                continue
+            if name in produced:
+                raise ValueError(
+                    'The nodes are not topologically sorted: node {} of {} '
+                    'uses {} before it is defined'.format(
+                        node.name, node.op_type, name))
+            raise ValueError(
+                'Node {} of {} has an undefined input {}'.format(
+                    node.name, node.op_type, name))
+        for name in node.output:
+            if name:
+                define(name, 'node {} of {}'.format(node.name, node.op_type))
+
+    for value_info in graph.output:
+        if value_info.name not in defined:
+            raise ValueError(
+                'The graph output {} is not defined'.format(value_info.name))
+
+
+def check_model(onnx_model, validator=None):
+    """Checks the structure of an ONNX model without serializing it.
+
+    Args:
+      onnx_model (onnx.ModelProto): The model to check.
+      validator (NodeValidator): The validator of the nodes. If ``None``,
+        the nodes are checked against the schemas of the opset version of the
+        model. If the nodes have already been validated, e.g. while they are
+        created, ``False`` skips the check.
+    """
+    if validator is None:
+        opset_version = None
+        for opset_id in onnx_model.opset_import:
+            if opset_id.domain in ('', 'ai.onnx'):
+                opset_version = opset_id.version
+        if opset_version is None:
+            raise ValueError('The model does not import the default opset')
+        validator = NodeValidator(opset_version)
+    if validator:
+        for node in onnx_model.graph.node:
+            validator.check_node(node)
+    check_graph(onnx_model.graph)
@@ -5,6 +5,7 @@ setup(
     packages=[
         'onnx_chainer',
         'onnx_chainer.functions',
+        'onnx_chainer.optimize',
         'onnx_chainer.testing',
     ],
     version='1.3.2',
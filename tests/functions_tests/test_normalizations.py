@@ -4,6 +4,7 @@ import chainer
 import chainer.functions as F
 import chainer.links as L
 from chainer import testing
+import numpy as np
 import onnx
 
 import onnx_chainer
@@ -83,3 +84,61 @@ class TestBatchNormalization(unittest.TestCase):
                 onnx.defs.onnx_opset_version() + 1):
             test_onnxruntime.check_output(
                 self.model, self.x, self.fn, opset_version=opset_version)
+
+
+class TestBatchNormalizationFunction(unittest.TestCase):
+
+    def setUp(self):
+
+        class Model(chainer.Chain):
+
+            def __init__(self, use_running_stats=True):
+                super(Model, self).__init__()
+                with self.init_scope():
+                    self.gamma = chainer.Parameter(
+                        np.random.uniform(0.5, 2, 5).astype(np.float32))
+                    self.beta = chainer.Parameter(
+                        np.random.uniform(-1, 1, 5).astype(np.float32))
+                self.mean = None
+                self.var = None
+                if use_running_stats:
+                    self.mean = np.random.uniform(-1, 1, 5).astype(
+                        np.float32)
+                    self.var = np.random.uniform(0.5, 2, 5).astype(
+                        np.float32)
+
+            def __call__(self, x):
+                return F.batch_normalization(
+                    x, self.gamma, self.beta, running_mean=self.mean,
+                    running_var=self.var)
+
+        self.model_class = Model
+        self.x = input_generator.increasing(2, 5, 3, 3)
+
+    def test_output(self):
+        import onnxruntime
+
+        model = self.model_class()
+        for opset_version in range(
+                onnx_chainer.MINIMUM_OPSET_VERSION,
+                onnx.defs.onnx_opset_version() + 1):
+            onnx_model = onnx_chainer.export(
+                model, self.x, opset_version=opset_version)
+            node, = onnx_model.graph.node
+            self.assertEqual(node.op_type, 'BatchNormalization')
+            self.assertEqual(len(node.output), 1)
+            self.assertNotIn('momentum', [a.name for a in node.attribute])
+
+            # The running statistics are updated by the forward computation
+            # of the export, and the exported values are used
+            expected = F.fixed_batch_normalization(
+                self.x, model.gamma, model.beta, model.mean, model.var).array
+            session = onnxruntime.InferenceSession(
+                onnx_model.SerializeToString())
+            actual, = session.run(None, {'Input_0': self.x})
+            np.testing.assert_allclose(expected, actual, rtol=1e-5, atol=1e-5)
+
+    def test_no_running_stats(self):
+        model = self.model_class(use_running_stats=False)
+        with self.assertRaises(ValueError):
+            onnx_chainer.export(model, self.x)
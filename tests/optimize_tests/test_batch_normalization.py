@@ -0,0 +1,168 @@
+import unittest
+
+import chainer
+import chainer.functions as F
+import chainer.links as L
+import numpy as np
+from onnx import helper
+from onnx import numpy_helper
+from onnx import TensorProto
+
+import onnx_chainer
+from onnx_chainer import optimize
+from onnx_chainer.optimize.batch_normalization import FuseBatchNormalization
+
+
+def _randomize(bn):
+    size = bn.avg_mean.shape
+    bn.gamma.array[...] = np.random.uniform(0.5, 2, size)
+    bn.beta.array[...] = np.random.uniform(-1, 1, size)
+    bn.avg_mean[...] = np.random.uniform(-1, 1, size)
+    bn.avg_var[...] = np.random.uniform(0.5, 2, size)
+
+
+class SharedWeight(chainer.Chain):
+
+    def __init__(self):
+        super(SharedWeight, self).__init__()
+        with self.init_scope():
+            self.conv = L.Convolution2D(3, 3, ksize=1, nobias=True)
+            self.bn = L.BatchNormalization(3)
+
+    def __call__(self, x):
+        h = self.bn(self.conv(x))
+        return self.conv(h)
+
+
+class TestFuseBatchNormalization(unittest.TestCase):
+
+    def check(self, model, x, num_removed):
+        import onnxruntime
+
+        for link in model.links():
+            if isinstance(link, L.BatchNormalization):
+                _randomize(link)
+        with chainer.using_config('train', False):
+            expected = model(x).array
+
+        plain = onnx_chainer.export(
+            model, x, opset_version=onnx_chainer.MINIMUM_OPSET_VERSION)
+        onnx_model = onnx_chainer.export(
+            model, x, opset_version=onnx_chainer.MINIMUM_OPSET_VERSION,
+            optimize=2)
+        op_types = [node.op_type for node in onnx_model.graph.node]
+        self.assertNotIn('BatchNormalization', op_types)
+        self.assertEqual(
+            len(plain.graph.node) - len(onnx_model.graph.node), num_removed)
+        session = onnxruntime.InferenceSession(onnx_model.SerializeToString())
+        actual, = session.run(None, {'Input_0': x})
+        np.testing.assert_allclose(expected, actual, rtol=1e-4, atol=1e-4)
+        return onnx_model
+
+    def test_convolution_without_bias(self):
+        model = chainer.Sequential(
+            L.Convolution2D(3, 4, ksize=3, nobias=True),
+            L.BatchNormalization(4), F.relu)
+        x = np.random.rand(2, 3, 5, 5).astype(np.float32)
+        onnx_model = self.check(model, x, 1)
+        conv = onnx_model.graph.node[0]
+        self.assertEqual(conv.op_type, 'Conv')
+        self.assertEqual(len(conv.input), 3)
+
+    def test_linear(self):
+        model = chainer.Sequential(
+            L.Linear(6, 4), L.BatchNormalization(4), F.relu)
+        x = np.random.rand(2, 6).astype(np.float32)
+        self.check(model, x, 1)
+
+    def test_deconvolution(self):
+        model = chainer.Sequential(
+            L.Deconvolution2D(4, 6, ksize=3), L.BatchNormalization(6))
+        x = np.random.rand(2, 4, 5, 5).astype(np.float32)
+        self.check(model, x, 1)
+
+    def test_grouped_deconvolution(self):
+        import onnxruntime
+
+        size = 6
+        arrays = [('W', np.random.rand(4, 3, 3, 3).astype(np.float32))] + [
+            (name, np.random.uniform(0.5, 2, size).astype(np.float32))
+            for name in 'sbmv']
+        graph = helper.make_graph(
+            [helper.make_node('ConvTranspose', ['x', 'W'], ['h'], group=2),
+             helper.make_node(
+                 'BatchNormalization', ['h', 's', 'b', 'm', 'v'], ['y'])],
+            'Graph',
+            [helper.make_tensor_value_info(
+                'x', TensorProto.FLOAT, [1, 4, 5, 5])],
+            [helper.make_tensor_value_info(
+                'y', TensorProto.FLOAT, [1, 6, 7, 7])],
+            [numpy_helper.from_array(array, name) for name, array in arrays])
+        onnx_model = helper.make_model(
+            graph, opset_imports=[helper.make_opsetid('', 7)])
+        x = np.random.rand(1, 4, 5, 5).astype(np.float32)
+        session = onnxruntime.InferenceSession(onnx_model.SerializeToString())
+        expected, = session.run(None, {'x': x})
+
+        arrays = {}
+        optimize.PassManager(2).run(onnx_model, arrays)
+        self.assertEqual(
+            [node.op_type for node in onnx_model.graph.node],
+            ['ConvTranspose'])
+        for tensor in onnx_model.graph.initializer:
+            if tensor.name in arrays:
+                tensor.CopyFrom(
+                    numpy_helper.from_array(arrays[tensor.name], tensor.name))
+        session = onnxruntime.InferenceSession(onnx_model.SerializeToString())
+        actual, = session.run(None, {'x': x})
+        np.testing.assert_allclose(expected, actual, rtol=1e-4, atol=1e-4)
+
+    def test_shared_weight(self):
+        model = SharedWeight()
+        x = np.random.rand(2, 3, 4, 4).astype(np.float32)
+        onnx_model = self.check(model, x, 1)
+        weights = [node.input[1] for node in onnx_model.graph.node]
+        self.assertNotEqual(weights[0], weights[1])
+
+    def test_training_mode(self):
+        # The statistics of the batch are used, so nothing is folded
+        graph = helper.make_graph(
+            [helper.make_node('Conv', ['x', 'W'], ['h']),
+             helper.make_node(
+                 'BatchNormalization', ['h', 's', 'b', 'm', 'v'],
+                 ['y', 'mean', 'var', 'saved_mean', 'saved_var'],
+                 is_test=0)],
+            'Graph',
+            [helper.make_tensor_value_info('x', TensorProto.FLOAT, [1, 2, 3])],
+            [helper.make_tensor_value_info('y', TensorProto.FLOAT, [1, 2, 3])],
+            [numpy_helper.from_array(np.ones((2, 2, 1), np.float32), 'W')] +
+            [numpy_helper.from_array(np.ones(2, np.float32), name)
+             for name in 'sbmv'])
+        onnx_model = helper.make_model(
+            graph, opset_imports=[helper.make_opsetid('', 6)])
+        optimize.PassManager(
+            2, passes=[FuseBatchNormalization()]).run(onnx_model)
+        self.assertEqual(len(onnx_model.graph.node), 2)
+
+    def test_default_training_mode(self):
+        # Before the opset version 7, is_test is 0 by default
+        for opset_version, num_nodes in ((6, 2), (7, 1)):
+            graph = helper.make_graph(
+                [helper.make_node('Conv', ['x', 'W'], ['h']),
+                 helper.make_node(
+                     'BatchNormalization', ['h', 's', 'b', 'm', 'v'],
+                     ['y'])],
+                'Graph',
+                [helper.make_tensor_value_info(
+                    'x', TensorProto.FLOAT, [1, 2, 3])],
+                [helper.make_tensor_value_info(
+                    'y', TensorProto.FLOAT, [1, 2, 3])],
+                [numpy_helper.from_array(
+                    np.ones((2, 2, 1), np.float32), 'W')] +
+                [numpy_helper.from_array(np.ones(2, np.float32), name)
+                 for name in 'sbmv'])
+            onnx_model = helper.make_model(
+                graph, opset_imports=[helper.make_opsetid('', opset_version)])
+            optimize.PassManager(
+                2, passes=[FuseBatchNormalization()]).run(onnx_model)
+            self.assertEqual(len(onnx_model.graph.node), num_nodes)
@@ -0,0 +1,148 @@
+import unittest
+
+import chainer
+import chainer.functions as F
+import numpy as np
+from onnx import helper
+from onnx import numpy_helper
+from onnx import TensorProto
+
+import onnx_chainer
+from onnx_chainer import optimize
+from onnx_chainer.optimize.constant_folding import FoldConstants
+
+
+def _run(onnx_model, arrays, x):
+    import onnxruntime
+
+    for tensor in onnx_model.graph.initializer:
+        if tensor.name in arrays:
+            tensor.CopyFrom(
+                numpy_helper.from_array(arrays[tensor.name], tensor.name))
+    session = onnxruntime.InferenceSession(onnx_model.SerializeToString())
+    y, = session.run(None, {'x': x})
+    return y
+
+
+def _make_model(nodes, initializers, inputs=('x',), output_shape=(2, 3)):
+    graph = helper.make_graph(
+        nodes, 'Graph',
+        [helper.make_tensor_value_info(name, TensorProto.FLOAT, [2, 4])
+         for name in inputs],
+        [helper.make_tensor_value_info(
+            'y', TensorProto.FLOAT, list(output_shape))],
+        [numpy_helper.from_array(array, name)
+         for name, array in initializers])
+    return helper.make_model(
+        graph, opset_imports=[helper.make_opsetid('', 9)])
+
+
+class LinearInterpolate(chainer.Chain):
+
+    def __init__(self):
+        super(LinearInterpolate, self).__init__()
+        with self.init_scope():
+            self.p = chainer.Parameter(
+                np.random.rand(2, 4).astype(np.float32))
+
+    def __call__(self, x, y):
+        return F.linear_interpolate(self.p, x, y)
+
+
+class TestFoldConstants(unittest.TestCase):
+
+    def setUp(self):
+        self.x = np.random.rand(2, 4).astype(np.float32)
+        self.w = np.random.rand(3, 4).astype(np.float64)
+
+    def test_weight_chain(self):
+        # y = x (W.astype(float32).reshape(3, 4).T) + c
+        onnx_model = _make_model([
+            helper.make_node('Constant', [], ['shape'], value=(
+                numpy_helper.from_array(np.array([3, 4], dtype=np.int64)))),
+            helper.make_node('Cast', ['W'], ['w1'], to=TensorProto.FLOAT),
+            helper.make_node('Reshape', ['w1', 'shape'], ['w2']),
+            helper.make_node('Transpose', ['w2'], ['w3'], perm=[1, 0]),
+            helper.make_node('MatMul', ['x', 'w3'], ['h']),
+            helper.make_node('Add', ['h', 'c'], ['y']),
+        ], [('W', self.w.reshape(12)), ('c', np.ones(3, np.float32))])
+        expected = _run(onnx_model, {}, self.x)
+
+        arrays = {}
+        stats = optimize.PassManager(2).run(onnx_model, arrays)
+        self.assertEqual(
+            [node.op_type for node in onnx_model.graph.node],
+            ['MatMul', 'Add'])
+        self.assertEqual(
+            sorted(t.name for t in onnx_model.graph.initializer),
+            ['c', 'w3'])
+        stats = {s.name: s for s in stats}
+        self.assertEqual(stats['fold_constants'].nodes_removed, 4)
+        self.assertEqual(stats['fold_constants'].initializers_folded, 1)
+        self.assertEqual(
+            stats['eliminate_unused_initializers'].initializers_folded, 0)
+        np.testing.assert_allclose(
+            _run(onnx_model, arrays, self.x), expected, rtol=1e-6)
+
+    def test_unsqueeze_without_axes_input(self):
+        onnx_model = _make_model([
+            helper.make_node('Unsqueeze', ['c', ''], ['k'], axes=[0]),
+            helper.make_node('Add', ['x', 'k'], ['y']),
+        ], [('c', np.ones(4, np.float32))], output_shape=(2, 4))
+        arrays = {}
+        optimize.PassManager(
+            2, passes=[FoldConstants()]).run(onnx_model, arrays)
+        self.assertEqual(
+            [node.op_type for node in onnx_model.graph.node], ['Add'])
+        self.assertEqual(arrays['k'].shape, (1, 4))
+
+    def test_size_cap(self):
+        nodes = [
+            helper.make_node('Expand', ['one', 'shape'], ['ones']),
+            helper.make_node('Mul', ['x', 'ones'], ['y']),
+        ]
+        initializers = [('one', np.ones(1, np.float32)),
+                        ('shape', np.array([2, 4], dtype=np.int64))]
+        onnx_model = _make_model(nodes, initializers, output_shape=(2, 4))
+        optimize.PassManager(
+            2, passes=[FoldConstants(max_size=16)]).run(onnx_model)
+        self.assertEqual(len(onnx_model.graph.node), 2)
+
+        onnx_model = _make_model(nodes, initializers, output_shape=(2, 4))
+        arrays = {}
+        optimize.PassManager(
+            2, passes=[FoldConstants(max_size=32)]).run(onnx_model, arrays)
+        self.assertEqual(
+            [node.op_type for node in onnx_model.graph.node], ['Mul'])
+        np.testing.assert_array_equal(arrays['ones'], np.ones((2, 4)))
+
+    def test_graph_inputs_and_outputs(self):
+        # An initializer which is also a graph input can be overridden, and
+        # the node producing a graph output is kept
+        onnx_model = _make_model([
+            helper.make_node('Neg', ['W'], ['h']),
+            helper.make_node('Relu', ['c'], ['y']),
+        ], [('W', np.ones((2, 4), np.float32)),
+            ('c', np.ones((2, 3), np.float32))], inputs=('x', 'W'))
+        optimize.PassManager(
+            2, passes=[FoldConstants()]).run(onnx_model)
+        self.assertEqual(
+            [node.op_type for node in onnx_model.graph.node],
+            ['Neg', 'Relu'])
+
+    def test_linear_interpolate(self):
+        import onnxruntime
+
+        model = LinearInterpolate()
+        x = np.random.rand(2, 4).astype(np.float32)
+        y = np.random.rand(2, 4).astype(np.float32)
+        expected = model(x, y).array
+        plain = onnx_chainer.export(model, (x, y))
+        onnx_model = onnx_chainer.export(model, (x, y), optimize=2)
+        self.assertEqual(
+            len(plain.graph.node) - len(onnx_model.graph.node), 1)
+        self.assertNotIn(
+            'Sub', [node.op_type for node in onnx_model.graph.node])
+        session = onnxruntime.InferenceSession(onnx_model.SerializeToString())
+        actual, = session.run(None, {'Input_0': x, 'Input_1': y})
+        np.testing.assert_allclose(expected, actual, rtol=1e-5, atol=1e-5)
@@ -0,0 +1,94 @@
+import unittest
+
+import chainer
+import chainer.functions as F
+import chainer.links as L
+import numpy as np
+from onnx import helper
+from onnx import numpy_helper
+from onnx import TensorProto
+
+import onnx_chainer
+from onnx_chainer import optimize
+from onnx_chainer.optimize.no_ops import EliminateNoOps
+
+
+class NoOps(chainer.Chain):
+
+    def __init__(self):
+        super(NoOps, self).__init__()
+        with self.init_scope():
+            self.l1 = L.Linear(4, 3)
+
+    def __call__(self, x):
+        h = F.copy(F.dropout(x), -1)
+        h = F.pad(h, ((0, 0), (0, 0)), 'constant')
+        h = F.relu(self.l1(h * 1.0 + 0.0))
+        return F.identity(h)
+
+
+class TestEliminateNoOps(unittest.TestCase):
+
+    def test_export(self):
+        import onnxruntime
+
+        model = NoOps()
+        x = np.random.rand(2, 4).astype(np.float32)
+        with chainer.using_config('train', False):
+            expected = model(x).array
+        plain = onnx_chainer.export(
+            model, x, opset_version=onnx_chainer.MINIMUM_OPSET_VERSION)
+        onnx_model = onnx_chainer.export(
+            model, x, opset_version=onnx_chainer.MINIMUM_OPSET_VERSION,
+            optimize=1)
+        self.assertEqual(
+            [node.op_type for node in onnx_model.graph.node],
+            ['Gemm', 'Relu'])
+        self.assertEqual(
+            [v.name for v in onnx_model.graph.output],
+            [v.name for v in plain.graph.output])
+        self.assertEqual(
+            onnx_model.graph.node[-1].output[0],
+            onnx_model.graph.output[0].name)
+        session = onnxruntime.InferenceSession(onnx_model.SerializeToString())
+        actual, = session.run(None, {'Input_0': x})
+        np.testing.assert_allclose(expected, actual, rtol=1e-5, atol=1e-5)
+
+    def test_graph_input_to_output(self):
+        # The name of the graph output cannot be given to the graph input
+        model = chainer.Sequential(F.identity)
+        x = np.random.rand(2, 4).astype(np.float32)
+        onnx_model = onnx_chainer.export(model, x, optimize=1)
+        self.assertEqual(
+            [node.op_type for node in onnx_model.graph.node], ['Identity'])
+
+    def run_pass(self, nodes, initializers, x_shape):
+        graph = helper.make_graph(
+            nodes, 'Graph',
+            [helper.make_tensor_value_info('x', TensorProto.FLOAT, x_shape)],
+            [helper.make_tensor_value_info('y', TensorProto.FLOAT, None)],
+            [numpy_helper.from_array(array, name)
+             for name, array in initializers])
+        onnx_model = helper.make_model(
+            graph, opset_imports=[helper.make_opsetid('', 9)])
+        optimize.PassManager(1, passes=[EliminateNoOps()]).run(onnx_model)
+        return [node.op_type for node in onnx_model.graph.node]
+
+    def test_broadcast(self):
+        nodes = [helper.make_node('Add', ['x', 'zeros'], ['h']),
+                 helper.make_node('Relu', ['h'], ['y'])]
+        self.assertEqual(
+            self.run_pass(nodes, [('zeros', np.zeros((1, 4), np.float32))],
+                          [2, 4]),
+            ['Relu'])
+        # The constant broadcasts the input to a larger shape
+        self.assertEqual(
+            self.run_pass(nodes, [('zeros', np.zeros((3, 4), np.float32))],
+                          [1, 4]),
+            ['Add', 'Relu'])
+
+    def test_training_dropout(self):
+        nodes = [helper.make_node('Dropout', ['x'], ['h', 'mask']),
+                 helper.make_node('Mul', ['h', 'mask'], ['y'])]
+        self.assertEqual(
+            self.run_pass(nodes, [], [2, 4]), ['Dropout', 'Mul'])
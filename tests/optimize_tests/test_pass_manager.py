@@ -0,0 +1,152 @@
+import unittest
+
+import chainer
+import chainer.functions as F
+import chainer.links as L
+import numpy as np
+import onnx
+from onnx import helper
+from onnx import numpy_helper
+from onnx import TensorProto
+
+import onnx_chainer
+from onnx_chainer import optimize
+
+
+def _make_model(nodes, initializers=(), outputs=('y',)):
+    graph = helper.make_graph(
+        nodes, 'Graph',
+        [helper.make_tensor_value_info('x', TensorProto.FLOAT, [2])],
+        [helper.make_tensor_value_info(name, TensorProto.FLOAT, [2])
+         for name in outputs],
+        [numpy_helper.from_array(array, name)
+         for name, array in initializers])
+    return helper.make_model(
+        graph, opset_imports=[helper.make_opsetid('', 9)])
+
+
+class CountNodes(optimize.Pass):
+
+    name = 'count_nodes'
+
+    def __init__(self):
+        self.counts = []
+
+    def run(self, context):
+        self.counts.append(len(context.graph.node))
+
+
+class TestPassManager(unittest.TestCase):
+
+    def setUp(self):
+        self.onnx_model = _make_model([
+            helper.make_node('Relu', ['x'], ['h']),
+            helper.make_node('Add', ['h', 'c'], ['y']),
+            helper.make_node('Mul', ['h', 'unused'], ['dead']),
+        ], [('c', np.ones(2, dtype=np.float32)),
+            ('unused', np.full(2, 2, dtype=np.float32))])
+
+    def test_level_0(self):
+        stats = optimize.PassManager(0).run(self.onnx_model)
+        self.assertEqual(stats, [])
+        self.assertEqual(len(self.onnx_model.graph.node), 3)
+
+    def test_cleanup(self):
+        stats = optimize.PassManager(1).run(self.onnx_model)
+        self.assertEqual(
+            [node.op_type for node in self.onnx_model.graph.node],
+            ['Relu', 'Add'])
+        self.assertEqual(
+            [t.name for t in self.onnx_model.graph.initializer], ['c'])
+        stats = {s.name: s for s in stats}
+        self.assertEqual(stats['eliminate_dead_nodes'].nodes_removed, 1)
+        self.assertEqual(
+            stats['eliminate_unused_initializers'].initializers_folded, 1)
+
+    def test_custom_passes(self):
+        counter = CountNodes()
+        manager = optimize.PassManager(3, passes=[counter])
+        stats = manager.run(self.onnx_model)
+        # Nothing changes, so the passes are not repeated
+        self.assertEqual(counter.counts, [3])
+        self.assertEqual(manager.stats, stats)
+        self.assertEqual(stats[0].name, 'count_nodes')
+
+    def test_header_only_initializers(self):
+        context = optimize.PassContext(self.onnx_model)
+        array = np.arange(3, dtype=np.float32)
+        context.set_initializer('c', array)
+        np.testing.assert_array_equal(context.get_array('c'), array)
+        np.testing.assert_array_equal(
+            context.get_array('unused'), np.full(2, 2, dtype=np.float32))
+        self.assertIsNone(context.get_array('x'))
+        self.assertEqual(context.fresh_name('h'), 'h_0')
+
+    def test_initializers_as_inputs(self):
+        # Before the IR version 4, the folded initializers must be graph
+        # inputs as well
+        onnx_model = _make_model([
+            helper.make_node('Constant', [], ['k'], value=(
+                numpy_helper.from_array(np.ones(2, dtype=np.float32)))),
+            helper.make_node('Neg', ['k'], ['h']),
+            helper.make_node('Add', ['x', 'h'], ['z']),
+            helper.make_node('Add', ['z', 'c'], ['y']),
+        ], [('c', np.ones(2, dtype=np.float32))])
+        onnx_model.ir_version = 3
+        onnx_model.graph.input.extend([
+            helper.make_tensor_value_info('c', TensorProto.FLOAT, [2])])
+        arrays = {}
+        optimize.PassManager(2).run(onnx_model, arrays)
+        for tensor in onnx_model.graph.initializer:
+            if tensor.name in arrays:
+                tensor.CopyFrom(
+                    numpy_helper.from_array(arrays[tensor.name], tensor.name))
+        self.assertEqual(
+            sorted(t.name for t in onnx_model.graph.initializer), ['c', 'h'])
+        self.assertEqual(
+            [v.name for v in onnx_model.graph.input], ['x', 'c', 'h'])
+        onnx.checker.check_model(onnx_model)
+
+    def test_invalid_level(self):
+        with self.assertRaises(ValueError):
+            optimize.PassManager(4)
+
+
+class TestExportOptimize(unittest.TestCase):
+
+    def setUp(self):
+        self.model = chainer.Sequential(
+            L.Convolution2D(3, 4, ksize=3), L.BatchNormalization(4), F.relu,
+            L.Linear(36, 2))
+        self.x = np.random.rand(1, 3, 5, 5).astype(np.float32)
+
+    def check_output(self, onnx_model):
+        import onnxruntime
+
+        with chainer.using_config('train', False):
+            expected = self.model(self.x).array
+        session = onnxruntime.InferenceSession(onnx_model.SerializeToString())
+        actual, = session.run(None, {'Input_0': self.x})
+        np.testing.assert_allclose(expected, actual, rtol=1e-5, atol=1e-5)
+
+    def test_levels(self):
+        for level in range(optimize.MAX_LEVEL + 1):
+            profiler = onnx_chainer.Profiler()
+            onnx_model = onnx_chainer.export(
+                self.model, self.x, optimize=level, profiler=profiler)
+            self.check_output(onnx_model)
+            self.assertEqual(
+                'optimize' in profiler.report.phases, level > 0)
+            self.assertEqual(bool(profiler.report.passes), level > 0)
+
+    def test_cache_hit(self):
+        onnx_chainer.clear_export_cache()
+        for _ in range(2):
+            onnx_model = onnx_chainer.export(
+                self.model, self.x, optimize=2, use_cache=True)
+            self.check_output(onnx_model)
+        onnx_chainer.clear_export_cache()
+
+    def test_invalid_level(self):
+        with self.assertRaises(ValueError):
+            onnx_chainer.export(self.model, self.x, optimize=4)
@@ -0,0 +1,1044 @@
+import collections
+from concurrent import futures
+import hashlib
+import os
+import tempfile
+import tracemalloc
+import unittest
+from unittest import mock
+
+import chainer
+import chainer.functions as F
+import chainer.links as L
+import numpy as np
+import onnx
+from onnx import numpy_helper
+
+import onnx_chainer
+from onnx_chainer import serialization
+import onnx_chainer.testing
+
+
+class TestForwardTrace(unittest.TestCase):
+
+    def setUp(self):
+
+        class Model(chainer.Chain):
+
+            def __init__(self):
+                super(Model, self).__init__()
+                with self.init_scope():
+                    self.conv = L.Convolution2D(None, 4, ksize=3)
+                    self.bn = L.BatchNormalization(4)
+                    self.l1 = L.Linear(None, 3)
+
+            def __call__(self, x):
+                h = F.relu(self.bn(self.conv(x)))
+                return self.l1(h)
+
+        self.model = Model()
+        self.x = np.zeros((1, 3, 8, 8), dtype=np.float32)
+
+    def test_no_backward(self):
+
+        class BackwardCounter(chainer.FunctionHook):
+
+            def __init__(self):
+                self.count = 0
+
+            def backward_preprocess(self, function, in_data, out_grad):
+                self.count += 1
+
+        with BackwardCounter() as hook:
+            onnx_chainer.export(self.model, self.x)
+        self.assertEqual(hook.count, 0)
+
+    def test_graph(self):
+        onnx_model = onnx_chainer.export(self.model, self.x)
+        op_types = [node.op_type for node in onnx_model.graph.node]
+        self.assertEqual(
+            op_types,
+            ['Conv', 'BatchNormalization', 'Relu', 'Reshape', 'Gemm'])
+
+
+class TestAbstractExport(unittest.TestCase):
+
+    def setUp(self):
+
+        class Model(chainer.Chain):
+
+            def __init__(self):
+                super(Model, self).__init__()
+                with self.init_scope():
+                    self.conv = L.Convolution2D(None, 4, ksize=3, pad=1)
+                    self.bn = L.BatchNormalization(4)
+                    self.l1 = L.Linear(None, 3)
+
+            def __call__(self, x):
+                h = F.relu(self.bn(self.conv(x)))
+                h = F.max_pooling_2d(h, 2)
+                h1, h2 = F.split_axis(h, 2, axis=1)
+                h = h1 * h2 + 1
+                h = F.reshape(h[:, :, 1:], (h.shape[0], -1))
+                self.y = self.l1(h)
+                return self.y
+
+        self.model = Model()
+        self.x = np.ones((2, 3, 16, 16), dtype=np.float32)
+        self.opset_version = onnx_chainer.MINIMUM_OPSET_VERSION
+
+    def test_same_graph(self):
+        expected = onnx_chainer.export(
+            self.model, self.x, opset_version=self.opset_version)
+        actual = onnx_chainer.export(
+            self.model, self.x, opset_version=self.opset_version,
+            abstract=True)
+        self.assertEqual(
+            [(n.op_type, n.attribute) for n in expected.graph.node],
+            [(n.op_type, n.attribute) for n in actual.graph.node])
+        self.assertEqual(
+            [numpy_helper.to_array(t).tolist()
+             for t in expected.graph.initializer],
+            [numpy_helper.to_array(t).tolist()
+             for t in actual.graph.initializer])
+        self.assertEqual(
+            expected.graph.output[0].type, actual.graph.output[0].type)
+
+    def test_kernels_skipped(self):
+        onnx_chainer.export(
+            self.model, self.x, opset_version=self.opset_version,
+            abstract=True)
+        self.assertEqual(self.model.y.shape, (2, 3))
+        self.assertEqual(self.model.y.array.strides, (0, 0))
+
+
+class TestAbstractExportLargeFunctions(unittest.TestCase):
+
+    def setUp(self):
+
+        class Model(chainer.Chain):
+
+            def __init__(self):
+                super(Model, self).__init__()
+                with self.init_scope():
+                    self.conv = L.Convolution2D(3, 4, ksize=3, pad=1)
+                    self.deconv = L.Deconvolution2D(4, 4, ksize=2, stride=2)
+                    self.conv_nd = L.ConvolutionND(2, 12, 4, ksize=3, pad=1)
+                    self.deconv_nd = L.DeconvolutionND(
+                        2, 4, 2, ksize=2, stride=2)
+
+            def __call__(self, x):
+                h = F.average_pooling_nd(self.conv(x), 2)
+                h = F.unpooling_2d(h, 2, cover_all=False)
+                h = F.local_response_normalization(h)
+                h = F.concat((F.max_pooling_nd(h, 2),
+                              F.relu(F.average_pooling_2d(h, 2))))
+                h2 = self.deconv(F.max_pooling_2d(h[:, :4], 2))
+                self.h = F.concat((h2, h))
+                return self.deconv_nd(self.conv_nd(self.h))
+
+        self.model = Model()
+        self.opset_version = onnx_chainer.MINIMUM_OPSET_VERSION
+
+    def test_same_graph(self):
+        x = np.random.rand(1, 3, 16, 32).astype(np.float32)
+        expected = onnx_chainer.export(
+            self.model, x, opset_version=self.opset_version)
+        actual = onnx_chainer.export(
+            self.model, x, opset_version=self.opset_version, abstract=True)
+        self.assertEqual(
+            [(n.op_type, n.attribute) for n in expected.graph.node],
+            [(n.op_type, n.attribute) for n in actual.graph.node])
+        self.assertEqual(
+            expected.graph.output[0].type, actual.graph.output[0].type)
+        self.assertEqual(self.model.h.shape, (1, 12, 8, 16))
+        self.assertEqual(self.model.h.array.strides, (0, 0, 0, 0))
+
+    def test_memory_independent_of_resolution(self):
+        # The intermediate arrays are placeholders, so the export of a large
+        # image does not allocate buffers of its size
+        peaks = []
+        for size in (32, 1024):
+            x = np.zeros((1, 3, size, size), dtype=np.float32)
+            tracemalloc.start()
+            try:
+                onnx_chainer.export(
+                    self.model, x, opset_version=self.opset_version,
+                    abstract=True)
+                peaks.append(tracemalloc.get_traced_memory()[1])
+            finally:
+                tracemalloc.stop()
+        self.assertLess(peaks[1], peaks[0] + x.nbytes)
+
+
+class TestExportCache(unittest.TestCase):
+
+    def setUp(self):
+        # The calls are not kept in the models, since the lists in the
+        # attributes of the links make them uncachable
+        calls = self.calls = collections.defaultdict(list)
+
+        class Model(chainer.Chain):
+
+            def __init__(self):
+                super(Model, self).__init__()
+                with self.init_scope():
+                    self.conv = L.Convolution2D(3, 4, ksize=3)
+                    self.bn = L.BatchNormalization(4)
+                    self.l1 = L.Linear(144, 3)
+
+            def __call__(self, x):
+                calls[id(self)].append(x.shape)
+                h = F.relu(self.bn(self.conv(x)))
+                return self.l1(h)
+
+        self.Model = Model
+        self.x = np.zeros((1, 3, 8, 8), dtype=np.float32)
+        self.opset_version = onnx_chainer.MINIMUM_OPSET_VERSION
+        onnx_chainer.clear_export_cache()
+
+    def tearDown(self):
+        onnx_chainer.clear_export_cache()
+
+    def export(self, model, x, use_cache=True):
+        return onnx_chainer.export(
+            model, x, opset_version=self.opset_version, use_cache=use_cache)
+
+    def test_hit(self):
+        model1 = self.Model()
+        self.export(model1, self.x)
+
+        model2 = self.Model()
+        model2.bn.avg_mean[:] = 3
+        actual = self.export(model2, self.x)
+        self.assertEqual(len(self.calls[id(model2)]), 0)
+
+        expected = self.export(model2, self.x, use_cache=False)
+        self.assertEqual(
+            expected.SerializeToString(), actual.SerializeToString())
+
+    def test_miss(self):
+        model = self.Model()
+        self.export(model, self.x)
+        self.assertEqual(len(self.calls[id(model)]), 1)
+        self.export(model, self.x)
+        self.assertEqual(len(self.calls[id(model)]), 1)
+
+        x = np.zeros((2, 3, 8, 8), dtype=np.float32)
+        self.export(model, x)
+        self.assertEqual(len(self.calls[id(model)]), 2)
+        self.export(model, self.x, use_cache=False)
+        self.assertEqual(len(self.calls[id(model)]), 3)
+
+    def test_functions_of_sequential(self):
+        x = np.zeros((1, 3), dtype=np.float32)
+        for f, op_type in ((F.relu, 'Relu'), (F.sigmoid, 'Sigmoid')):
+            model = chainer.Sequential(L.Linear(3, 4), f)
+            onnx_model = self.export(model, x)
+            self.assertEqual(
+                [node.op_type for node in onnx_model.graph.node],
+                ['Gemm', op_type])
+
+    def test_function_attribute(self):
+
+        class Model(chainer.Chain):
+
+            def __init__(self, activation):
+                super(Model, self).__init__()
+                with self.init_scope():
+                    self.l1 = L.Linear(3, 4)
+                self.activation = activation
+
+            def __call__(self, x):
+                return self.activation(self.l1(x))
+
+        x = np.zeros((1, 3), dtype=np.float32)
+        for f, op_type in ((F.relu, 'Relu'), (F.tanh, 'Tanh')):
+            onnx_model = self.export(Model(f), x)
+            self.assertEqual(
+                [node.op_type for node in onnx_model.graph.node],
+                ['Gemm', op_type])
+
+    def test_uncachable_attribute(self):
+        model = self.Model()
+        model.mask = np.ones(3, dtype=np.float32)
+        self.export(model, self.x)
+        self.export(model, self.x)
+        self.assertEqual(len(self.calls[id(model)]), 2)
+
+
+class TestRefreshParams(unittest.TestCase):
+
+    def setUp(self):
+
+        class Model(chainer.Chain):
+
+            def __init__(self, n_out=3):
+                super(Model, self).__init__()
+                with self.init_scope():
+                    self.conv = L.Convolution2D(3, 4, ksize=3)
+                    self.bn = L.BatchNormalization(4)
+                    self.l1 = L.Linear(144, n_out)
+
+            def __call__(self, x):
+                h = F.relu(self.bn(self.conv(x)))
+                return self.l1(h)
+
+        self.Model = Model
+        self.x = np.zeros((1, 3, 8, 8), dtype=np.float32)
+        self.opset_version = onnx_chainer.MINIMUM_OPSET_VERSION
+
+    def export(self, model, filename=None):
+        return onnx_chainer.export(
+            model, self.x, filename, opset_version=self.opset_version)
+
+    def test_file(self):
+        model = self.Model()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, 'model.onnx')
+            self.export(self.Model(), filename)
+            model.bn.avg_var[:] = 2
+            onnx_chainer.refresh_params(model, filename)
+            actual = onnx.load(filename)
+        expected = self.export(model)
+        self.assertEqual(
+            expected.SerializeToString(), actual.SerializeToString())
+
+    def test_model_proto(self):
+        model = self.Model()
+        onnx_model = self.export(self.Model())
+        ret = onnx_chainer.refresh_params(model, onnx_model)
+        self.assertIs(ret, onnx_model)
+        expected = self.export(model)
+        self.assertEqual(
+            expected.SerializeToString(), onnx_model.SerializeToString())
+
+    def test_mismatch(self):
+        onnx_model = self.export(self.Model())
+        with self.assertRaises(ValueError):
+            onnx_chainer.refresh_params(self.Model(n_out=5), onnx_model)
+
+    def check_external_data(self, model, filename, new_filename=None):
+        expected = self.export(model)
+        onnx_model, arrays = \
+            onnx_chainer.testing.external_data.load_model(
+                new_filename or filename)
+        external = [t.name for t in onnx_model.graph.initializer
+                    if serialization.is_external(t)]
+        self.assertEqual(external, ['param_conv_W', 'param_l1_W'])
+        for tensor in expected.graph.initializer:
+            np.testing.assert_array_equal(
+                numpy_helper.to_array(tensor), arrays[tensor.name])
+        del arrays
+
+    @unittest.skipUnless(
+        serialization.EXTERNAL_DATA_SUPPORTED, 'onnx>=1.4.0 is required')
+    def test_external_data(self):
+        model = self.Model()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, 'model.onnx')
+            onnx_chainer.export(
+                self.Model(), self.x, filename,
+                opset_version=self.opset_version, external_data=True,
+                external_data_threshold=64)
+            data_size = os.path.getsize(filename + '.data')
+            model_size = os.path.getsize(filename)
+            model.l1.W.array[:] = 2
+            onnx_chainer.refresh_params(model, filename)
+            self.assertEqual(sorted(os.listdir(tmpdir)),
+                             ['model.onnx', 'model.onnx.data'])
+            self.assertEqual(os.path.getsize(filename + '.data'), data_size)
+            self.assertEqual(os.path.getsize(filename), model_size)
+            self.check_external_data(model, filename)
+
+    @unittest.skipUnless(
+        serialization.EXTERNAL_DATA_SUPPORTED, 'onnx>=1.4.0 is required')
+    def test_external_data_to_another_file(self):
+        model = self.Model()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, 'model.onnx')
+            onnx_chainer.export(
+                self.Model(), self.x, filename,
+                opset_version=self.opset_version, external_data=True,
+                external_data_threshold=64, external_data_shard_size=1024)
+            with open(filename + '.1.data', 'rb') as f:
+                original = f.read()
+            new_filename = os.path.join(tmpdir, 'new.onnx')
+            model.l1.W.array[:] = 2
+            onnx_chainer.refresh_params(model, filename, new_filename)
+            self.assertEqual(sorted(os.listdir(tmpdir)), [
+                'model.onnx', 'model.onnx.0.data', 'model.onnx.1.data',
+                'new.onnx', 'new.onnx.0.data', 'new.onnx.1.data'])
+            with open(filename + '.1.data', 'rb') as f:
+                self.assertEqual(f.read(), original)
+            self.check_external_data(model, filename, new_filename)
+
+
+class TestStreamExport(unittest.TestCase):
+
+    def setUp(self):
+
+        class Model(chainer.Chain):
+
+            def __init__(self):
+                super(Model, self).__init__()
+                with self.init_scope():
+                    self.conv = L.Convolution2D(3, 4, ksize=3)
+                    self.bn = L.BatchNormalization(4)
+                    self.l1 = L.Linear(144, 3)
+
+            def __call__(self, x):
+                h = F.relu(self.bn(self.conv(x)))
+                return self.l1(h) * 2
+
+        self.model = Model()
+        self.x = np.zeros((1, 3, 8, 8), dtype=np.float32)
+        self.opset_version = onnx_chainer.MINIMUM_OPSET_VERSION
+
+    def test_same_bytes(self):
+        expected = onnx_chainer.export(
+            self.model, self.x, opset_version=self.opset_version)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, 'model.onnx')
+            onnx_chainer.export(
+                self.model, self.x, filename,
+                opset_version=self.opset_version, stream=True)
+            with open(filename, 'rb') as f:
+                actual = f.read()
+        self.assertEqual(expected.SerializeToString(), actual)
+
+    def test_no_filename(self):
+        with self.assertRaises(ValueError):
+            onnx_chainer.export(self.model, self.x, stream=True)
+
+
+class TestExternalDataExport(unittest.TestCase):
+
+    def setUp(self):
+
+        class Model(chainer.Chain):
+
+            def __init__(self):
+                super(Model, self).__init__()
+                with self.init_scope():
+                    self.conv = L.Convolution2D(3, 4, ksize=3)
+                    self.bn = L.BatchNormalization(4)
+                    self.l1 = L.Linear(144, 3)
+
+            def __call__(self, x):
+                h = F.relu(self.bn(self.conv(x)))
+                return self.l1(h)
+
+        self.model = Model()
+        self.x = np.zeros((1, 3, 8, 8), dtype=np.float32)
+        self.opset_version = onnx_chainer.MINIMUM_OPSET_VERSION
+
+    def check_external_data(self, shard_size, n_files):
+        expected = onnx_chainer.export(
+            self.model, self.x, opset_version=self.opset_version)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, 'model.onnx')
+            onnx_chainer.export(
+                self.model, self.x, filename,
+                opset_version=self.opset_version, external_data=True,
+                external_data_threshold=64,
+                external_data_shard_size=shard_size)
+            self.assertEqual(len(os.listdir(tmpdir)), n_files + 1)
+
+            onnx_model, arrays = \
+                onnx_chainer.testing.external_data.load_model(filename)
+            external = [t.name for t in onnx_model.graph.initializer
+                        if t.data_location == onnx.TensorProto.EXTERNAL]
+            self.assertEqual(external, ['param_conv_W', 'param_l1_W'])
+            self.assertIsInstance(arrays['param_l1_W'].base, np.memmap)
+            for tensor in expected.graph.initializer:
+                np.testing.assert_array_equal(
+                    numpy_helper.to_array(tensor), arrays[tensor.name])
+            del arrays
+
+    @unittest.skipUnless(
+        serialization.EXTERNAL_DATA_SUPPORTED, 'onnx>=1.4.0 is required')
+    def test_single_file(self):
+        self.check_external_data(None, 1)
+
+    @unittest.skipUnless(
+        serialization.EXTERNAL_DATA_SUPPORTED, 'onnx>=1.4.0 is required')
+    def test_shards(self):
+        self.check_external_data(1024, 2)
+
+    def test_no_filename(self):
+        with self.assertRaises(ValueError):
+            onnx_chainer.export(self.model, self.x, external_data=True)
+
+    def test_unsupported(self):
+        with mock.patch.object(
+                serialization, 'EXTERNAL_DATA_SUPPORTED', False):
+            with tempfile.TemporaryDirectory() as tmpdir:
+                filename = os.path.join(tmpdir, 'model.onnx')
+                with self.assertRaises(RuntimeError):
+                    onnx_chainer.export(
+                        self.model, self.x, filename, external_data=True)
+                self.assertEqual(os.listdir(tmpdir), [])
+                onnx_model = onnx_chainer.export(
+                    self.model, self.x,
+                    opset_version=self.opset_version)
+        self.assertTrue(all(
+            t.HasField('raw_data') for t in onnx_model.graph.initializer))
+
+
+class TestConvertParameter(unittest.TestCase):
+
+    def test_same_as_from_array(self):
+        for array in (np.random.rand(3, 4).astype(np.float32),
+                      np.arange(6, dtype=np.int64).reshape(2, 3).T,
+                      np.array(True)):
+            expected = numpy_helper.from_array(array, 'x')
+            actual = onnx_chainer.convert_parameter(array, 'x')
+            self.assertEqual(
+                expected.SerializeToString(), actual.SerializeToString())
+
+    def test_no_model_copy(self):
+        model = L.Linear(100, 1000)
+        x = np.zeros((1, 100), dtype=np.float32)
+        nbytes = model.W.array.nbytes
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, 'model.onnx')
+            tracemalloc.start()
+            try:
+                onnx_chainer.export(
+                    model, x, filename,
+                    opset_version=onnx_chainer.MINIMUM_OPSET_VERSION)
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+        self.assertLess(peak, nbytes * 1.5)
+
+
+class TestParallelConversion(unittest.TestCase):
+
+    def test_same_as_sequential(self):
+
+        class Model(chainer.ChainList):
+
+            def __init__(self):
+                super(Model, self).__init__(
+                    *[L.Linear(8, 8) for _ in range(10)])
+
+            def __call__(self, x):
+                for link in self:
+                    x = link(x)
+                return x
+
+        model = Model()
+        x = np.zeros((1, 8), dtype=np.float32)
+        opset_version = onnx_chainer.MINIMUM_OPSET_VERSION
+        expected = onnx_chainer.export(
+            model, x, opset_version=opset_version)
+        actual = onnx_chainer.export(
+            model, x, opset_version=opset_version, workers=4)
+        self.assertEqual(
+            expected.SerializeToString(), actual.SerializeToString())
+
+
+class TestDeduplication(unittest.TestCase):
+
+    def setUp(self):
+
+        class Model(chainer.Chain):
+
+            def __init__(self):
+                super(Model, self).__init__()
+                with self.init_scope():
+                    self.l1 = L.Linear(6, 6)
+                    self.bn = L.BatchNormalization(6)
+
+            def __call__(self, x):
+                h = self.bn(self.l1(x)) * 2
+                h = F.reshape(h, (2, 3, 2))
+                h = F.reshape(h, (2, 6)) * 2
+                h = self.bn(self.l1(h))
+                return F.reshape(h, (2, 3, 2)) + 1
+
+        self.model = Model()
+        self.x = np.ones((2, 6), dtype=np.float32)
+        self.opset_version = onnx_chainer.MINIMUM_OPSET_VERSION
+
+    def test_initializers(self):
+        onnx_model = onnx_chainer.export(
+            self.model, self.x, opset_version=self.opset_version)
+        graph = onnx_model.graph
+        names = [t.name for t in graph.initializer]
+        self.assertEqual(len(names), len(set(names)))
+        # The parameters, then the shapes (2, 3, 2) and (2, 6) and the
+        # constants 2 and 1 made by the converters
+        self.assertEqual(
+            sorted(names),
+            ['param_0', 'param_1', 'param_2', 'param_3',
+             'param_bn_avg_mean', 'param_bn_avg_var', 'param_bn_beta',
+             'param_bn_gamma', 'param_l1_W', 'param_l1_b'])
+
+        used = {name for node in graph.node for name in node.input}
+        self.assertEqual(set(names), used & set(names))
+
+
+class TestInitializersAsInputs(unittest.TestCase):
+
+    def setUp(self):
+        self.model = L.Linear(4, 3)
+        self.x = np.zeros((1, 4), dtype=np.float32)
+        self.opset_version = onnx_chainer.MINIMUM_OPSET_VERSION
+
+    def input_names(self, **kwargs):
+        onnx_model = onnx_chainer.export(
+            self.model, self.x, opset_version=self.opset_version, **kwargs)
+        return [i.name for i in onnx_model.graph.input]
+
+    def test_default(self):
+        if onnx.IR_VERSION < 4:
+            expected = ['param_W', 'param_b', 'Input_0']
+        else:
+            expected = ['Input_0']
+        self.assertEqual(self.input_names(), expected)
+
+    def test_keep(self):
+        self.assertEqual(
+            self.input_names(keep_initializers_as_inputs=True),
+            ['param_W', 'param_b', 'Input_0'])
+
+    def test_no_params(self):
+        self.assertEqual(
+            self.input_names(export_params=False,
+                             keep_initializers_as_inputs=False),
+            ['param_W', 'param_b', 'Input_0'])
+
+    def test_stream(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, 'model.onnx')
+            self.assertEqual(
+                self.input_names(filename=filename, stream=True,
+                                 keep_initializers_as_inputs=False),
+                ['Input_0'])
+
+
+class TestConcurrentExport(unittest.TestCase):
+
+    def setUp(self):
+
+        class Model(chainer.Chain):
+
+            def __init__(self):
+                super(Model, self).__init__()
+                with self.init_scope():
+                    self.l1 = L.Linear(8, 8)
+                    self.l2 = L.Linear(8, 8)
+
+            def __call__(self, x):
+                h = F.dropout(F.relu(self.l1(x)))
+                h1, h2 = F.split_axis(h, 2, axis=1)
+                return self.l2(F.reshape(F.concat((h2, h1)), (1, 8)) * 2)
+
+        self.models = [Model() for _ in range(8)]
+        self.x = np.ones((1, 8), dtype=np.float32)
+        self.opset_version = onnx_chainer.MINIMUM_OPSET_VERSION
+
+    def export(self, model):
+        return onnx_chainer.export(
+            model, self.x, opset_version=self.opset_version
+        ).SerializeToString()
+
+    def test_same_as_sequential(self):
+        expected = [self.export(model) for model in self.models]
+        with futures.ThreadPoolExecutor(max_workers=4) as executor:
+            actual = list(executor.map(self.export, self.models * 4))
+        self.assertEqual(expected * 4, actual)
+
+    def test_config_not_changed(self):
+        with chainer.using_config('train', True):
+            self.export(self.models[0])
+            self.assertTrue(chainer.config.train)
+
+    def test_converters_in_inference_mode(self):
+        # The converters at the opset version 6 read the mode from the
+        # configuration, which is True by default in the caller
+        model = chainer.Sequential(L.BatchNormalization(3), F.dropout)
+        x = np.ones((2, 3), dtype=np.float32)
+        with chainer.using_config('train', True):
+            onnx_model = onnx_chainer.export(model, x, opset_version=6)
+        for node in onnx_model.graph.node:
+            is_test, = [a.i for a in node.attribute if a.name == 'is_test']
+            self.assertEqual(is_test, 1)
+
+
+class TestDynamicAxes(unittest.TestCase):
+
+    def setUp(self):
+
+        class Model(chainer.Chain):
+
+            def __init__(self):
+                super(Model, self).__init__()
+                with self.init_scope():
+                    self.conv = L.Convolution2D(3, 4, ksize=3, pad=1)
+                    self.bn = L.BatchNormalization(4)
+                    self.l1 = L.Linear(64, 6)
+
+            def __call__(self, x):
+                h = F.relu(self.bn(self.conv(x)))
+                h = F.max_pooling_2d(h, 2)
+                h = self.l1(F.reshape(h, (h.shape[0], -1)))
+                h1, h2 = F.split_axis(h, 2, axis=1)
+                h = (h1 * h2 + 1) ** 2
+                h = F.matmul(h, h, transb=True)
+                return F.reshape(h[:, 1:], (-1,))
+
+        self.model = Model()
+        self.x = np.random.rand(2, 3, 8, 8).astype(np.float32)
+        self.opset_version = onnx_chainer.MINIMUM_OPSET_VERSION
+
+    def test_batch_sizes(self):
+        import onnxruntime
+
+        onnx_model = onnx_chainer.export(
+            self.model, self.x, opset_version=self.opset_version,
+            dynamic_axes={0: {0: 'batch'}})
+        input_dims = onnx_model.graph.input[0].type.tensor_type.shape.dim
+        self.assertEqual(input_dims[0].dim_param, 'batch')
+        self.assertEqual([d.dim_value for d in input_dims[1:]], [3, 8, 8])
+        output_dims = onnx_model.graph.output[0].type.tensor_type.shape.dim
+        self.assertEqual(output_dims[0].dim_param, 'output0_dim0')
+
+        session = onnxruntime.InferenceSession(
+            onnx_model.SerializeToString())
+        for batch_size in (2, 3, 5):
+            x = np.random.rand(batch_size, 3, 8, 8).astype(np.float32)
+            with chainer.using_config('train', False):
+                expected = self.model(x).array
+            actual, = session.run(None, {'Input_0': x})
+            np.testing.assert_allclose(expected, actual, rtol=1e-5, atol=1e-5)
+
+    def test_same_as_static(self):
+        model = L.Linear(3, 2)
+        x = np.zeros((1, 3), dtype=np.float32)
+        expected = onnx_chainer.export(
+            model, x, opset_version=self.opset_version)
+        actual = onnx_chainer.export(
+            model, x, opset_version=self.opset_version, dynamic_axes={0: [0]})
+        self.assertEqual(expected.graph.node, actual.graph.node)
+        self.assertEqual(
+            actual.graph.input[0].type.tensor_type.shape.dim[0].dim_param,
+            '0_dim0')
+
+    def test_graph_changes(self):
+
+        def model(x):
+            if x.shape[0] > 2:
+                return F.relu(x)
+            return F.sigmoid(x)
+
+        with self.assertRaises(ValueError):
+            onnx_chainer.export(
+                model, self.x, opset_version=self.opset_version,
+                dynamic_axes={0: [0]})
+
+    def test_unknown_key(self):
+        with self.assertRaises(ValueError):
+            onnx_chainer.export(
+                self.model, self.x, opset_version=self.opset_version,
+                dynamic_axes={1: [0]})
+
+    def test_probe_failure(self):
+        # The batch size of the probe is 3, which cannot be split in two
+        model = chainer.Sequential(lambda x: F.split_axis(x, 2, axis=0)[0])
+        x = np.zeros((2, 4), dtype=np.float32)
+        with self.assertRaisesRegex(ValueError, "'batch' .*increased by one"):
+            onnx_chainer.export(
+                model, x, opset_version=self.opset_version,
+                dynamic_axes={0: {0: 'batch'}})
+
+
+@unittest.skipUnless(
+    serialization.EXTERNAL_DATA_SUPPORTED, 'onnx>=1.4.0 is required')
+class TestSignatures(unittest.TestCase):
+
+    def setUp(self):
+        self.model = chainer.Sequential(
+            L.Linear(16, 64), F.relu, L.Linear(64, 5))
+        self.x = np.random.rand(2, 16).astype(np.float32)
+        self.opset_version = onnx_chainer.MINIMUM_OPSET_VERSION
+
+    def test_batch_buckets(self):
+        import onnxruntime
+
+        with tempfile.TemporaryDirectory() as d:
+            filename = os.path.join(d, 'model.onnx')
+            variants = onnx_chainer.export(
+                self.model, self.x, filename,
+                opset_version=self.opset_version,
+                signatures=[(1, 16), (2, 16), (4, 16)])
+            self.assertEqual(sorted(os.listdir(d)), [
+                'model.onnx', 'model.onnx.data', 'model_1.onnx',
+                'model_2.onnx', 'model_4.onnx'])
+            generic = onnx.load(filename, load_external_data=False)
+            self.assertEqual(
+                generic.graph.input[0].type.tensor_type.shape.dim[0]
+                .dim_param, '0_dim0')
+
+            for batch_size, variant in zip((1, 2, 4), variants):
+                for value_info, shape in ((variant.graph.input[0],
+                                           [batch_size, 16]),
+                                          (variant.graph.output[0],
+                                           [batch_size, 5])):
+                    dims = value_info.type.tensor_type.shape.dim
+                    self.assertEqual([d.dim_value for d in dims], shape)
+
+                x = np.random.rand(batch_size, 16).astype(np.float32)
+                with chainer.using_config('train', False):
+                    expected = self.model(x).array
+                session = onnxruntime.InferenceSession(os.path.join(
+                    d, 'model_{}.onnx'.format(batch_size)))
+                actual, = session.run(None, {'Input_0': x})
+                np.testing.assert_allclose(
+                    expected, actual, rtol=1e-5, atol=1e-5)
+
+    def test_refresh_params(self):
+        import onnxruntime
+
+        with tempfile.TemporaryDirectory() as d:
+            filename = os.path.join(d, 'model.onnx')
+            onnx_chainer.export(
+                self.model, self.x, filename,
+                opset_version=self.opset_version,
+                signatures=[(1, 16), (4, 16)])
+            # The bias of the last layer is smaller than the default
+            # threshold of the external data
+            self.model[2].b.array[:] = 3
+            self.model[0].W.array *= 2
+            onnx_chainer.refresh_params(self.model, filename)
+
+            x = np.random.rand(4, 16).astype(np.float32)
+            with chainer.using_config('train', False):
+                expected = self.model(x).array
+            session = onnxruntime.InferenceSession(
+                os.path.join(d, 'model_4.onnx'))
+            actual, = session.run(None, {'Input_0': x})
+            np.testing.assert_allclose(expected, actual, rtol=1e-5, atol=1e-5)
+
+    def test_filename_required(self):
+        with self.assertRaises(ValueError):
+            onnx_chainer.export(
+                self.model, self.x, opset_version=self.opset_version,
+                signatures=[(1, 16)])
+
+    def test_different_ndim(self):
+        with tempfile.TemporaryDirectory() as d:
+            with self.assertRaises(ValueError):
+                onnx_chainer.export(
+                    self.model, self.x, os.path.join(d, 'model.onnx'),
+                    opset_version=self.opset_version,
+                    signatures=[(1, 1, 16)])
+
+
+class TestProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.model = chainer.Sequential(
+            L.Convolution2D(3, 4, ksize=3), L.BatchNormalization(4), F.relu,
+            L.Linear(36, 2))
+        self.x = np.zeros((1, 3, 5, 5), dtype=np.float32)
+
+    def test_report(self):
+        reports = []
+        profiler = onnx_chainer.Profiler(
+            trace_memory=True, callback=reports.append)
+        with tempfile.TemporaryDirectory() as d:
+            filename = os.path.join(d, 'model.onnx')
+            onnx_model = onnx_chainer.export(
+                self.model, self.x, filename, profiler=profiler)
+            file_size = os.path.getsize(filename)
+
+        report = profiler.report
+        self.assertEqual(reports, [report])
+        self.assertEqual(
+            list(report.phases),
+            ['forward', 'build', 'convert', 'rename', 'initializers', 'check',
+             'save'])
+        for stats in report.phases.values():
+            self.assertGreaterEqual(stats.wall_time, 0)
+            if hasattr(tracemalloc, 'reset_peak'):
+                self.assertGreaterEqual(stats.peak_memory, 0)
+            else:
+                self.assertIsNone(stats.peak_memory)
+        self.assertEqual(
+            {name: stats.calls for name, stats in report.converters.items()},
+            {'Convolution2DFunction': 1, 'FixedBatchNormalization': 1,
+             'ReLU': 1, 'Reshape': 1, 'LinearFunction': 1})
+        self.assertEqual(report.num_nodes, len(onnx_model.graph.node))
+        self.assertEqual(
+            report.num_initializers, len(onnx_model.graph.initializer))
+        self.assertEqual(report.bytes_written, file_size)
+        self.assertFalse(report.cache_hit)
+        self.assertIn('convert_ReLU', report.summary())
+
+    def test_memory_not_traced_by_default(self):
+        profiler = onnx_chainer.Profiler()
+        with mock.patch.object(tracemalloc, 'start') as start:
+            onnx_chainer.export(self.model, self.x, profiler=profiler)
+        start.assert_not_called()
+        for stats in profiler.report.phases.values():
+            self.assertIsNone(stats.peak_memory)
+
+    def test_no_reset_peak(self):
+        profiler = onnx_chainer.Profiler(trace_memory=True)
+        with mock.patch.object(tracemalloc, 'reset_peak', create=True), \
+                mock.patch.object(tracemalloc, 'start') as start:
+            del tracemalloc.reset_peak
+            onnx_chainer.export(self.model, self.x, profiler=profiler)
+        start.assert_not_called()
+        for stats in profiler.report.phases.values():
+            self.assertIsNone(stats.peak_memory)
+
+    def test_cache_hit(self):
+        onnx_chainer.clear_export_cache()
+        profiler = onnx_chainer.Profiler()
+        for _ in range(2):
+            onnx_chainer.export(
+                self.model, self.x, use_cache=True, profiler=profiler,
+                optimize=1)
+        report = profiler.report
+        self.assertTrue(report.cache_hit)
+        self.assertEqual(report.converters, {})
+        self.assertEqual(
+            list(report.phases), ['cache', 'optimize', 'initializers', 'save'])
+        self.assertIsNone(report.phases['save'].peak_memory)
+        onnx_chainer.clear_export_cache()
+
+
+class TestExportGraph(unittest.TestCase):
+
+    def setUp(self):
+        self.model = chainer.Sequential(
+            L.Convolution2D(3, 4, ksize=3), L.BatchNormalization(4), F.relu,
+            L.Linear(36, 2))
+        self.x = np.random.rand(2, 3, 5, 5).astype(np.float32)
+        self.opset_version = onnx_chainer.MINIMUM_OPSET_VERSION
+
+    def test_same_as_export(self):
+        import onnxruntime
+
+        expected = onnx_chainer.export(
+            self.model, self.x, opset_version=self.opset_version)
+        with chainer.using_config('train', False):
+            y = self.model(self.x)
+        actual = onnx_chainer.export_graph(
+            y, opset_version=self.opset_version)
+
+        self.assertEqual(
+            [node.op_type for node in expected.graph.node],
+            [node.op_type for node in actual.graph.node])
+        self.assertEqual(
+            len(expected.graph.initializer), len(actual.graph.initializer))
+        self.assertEqual([i.name for i in actual.graph.input], ['Input_0'])
+        session = onnxruntime.InferenceSession(actual.SerializeToString())
+        output, = session.run(None, {'Input_0': self.x})
+        np.testing.assert_allclose(y.array, output, rtol=1e-5, atol=1e-5)
+
+    def test_bare_functions(self):
+        import onnxruntime
+
+        w = chainer.Parameter(np.random.rand(3, 4).astype(np.float32))
+        w.name = 'W'
+        x = chainer.Variable(np.random.rand(2, 4).astype(np.float32))
+        offset = chainer.Variable(np.ones((2, 3), dtype=np.float32))
+        y = F.relu(F.linear(x, w) + offset)
+
+        onnx_model = onnx_chainer.export_graph(
+            y, inputs=[x], opset_version=self.opset_version)
+        self.assertEqual([i.name for i in onnx_model.graph.input], ['Input_0'])
+        self.assertIn(
+            'param_0_W', [t.name for t in onnx_model.graph.initializer])
+        session = onnxruntime.InferenceSession(onnx_model.SerializeToString())
+        output, = session.run(None, {'Input_0': x.array})
+        np.testing.assert_allclose(y.array, output, rtol=1e-5, atol=1e-5)
+
+    def test_unnamed_params(self):
+        w = chainer.Parameter(np.random.rand(3, 4).astype(np.float32))
+        x = chainer.Variable(np.random.rand(2, 4).astype(np.float32))
+        y = F.linear(x, w)
+        onnx_model = onnx_chainer.export_graph(
+            y, inputs=[x], opset_version=self.opset_version)
+        names = [t.name for t in onnx_model.graph.initializer]
+        self.assertIn('param_0', names)
+        self.assertFalse([name for name in names if 'None' in name])
+
+    def test_unnamed_params_and_constants(self):
+        # The constant made by the converter of the reshape must not take
+        # the name of the unnamed parameter
+        w = chainer.Parameter(np.random.rand(3, 4).astype(np.float32))
+        x = chainer.Variable(np.random.rand(2, 4).astype(np.float32))
+        y = F.reshape(F.linear(x, w), (3, 2))
+        onnx_model = onnx_chainer.export_graph(
+            y, inputs=[x], opset_version=self.opset_version)
+        tensors = {t.name: t for t in onnx_model.graph.initializer}
+        self.assertEqual(len(tensors), len(onnx_model.graph.initializer))
+        self.assertGreater(len(tensors), 1)
+        np.testing.assert_array_equal(
+            numpy_helper.to_array(tensors['param_0']), w.array)
+
+    def test_no_graph(self):
+        with chainer.using_config('enable_backprop', False):
+            y = self.model(self.x)
+        with self.assertRaises(ValueError):
+            onnx_chainer.export_graph(y)
+
+
+class TestSaveText(unittest.TestCase):
+
+    def setUp(self):
+        self.model = chainer.Sequential(L.Linear(3, 4), F.relu)
+        self.x = np.zeros((1, 3), dtype=np.float32)
+
+    def check_text(self, text, onnx_model, arrays):
+        self.assertNotIn('raw_data', text)
+        self.assertIn('op_type: "Gemm"', text)
+        self.assertIn('name: "Input_0"', text)
+        for tensor in onnx_model.graph.initializer:
+            data = arrays[tensor.name].tobytes()
+            self.assertIn(
+                'initializer {{ name: "{}" dims: [{}] data_type: FLOAT '
+                'nbytes: {} sha1: "{}" }}'.format(
+                    tensor.name, ', '.join(map(str, tensor.dims)), len(data),
+                    hashlib.sha1(data).hexdigest()), text)
+
+    def test_save_text(self):
+        with tempfile.TemporaryDirectory() as d:
+            filename = os.path.join(d, 'model.onnx')
+            onnx_model = onnx_chainer.export(
+                self.model, self.x, filename, save_text=True)
+            with open(filename + '.txt') as f:
+                text = f.read()
+        arrays = {tensor.name: numpy_helper.to_array(tensor)
+                  for tensor in onnx_model.graph.initializer}
+        self.check_text(text, onnx_model, arrays)
+
+    def test_stream(self):
+        with tempfile.TemporaryDirectory() as d:
+            filename = os.path.join(d, 'model.onnx')
+            onnx_chainer.export(
+                self.model, self.x, filename, save_text=True, stream=True)
+            with open(filename + '.txt') as f:
+                text = f.read()
+            onnx_model = onnx.load(filename)
+        arrays = {tensor.name: numpy_helper.to_array(tensor)
+                  for tensor in onnx_model.graph.initializer}
+        self.check_text(text, onnx_model, arrays)
+
+    def test_external_data(self):
+        with tempfile.TemporaryDirectory() as d:
+            filename = os.path.join(d, 'model.onnx')
+            onnx_chainer.export(
+                self.model, self.x, filename, save_text=True,
+                external_data=True, external_data_threshold=0)
+            with open(filename + '.txt') as f:
+                text = f.read()
+        self.assertIn('location: "model.onnx.data" offset: 0 length: 48',
+                      text)
@@ -0,0 +1,88 @@
+import functools
+import os
+import tempfile
+import unittest
+
+import chainer
+import chainer.links as L
+import numpy as np
+import onnx
+
+import onnx_chainer
+
+
+class TestExportMany(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.opset_version = onnx_chainer.MINIMUM_OPSET_VERSION
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def make_jobs(self):
+        jobs = []
+        for batch_size in (1, 2, 4):
+            x = np.zeros((batch_size, 4), dtype=np.float32)
+            filename = os.path.join(
+                self.tmpdir.name, 'linear_{}.onnx'.format(batch_size))
+            jobs.append(onnx_chainer.ExportJob(
+                functools.partial(L.Linear, 4, 3), x, filename,
+                opset_version=self.opset_version))
+        return jobs
+
+    def check_results(self, jobs, results):
+        self.assertEqual(len(results), len(jobs))
+        for job, result in zip(jobs, results):
+            self.assertIsNone(result.error)
+            self.assertEqual(result.name, job.filename)
+            self.assertEqual(
+                result.file_size, os.path.getsize(job.filename))
+            self.assertGreaterEqual(result.elapsed, 0)
+            onnx_model = onnx.load(job.filename)
+            self.assertEqual(
+                onnx_model.graph.input[0].type.tensor_type.shape.dim[0]
+                .dim_value, job.args.shape[0])
+
+    def test_processes(self):
+        jobs = self.make_jobs()
+        self.check_results(jobs, onnx_chainer.export_many(jobs, workers=2))
+
+    def test_in_process(self):
+        jobs = self.make_jobs()
+        self.check_results(jobs, onnx_chainer.export_many(jobs, workers=1))
+
+    def test_snapshot(self):
+        model = L.Linear(4, 3)
+        snapshot = os.path.join(self.tmpdir.name, 'snapshot.npz')
+        chainer.serializers.save_npz(snapshot, model)
+        filename = os.path.join(self.tmpdir.name, 'model.onnx')
+        job = onnx_chainer.ExportJob(
+            functools.partial(L.Linear, 4, 3), np.zeros((1, 4), np.float32),
+            filename, snapshot=snapshot, opset_version=self.opset_version)
+        result, = onnx_chainer.export_many([job], workers=1)
+        self.assertIsNone(result.error)
+        expected = onnx_chainer.export(
+            model, np.zeros((1, 4), np.float32),
+            opset_version=self.opset_version)
+        self.assertEqual(
+            expected.SerializeToString(), onnx.load(filename)
+            .SerializeToString())
+
+    def test_error(self):
+        jobs = self.make_jobs()
+        jobs[1].args = np.zeros((1, 5), dtype=np.float32)
+        results = onnx_chainer.export_many(jobs, workers=2)
+        self.assertIsNone(results[0].error)
+        self.assertIsNotNone(results[1].error)
+        self.assertIsNone(results[1].file_size)
+        self.assertIsNone(results[2].error)
+
+    def test_unpicklable_job(self):
+        jobs = self.make_jobs()
+        jobs[1].model = lambda: L.Linear(4, 3)
+        results = onnx_chainer.export_many(jobs, workers=2)
+        self.assertIsNone(results[0].error)
+        self.assertIn('Pickl', results[1].error)
+        self.assertIsNone(results[1].elapsed)
+        self.assertIsNone(results[2].error)
@@ -0,0 +1,74 @@
+import os
+import subprocess
+import sys
+import unittest
+
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The converters are imported lazily by PEP 562 since Python 3.7
+_LAZY_IMPORT = sys.version_info >= (3, 7)
+
+# The modules which are only needed by some of the exports
+_DEFERRED_MODULES = (
+    'onnx_chainer.abstract_forward', 'onnx_chainer.export_many',
+    'onnx_chainer.optimize', 'onnx_chainer.profiling',
+    'onnx_chainer.serialization', 'onnx_chainer.validation', 'tracemalloc')
+
+
+def _run(code):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [_ROOT] + env.get('PYTHONPATH', '').split(os.pathsep))
+    result = subprocess.run(
+        [sys.executable, '-c', code], env=env,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        universal_newlines=True, check=True)
+    return result.stdout, result.stderr
+
+
+def _imported_modules(code):
+    stdout, _ = _run(
+        code + '\nimport sys\nprint("\\n".join(sys.modules))')
+    return set(stdout.split())
+
+
+class TestImport(unittest.TestCase):
+
+    @unittest.skipUnless(_LAZY_IMPORT, 'Python 3.7 or later is required')
+    def test_converters_not_imported(self):
+        modules = _imported_modules('import onnx_chainer')
+        self.assertIn('onnx_chainer.functions', modules)
+        self.assertFalse(
+            [m for m in modules if m.startswith('onnx_chainer.functions.')])
+
+    @unittest.skipUnless(_LAZY_IMPORT, 'Python 3.7 or later is required')
+    def test_converters_imported_on_use(self):
+        modules = _imported_modules('\n'.join([
+            'import chainer',
+            'import chainer.functions as F',
+            'import numpy as np',
+            'import onnx_chainer',
+            'model = chainer.Sequential(F.relu)',
+            'onnx_chainer.export(model, np.zeros((1, 2), np.float32))']))
+        self.assertIn('onnx_chainer.functions.activation', modules)
+        self.assertNotIn('onnx_chainer.functions.pooling', modules)
+
+    def test_optional_dependencies_not_imported(self):
+        modules = _imported_modules('import onnx_chainer.testing')
+        self.assertNotIn('onnxruntime', modules)
+        self.assertNotIn('mxnet', modules)
+
+    @unittest.skipUnless(_LAZY_IMPORT, 'Python 3.7 or later is required')
+    def test_deferred_modules_not_imported(self):
+        modules = _imported_modules('import onnx_chainer')
+        for name in _DEFERRED_MODULES:
+            self.assertNotIn(name, modules)
+
+    @unittest.skipUnless(_LAZY_IMPORT, 'Python 3.7 or later is required')
+    def test_lazy_attributes(self):
+        modules = _imported_modules('\n'.join([
+            'import onnx_chainer',
+            'onnx_chainer.Profiler']))
+        self.assertIn('onnx_chainer.profiling', modules)
+        self.assertNotIn('onnx_chainer.export_many', modules)
@@ -0,0 +1,33 @@
+import unittest
+
+import chainer.functions as F
+
+from onnx_chainer import functions
+from onnx_chainer import registry
+
+
+class TestConverterRegistry(unittest.TestCase):
+
+    def test_lookup(self):
+        reg = registry.get_registry(7)
+        func_name, converter, opset_version = reg.lookup(
+            F.activation.relu.ReLU)
+        self.assertEqual(func_name, 'ReLU')
+        self.assertIs(converter, functions.convert_ReLU)
+        self.assertEqual(opset_version, 6)
+
+    def test_cached(self):
+        self.assertIs(registry.get_registry(8), registry.get_registry(8))
+        self.assertIsNot(registry.get_registry(7), registry.get_registry(8))
+
+    def test_latest(self):
+        _, opset_version = registry.get_registry(None).get('MaxPooling2D')
+        self.assertEqual(opset_version, 8)
+
+    def test_opset_too_old(self):
+        with self.assertRaises(RuntimeError):
+            registry.get_registry(7).get('BroadcastTo')
+
+    def test_unsupported(self):
+        with self.assertRaises(ValueError):
+            registry.get_registry(7).get('UnknownFunction')
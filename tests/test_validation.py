@@ -0,0 +1,98 @@
+import unittest
+
+import chainer
+import chainer.functions as F
+import chainer.links as L
+import numpy as np
+import onnx
+from onnx import helper
+from onnx import TensorProto
+
+import onnx_chainer
+from onnx_chainer import validation
+
+
+def _make_model(nodes, inputs=('x',), outputs=('y',), opset_version=7):
+    graph = helper.make_graph(
+        nodes, 'Graph',
+        [helper.make_tensor_value_info(name, TensorProto.FLOAT, [1])
+         for name in inputs],
+        [helper.make_tensor_value_info(name, TensorProto.FLOAT, [1])
+         for name in outputs])
+    return helper.make_model(
+        graph, opset_imports=[helper.make_opsetid('', opset_version)])
+
+
+class TestCheckModel(unittest.TestCase):
+
+    def test_valid(self):
+        validation.check_model(_make_model([
+            helper.make_node('Relu', ['x'], ['h']),
+            helper.make_node('Add', ['h', 'x'], ['y'])]))
+
+    def test_ssa(self):
+        with self.assertRaises(ValueError):
+            validation.check_model(_make_model([
+                helper.make_node('Relu', ['x'], ['y']),
+                helper.make_node('Relu', ['x'], ['y'])]))
+
+    def test_topological_order(self):
+        with self.assertRaises(ValueError):
+            validation.check_model(_make_model([
+                helper.make_node('Add', ['h', 'x'], ['y']),
+                helper.make_node('Relu', ['x'], ['h'])]))
+
+    def test_dangling_input(self):
+        with self.assertRaises(ValueError):
+            validation.check_model(_make_model([
+                helper.make_node('Add', ['z', 'x'], ['y'])]))
+
+    def test_undefined_output(self):
+        with self.assertRaises(ValueError):
+            validation.check_model(_make_model([
+                helper.make_node('Relu', ['x'], ['h'])]))
+
+    def test_unknown_attribute(self):
+        with self.assertRaises(ValueError):
+            validation.check_model(_make_model([
+                helper.make_node('Relu', ['x'], ['y'], alpha=0.1)]))
+
+    def test_attribute_type(self):
+        with self.assertRaises(ValueError):
+            validation.check_model(_make_model([
+                helper.make_node('LeakyRelu', ['x'], ['y'], alpha=1)]))
+
+    def test_number_of_inputs(self):
+        with self.assertRaises(ValueError):
+            validation.check_model(_make_model([
+                helper.make_node('Add', ['x'], ['y'])]))
+
+    def test_unknown_operator(self):
+        with self.assertRaises(ValueError):
+            validation.check_model(_make_model([
+                helper.make_node('Unknown', ['x'], ['y'])]))
+
+
+class TestExportCheck(unittest.TestCase):
+
+    def setUp(self):
+        self.model = chainer.Sequential(
+            L.Convolution2D(3, 4, ksize=3), L.BatchNormalization(4), F.relu,
+            L.Linear(None, 2))
+        self.x = np.zeros((1, 3, 5, 5), dtype=np.float32)
+
+    def test_levels(self):
+        expected = onnx_chainer.export(
+            self.model, self.x,
+            opset_version=onnx_chainer.MINIMUM_OPSET_VERSION)
+        for check in ('structural', 'off'):
+            actual = onnx_chainer.export(
+                self.model, self.x,
+                opset_version=onnx_chainer.MINIMUM_OPSET_VERSION,
+                check=check)
+            self.assertEqual(expected, actual)
+        onnx.checker.check_model(expected)
+
+    def test_invalid_level(self):
+        with self.assertRaises(ValueError):
+            onnx_chainer.export(self.model, self.x, check='fast')